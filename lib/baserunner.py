@@ -27,19 +27,30 @@ __author__ = 'mwu@google.com (Mingyu Wu)'
 
 import logging
 import os
-import re
 import sys
+import threading
 import time
 import traceback
 
+from lib import changeindex
 from lib import common_util
 from lib import constants
+from lib import dispatcher
 from lib import emailmessage
 from lib import filesystemhandlerextend
+from lib import outputmatcher
+from lib import outputspool
 from lib import pyreringconfig
 from lib import pyreringutil
 from lib import reporter_txt
+from lib import resourcelimits
+from lib import resultcache
+from lib import scanindex
 from lib import scanscripts
+from lib import sharding
+from lib import testcontext
+from lib import testhistory
+from lib import zygote
 
 global_settings = pyreringconfig.GlobalPyreRingConfig.settings
 
@@ -48,16 +59,35 @@ DEBUG = common_util.DebugLog
 
 ScanScriptsError = scanscripts.ScanScriptsError
 
-WARNING_PATTERN = re.compile(r'warn', re.I)
-ERROR_PATTERN = re.compile(r'error', re.I)
-FATAL_PATTERN = re.compile(r'fatal', re.I)
-CATCHING_LIST = [FATAL_PATTERN, ERROR_PATTERN, WARNING_PATTERN]
-
 SETUP_SUITE = ['SETUP.sh', 'SETUP.py', 'SETUP.par', 'SETUP.suite']
 SETUP_SUITE_SET = set(SETUP_SUITE)
 TEARDOWN_SUITE = ['TEARDOWN.sh', 'TEARDOWN.py', 'TEARDOWN.par',
                   'TEARDOWN.suite']
 TEARDOWN_SUITE_SET = set(TEARDOWN_SUITE)
+# The expected duration in seconds of a test never run before.
+DEFAULT_DURATION = 60
+# The changed_since value for the latest run on this host.
+LAST_RUN = 'last'
+# The statuses of the test cases run again, up to their RETRIES.
+RETRIED_STATUSES = [constants.FAIL, constants.TIMEOUT]
+# Seconds a second KeyboardInterrupt stops PyreRing in, after one stopped a
+# test case.
+INTERRUPT_PAUSE = 5
+
+
+def _SuiteNames(value, default):
+  """Return the suite names in a comma separated setting.
+
+  Args:
+    value: None/string the setting.
+    default: a list of the names to use if the setting is None.
+
+  Returns:
+    a list of suite names.
+  """
+  if value is None:
+    return list(default)
+  return [one.strip() for one in value.split(',') if one.strip()]
 
 
 class BaseRunner(pyreringutil.PyreRingFrameworkAdaptor):
@@ -93,33 +123,148 @@ class BaseRunner(pyreringutil.PyreRingFrameworkAdaptor):
     self.name = name
     # Get a reference to the global prop
     self.prop = global_settings
+    # Only run the scripts changed since this run or time, the time is found
+    # by Prepare.
+    self.changed_since = self.prop.get('changed_since')
+    self.changed_since_time = None
     # Init a scanner using the source_dir
     if scanner:
       self.scanner = scanner
     else:
-      self.scanner = scanscripts.ScanScripts(self.prop['source_dir'])
+      index = None
+      if self.prop.get('scan_index'):
+        index = scanindex.ScanIndex(self.prop['scan_index'])
+      changes = None
+      if self.changed_since:
+        if not self.prop.get('change_index'):
+          raise ValueError('changed_since needs a change_index')
+        changes = changeindex.ChangeIndex(self.prop['change_index'])
+      self.scanner = scanscripts.ScanScripts(self.prop['source_dir'],
+                                             index=index, changes=changes)
     # Init a filesystem for interact with shell
     self.filesystem = filesystem
     self.email_message = email_message
 
+    # The number of test scripts allowed to run at the same time.
+    self.jobs = int(global_settings.get('jobs', 1))
+    # The slots taken by each SIZE out of the slot budget, when tests run at
+    # the same time.
+    self.slots = int(global_settings.get('slots', 0))
+    self.size_weights = dispatcher.ParseWeights(
+        global_settings.get('size_weights', dispatcher.DEFAULT_WEIGHTS))
+    # The number of NFS test scripts allowed to run at the same time.
+    self.nfs_jobs = int(global_settings.get('nfs_jobs',
+                                            dispatcher.DEFAULT_NFS_JOBS))
+    # The lane waits of the last suite run concurrently.
+    self.lane_waits = {}
+
     # Init a reporter for generating a report
     self.reporter = reporter or (
-        reporter_txt.TxtReporter(global_settings['project_name']))
+        reporter_txt.TxtReporter(
+            global_settings['project_name'],
+            int(global_settings.get('report_checkpoint',
+                                    reporter_txt.DEFAULT_CHECKPOINT))))
+    if self.jobs > 1:
+      # Test scripts send extra messages and output files to the reporter
+      # from the worker threads.
+      self.reporter = dispatcher.Synchronized(self.reporter)
 
     # Set the file_errors boolean.
     self.file_errors = global_settings['file_errors']
+    # The suites run before and after the user suites.
+    self.setup_suite = _SuiteNames(global_settings.get('setup_suite'),
+                                   SETUP_SUITE)
+    self.setup_suite_set = set(self.setup_suite)
+    self.teardown_suite = _SuiteNames(global_settings.get('teardown_suite'),
+                                      TEARDOWN_SUITE)
+    self.teardown_suite_set = set(self.teardown_suite)
+    # The bytes of output of one test kept in memory, the rest is spooled to a
+    # temporary file.
+    self.output_memory_cap = int(global_settings.get(
+        'output_memory_cap', outputspool.DEFAULT_MEMORY_CAP))
+    # The seconds a timed out test has to exit after SIGTERM.
+    self.kill_grace = float(global_settings.get(
+        'kill_grace', filesystemhandlerextend.DEFAULT_KILL_GRACE))
 
     self.failed = 0
     self.passed = 0
     self.timeout = 0
     self.error = 0
     self.notrun = 0
+    self.limit = 0
+    self.flaky = 0
+
+    # The history of test results, set up by Prepare.
+    self.history = None
+    # The (start time, duration, resource usage) of the test cases run but not
+    # recorded yet, keyed by the id of the test case dictionary.
+    self.timings = {}
+    # The first output line telling a memory allocation failed, of the test
+    # cases run but not recorded yet which printed one.
+    self.allocation_failures = {}
+    # The expected duration of each script from the history, read once.
+    self.expected_durations = None
+    self.default_duration = float(global_settings.get('default_duration',
+                                                      DEFAULT_DURATION))
+    # This run only runs its own shard of each suite.
+    self.shard_index = int(global_settings.get('shard_index', 0))
+    self.total_shards = int(global_settings.get('total_shards', 1))
+    self.shard_method = global_settings.get('shard_method', sharding.HASH)
+    # The durations the duration shards are split by, read by Prepare from
+    # the shard_durations file.
+    self.shard_durations = {}
+    sharding.CheckShard(self.shard_index, self.total_shards)
+    if self.shard_method not in sharding.METHODS:
+      raise ValueError('Unknown shard_method: %s' % self.shard_method)
+    # Passed results of CACHEABLE tests, None if the cache is not used.
+    self.result_cache = None
+    if global_settings.get('result_cache'):
+      self.result_cache = resultcache.ResultCache(
+          global_settings['result_cache'],
+          int(global_settings.get('result_cache_ttl',
+                                  resultcache.DEFAULT_TTL)),
+          int(global_settings.get('result_cache_size',
+                                  resultcache.DEFAULT_MAX_ENTRIES)))
+    # Only run the tests which failed in the last run, read by Prepare.
+    self.rerun_failed = global_settings.get('rerun_failed', False)
+    self.rerun_scripts = None
+    # With no_cache every test runs, but passes still refresh the cache.
+    self.no_cache = global_settings.get('no_cache', False)
+    # The cache keys of the test cases run but not reported yet, keyed by the
+    # id of the test case dictionary.
+    self.cache_keys = {}
+    # Run the python scripts forked from a zygote, started on first use.
+    self.use_zygote = global_settings.get('zygote', False)
+    self.zygote = None
+    self.zygote_lock = threading.Lock()
+    # The environment of all the tests, built by Prepare.
+    self.environment = None
+    # The times a FAIL or TIMEOUT test case without RETRIES in its header is
+    # run again, each retry waits twice as long as the one before it,
+    # starting from retry_backoff seconds.
+    self.max_retries = int(global_settings.get('max_retries', 0))
+    self.retry_backoff = float(global_settings.get('retry_backoff', 0))
+    # The number of latest runs in the history a flake rate is taken from.
+    self.flake_samples = int(global_settings.get(
+        'flake_samples', testhistory.FLAKE_SAMPLES))
+    # The retries done by the test cases being retried, keyed by the id of the
+    # test case dictionary.
+    self.retries = {}
+    # The scripts which were FLAKY in this run.
+    self.flaky_scripts = []
 
   @DEBUG
   def Prepare(self):
     """This is to prepare the test run.
 
-    Prepare the reporter ready to do report.
+    Prepare the reporter ready to do report and build the environment of the
+    tests. With rerun_failed, the tests failed in the last run on this host
+    are read from the history. With changed_since, the time to look for
+    changes from is found.
+
+    Raises:
+      ValueError: if rerun_failed is set without a history_file, or
+        changed_since is not understood.
     """
     log_name = '%s_%s' % (global_settings['host_name'],
                           global_settings['log_file'])
@@ -128,6 +273,69 @@ class BaseRunner(pyreringutil.PyreRingFrameworkAdaptor):
                            '.txt'])
     report_file = os.path.join(global_settings['report_dir'], result_name)
     self.reporter.SetReportFile(report_file)
+    self.environment = pyreringutil.TestEnvironment(global_settings)
+    history_file = global_settings.get('history_file',
+                                       testhistory.HISTORY_FILE)
+    if history_file:
+      self.history = testhistory.TestHistory(
+          os.path.join(global_settings['report_dir'], history_file),
+          '%s.%d' % (global_settings['time'], os.getpid()),
+          global_settings['host_name'],
+          max_size=int(global_settings.get('history_max_size',
+                                           testhistory.MAX_SIZE)))
+    if self.total_shards > 1 and self.shard_method == sharding.DURATION:
+      # All shards have to use the same durations, no matter the host, so
+      # they come from a snapshot given to every run, not from the history.
+      durations_file = global_settings.get('shard_durations')
+      if durations_file:
+        self.shard_durations = sharding.ReadDurations(durations_file)
+      else:
+        logger.warning('shard_method duration needs a shard_durations file, '
+                       'sharding by hash')
+        self.shard_method = sharding.HASH
+    if self.rerun_failed:
+      if not self.history:
+        raise ValueError('rerun_failed needs a history_file')
+      run_id, self.rerun_scripts = self.history.LastRunFailures(
+          global_settings['host_name'])
+      if run_id is None:
+        logger.warning('rerun_failed: no previous run in %s, nothing to run' %
+                       self.history.path)
+      else:
+        logger.info('rerun_failed: %d tests failed in run %s' %
+                    (len(self.rerun_scripts), run_id))
+    if self.changed_since:
+      self.changed_since_time = self._ReferenceTime(self.changed_since)
+      logger.info('only run scripts changed since %s' %
+                  time.ctime(self.changed_since_time))
+
+  def _ReferenceTime(self, changed_since):
+    """Find the time of a changed_since value.
+
+    Args:
+      changed_since: <string> a run id in the history, LAST_RUN for the
+        latest run on this host, or seconds since epoch.
+
+    Returns:
+      a float of seconds since epoch.
+
+    Raises:
+      ValueError: if the value is neither a known run nor a time.
+    """
+    start_time = None
+    if self.history:
+      if changed_since == LAST_RUN:
+        start_time = self.history.RunStartTime(
+            host=global_settings['host_name'])
+      else:
+        start_time = self.history.RunStartTime(changed_since)
+    if start_time is None:
+      try:
+        start_time = float(changed_since)
+      except ValueError:
+        raise ValueError('changed_since is neither a run in the history nor a '
+                         'time: %s' % changed_since)
+    return start_time
 
   @DEBUG
   def CleanUp(self):
@@ -141,7 +349,7 @@ class BaseRunner(pyreringutil.PyreRingFrameworkAdaptor):
   def _RunSuites(self, suites):
     """Run a list of suites.
 
-    It runs suites given. If any test in SETUP_SUITE fails, it will return 1
+    It runs suites given. If any test in setup_suite fails, it will return 1
     to mark it is a setup failure. Otherwise, return 0 for all.
     Args:
       suites: <list> names of test suite/cases.
@@ -153,9 +361,9 @@ class BaseRunner(pyreringutil.PyreRingFrameworkAdaptor):
       try:
         logger.debug('running %s' % test)
         test_fail_flag = self._RunSingleSuite(test)[0]
-        # if the test failed and test is one of SETUP_SUITE, stop the rest of
+        # if the test failed and test is one of setup_suite, stop the rest of
         # testing.
-        if test_fail_flag and test in SETUP_SUITE_SET:
+        if test_fail_flag and test in self.setup_suite_set:
           logger.warning('Setup test "%s" failed. No other test executed.' %
                          test)
           return 1
@@ -202,8 +410,8 @@ class BaseRunner(pyreringutil.PyreRingFrameworkAdaptor):
       logger.info('setup skipped')
     else:
       logger.info('setup suite runs')
-      result = self._RunSuites(SETUP_SUITE)
-      # If the SETUP_SUITE has any failed test cases, stop the test right away.
+      result = self._RunSuites(self.setup_suite)
+      # If the setup_suite has any failed test cases, stop the test right away.
       if result:
         return result
 
@@ -220,8 +428,9 @@ class BaseRunner(pyreringutil.PyreRingFrameworkAdaptor):
     if global_settings['skip_setup']:
       logger.info('teardown skipped')
     else:
-      self._RunSuites(TEARDOWN_SUITE)
+      self._RunSuites(self.teardown_suite)
 
+    self._FlakeReport()
     self._SummaryToLog()
     self.reporter.EndTest()
     log_messages = [
@@ -231,10 +440,31 @@ class BaseRunner(pyreringutil.PyreRingFrameworkAdaptor):
     for message in log_messages:
       logger.info(message)
 
+  def _FlakeReport(self):
+    """Report the flake rate of the tests which were FLAKY in this run.
+
+    The rate is taken from the latest flake_samples runs of each test in the
+    history, worst first, so the worst offenders can be quarantined.
+    """
+    if not self.flaky_scripts or not self.history:
+      return
+    self.history.Flush()
+    rates = self.history.FlakeRates(self.flake_samples)
+    worst = []
+    for script in set(self.flaky_scripts):
+      flaky, runs = rates.get(script, (1, 1))
+      worst.append((-float(flaky) / runs, script, flaky, runs))
+    worst.sort()
+    for unused_rate, script, flaky, runs in worst:
+      message = '%s was FLAKY in %d of its latest %d runs' % (script, flaky,
+                                                              runs)
+      logger.warn(message)
+      self.reporter.ExtraMessage(message + '\n')
+
   def _SummaryToLog(self):
     """Summary the test result and write to log."""
     total_test = (self.failed + self.timeout + self.error + self.notrun +
-                  self.passed)
+                  self.limit + self.flaky + self.passed)
     log_messages = [
         'TOTAL TESTS: %d' % total_test,
         '%s: %d' % (constants.PASS, self.passed),
@@ -242,6 +472,8 @@ class BaseRunner(pyreringutil.PyreRingFrameworkAdaptor):
         '%s: %d' % (constants.TIMEOUT, self.timeout),
         '%s: %d' % (constants.ERROR, self.error),
         '%s: %d' % (constants.NOTRUN, self.notrun),
+        '%s: %d' % (constants.LIMIT, self.limit),
+        '%s: %d' % (constants.FLAKY, self.flaky),
         ]
     for message in log_messages:
       logger.info(message)
@@ -263,9 +495,19 @@ class BaseRunner(pyreringutil.PyreRingFrameworkAdaptor):
       The count of non-successful test cases.
     """
     try:
-      self._Run(suite_list)
+      try:
+        self._Run(suite_list)
+      finally:
+        if self.history:
+          self.history.Flush()
+        if self.result_cache:
+          self.result_cache.Save()
+        if self.zygote:
+          self.zygote.Stop()
+          self.zygote = None
     finally:
-      if email_flag and (self.failed + self.timeout + self.error + self.notrun):
+      if email_flag and (self.failed + self.timeout + self.error + self.notrun +
+                         self.limit):
         self._SendMail(suite_list)
       else:
         if email_flag:
@@ -274,7 +516,7 @@ class BaseRunner(pyreringutil.PyreRingFrameworkAdaptor):
           log_message = 'email is not sent since email_flag is not set.'
         logger.info(log_message)
 
-    return self.failed + self.timeout + self.error + self.notrun
+    return self.failed + self.timeout + self.error + self.notrun + self.limit
 
   def _SendMail(self, suite_list):
     """Send out email after test.
@@ -288,7 +530,8 @@ class BaseRunner(pyreringutil.PyreRingFrameworkAdaptor):
     from_address = self.prop['tester']
     to_address = self.prop['email_recipients']
     title = 'project:%s suites:%s' %(self.prop['project_name'], suite_list)
-    if  self.failed or self.timeout or self.error or self.notrun:
+    if  (self.failed or self.timeout or self.error or self.notrun or
+         self.limit):
       title = '%s is RED' % title
     else:
       title = '%s is GREEN' % title
@@ -308,12 +551,13 @@ class BaseRunner(pyreringutil.PyreRingFrameworkAdaptor):
 
   @DEBUG
   def _RunSingleSuite(self, one_suite):
-    """Runs a given suite/test case one by one.
+    """Runs a given suite/test case.
 
     This method is going to disassemble the given one suite to test cases and
-    run each one test case in a subshell sequentially and collect return code,
-    also write the results to report and log all output to log_pipe for
-    further inspection.
+    run each one test case in a subshell and collect return code, also write
+    the results to report and log all output to log_pipe for further
+    inspection. Test cases run one by one, unless jobs is more than 1, then
+    they run on a pool of worker threads.
 
     Args:
       one_suite: a test suite/test case name.
@@ -322,51 +566,123 @@ class BaseRunner(pyreringutil.PyreRingFrameworkAdaptor):
       A tuple of an overall return code and a dict of individual return codes
     """
     results = {}
+    # Setup and teardown suites are always run whole.
+    if (one_suite in self.setup_suite_set or
+        one_suite in self.teardown_suite_set):
+      script_list = self.scanner.BaseScan(one_suite)
+    else:
+      script_list = self.scanner.BaseScan(one_suite, self.changed_since_time)
+      if self.rerun_scripts is not None:
+        script_list = self._FailedLastRun(script_list)
+      if self.total_shards > 1:
+        script_list = self._Shard(script_list)
+    self.lane_waits = {}
+    if self.jobs > 1 and len(script_list) > 1:
+      suite_fail_flag = self._RunScriptsConcurrently(script_list, results)
+    else:
+      suite_fail_flag = self._RunScriptsSequentially(script_list, results)
+
+    msg = self._LaneWaitMessage()
+    if msg:
+      logger.info('suite %s %s' % (one_suite, msg))
+    if suite_fail_flag:
+      self.reporter.SuiteReport(one_suite, constants.FAIL, msg)
+    else:
+      self.reporter.SuiteReport(one_suite, constants.PASS, msg)
+    return suite_fail_flag, results
+
+  def _LaneWaitMessage(self):
+    """Describe how long the tests of each lane waited to start.
+
+    Returns:
+      a string, empty if the suite did not run concurrently.
+    """
+    lanes = self.lane_waits.keys()
+    lanes.sort()
+    waits = []
+    for lane in lanes:
+      started, total, longest = self.lane_waits[lane]
+      waits.append('%s %d tests %.1fs total %.1fs max' % (lane, started,
+                                                          total, longest))
+    if not waits:
+      return ''
+    return 'lane waits: %s' % ', '.join(waits)
+
+  def _FailedLastRun(self, script_list):
+    """Keep only the test cases which failed in the last run.
+
+    Args:
+      script_list: a list of test case dictionaries.
+
+    Returns:
+      a list of the test case dictionaries to rerun, in the same order.
+    """
+    rerun = [one_script_dict for one_script_dict in script_list
+             if one_script_dict['TEST_SCRIPT'] in self.rerun_scripts]
+    logger.info('rerun_failed runs %d of %d tests' % (len(rerun),
+                                                      len(script_list)))
+    return rerun
+
+  def _Shard(self, script_list):
+    """Keep only the test cases of the shard of this run.
+
+    Args:
+      script_list: a list of test case dictionaries.
+
+    Returns:
+      a list of the test case dictionaries of this shard.
+    """
+    if self.shard_method == sharding.DURATION:
+      shard = sharding.DurationShard(script_list, self.shard_index,
+                                     self.total_shards, self.shard_durations,
+                                     self.default_duration,
+                                     global_settings['source_dir'])
+    else:
+      shard = sharding.HashShard(script_list, self.shard_index,
+                                 self.total_shards,
+                                 global_settings['source_dir'])
+    logger.info('shard %d of %d runs %d of %d tests' %
+                (self.shard_index, self.total_shards, len(shard),
+                 len(script_list)))
+    return shard
+
+  def _RunScriptsSequentially(self, script_list, results):
+    """Run a list of test cases one by one.
+
+    Args:
+      script_list: a list of test case dictionaries.
+      results: <dict> to collect the return code of each test case.
+
+    Returns:
+      True if any test case did not pass.
+    """
     # This is used to check the suite pass or fail.
     suite_fail_flag = False
-    for one_script_dict in self.scanner.BaseScan(one_suite):
+    for one_script_dict in script_list:
       try:
         result = 0
         cmd = one_script_dict['TEST_SCRIPT']
-        time_out = one_script_dict['TIMEOUT']
-        args = ''
         logger.info('Test: %s......' %  cmd)
-        result = self._CommandStreamer(cmd, args, time_out)
+        result = self._RunOneScript(one_script_dict)
+        delay = self._RetryDelay(one_script_dict, result)
+        while delay is not None:
+          time.sleep(delay)
+          result = self._RunOneScript(one_script_dict)
+          delay = self._RetryDelay(one_script_dict, result)
       except KeyboardInterrupt:
-        err_msg = 'Keyboard interrupt'
-        logger.critical('Test: %s got Keyboard interrupt' % (cmd, err_msg))
+        logger.critical('Test: %s got Keyboard interrupt' % cmd)
         self.reporter.TestCaseReport(cmd, constants.ERROR)
         self.error += 1
+        self._RecordHistory(one_script_dict, None, constants.ERROR)
         suite_fail_flag = True
         # Set this test as ERROR out.
         result = one_script_dict['ERROR']
-        try:
-          err_msg = """
-          Current test %s was interrupted by keyboard interrupt.  Another ctrl+c
-          in 5 seconds will stop PyreRing, otherwise test will move on to the
-          next test.
-          """ % cmd
-          print err_msg
-          logger.info(err_msg)
-          time.sleep(5)
-        except KeyboardInterrupt:
-          err_msg = """PyreRing stopped by KeyboardInterrupt."""
-          print err_msg
-          logger.critical(err_msg)
-          raise
+        self._PauseAfterInterrupt(cmd)
       # Eat any other exceptions and keep going to the next test.
       except Exception:
         err_msg = ('Exception[%s] on command[%s]. \n\tSTACK TRACE:\n%s'
                    % (sys.exc_type, cmd, traceback.format_exc()))
-        log_message = 'Test: %s got Exception %s' % (cmd, err_msg)
-        logger.warn(log_message)
-        # Here the exception must come from executing the test, since I can't
-        # decide what might be the cause here. Just fail it and keep going to
-        # the next test.
-        self.reporter.TestCaseReport(cmd, constants.ERROR)
-        self.error += 1
-        # Set this test as ERROR out.
-        result = one_script_dict['ERROR']
+        self._ReportException(one_script_dict, err_msg)
         suite_fail_flag = True
         continue
 
@@ -375,12 +691,233 @@ class BaseRunner(pyreringutil.PyreRingFrameworkAdaptor):
       suite_fail_flag = (self._CheckAndReportResult(one_script_dict, result) or
                          suite_fail_flag
                         )
+    return suite_fail_flag
 
-    if suite_fail_flag:
-      self.reporter.SuiteReport(one_suite, constants.FAIL)
-    else:
-      self.reporter.SuiteReport(one_suite, constants.PASS)
-    return suite_fail_flag, results
+  def _PauseAfterInterrupt(self, cmd):
+    """Give the user a moment to stop PyreRing after a test was interrupted.
+
+    Args:
+      cmd: <string> the test case stopped by a KeyboardInterrupt.
+
+    Raises:
+      KeyboardInterrupt: if another one comes within INTERRUPT_PAUSE seconds.
+    """
+    try:
+      err_msg = """
+      Current test %s was interrupted by keyboard interrupt.  Another ctrl+c
+      in %d seconds will stop PyreRing, otherwise test will move on to the
+      next test.
+      """ % (cmd, INTERRUPT_PAUSE)
+      print err_msg
+      logger.info(err_msg)
+      time.sleep(INTERRUPT_PAUSE)
+    except KeyboardInterrupt:
+      err_msg = """PyreRing stopped by KeyboardInterrupt."""
+      print err_msg
+      logger.critical(err_msg)
+      raise
+
+  def _RunScriptsConcurrently(self, script_list, results):
+    """Run a list of test cases on a pool of self.jobs worker threads.
+
+    Test cases with CONCURRENT set to False or ROOT_ACCESS set to True run
+    alone, at most nfs_jobs test cases with NFS set to True run at a time. Each
+    test case takes the slots of its SIZE out of the slot budget. The test
+    cases expected to take longest are started first. The results are
+    reported in this thread as each test case finishes, so the counters and
+    suite_fail_flag are handled the same way as the sequential run.
+
+    Args:
+      script_list: a list of test case dictionaries.
+      results: <dict> to collect the return code of each test case.
+
+    Returns:
+      True if any test case did not pass.
+    """
+    logger.info('running %d tests with %d jobs' % (len(script_list),
+                                                   self.jobs))
+    test_dispatcher = dispatcher.Dispatcher(self._RunOneScript, self.jobs,
+                                            self.slots, self.size_weights,
+                                            self.nfs_jobs, self._KillRunning)
+
+    def Report(one_script_dict, result, err_msg):
+      """Report one finished test case, return True if it did not pass."""
+      return self._ReportFinished(test_dispatcher, results, one_script_dict,
+                                  result, err_msg)
+    try:
+      return test_dispatcher.Run(self._LongestFirst(script_list), Report)
+    finally:
+      self.lane_waits = test_dispatcher.lane_waits
+
+  def _KillRunning(self):
+    """Kill the test cases still running, when a run is interrupted."""
+    self.filesystem.running_groups.KillAll()
+    if self.zygote:
+      self.zygote.running_groups.KillAll()
+
+  def _ReportFinished(self, test_dispatcher, results, one_script_dict, result,
+                      err_msg):
+    """Report a test case finished by a dispatcher, or requeue it to retry.
+
+    Args:
+      test_dispatcher: the dispatcher.Dispatcher which ran the test case.
+      results: <dict> to collect the return code of each test case.
+      one_script_dict: <dict> test case dictionary.
+      result: None/int the return code of the test case.
+      err_msg: <string> the exception raised running the test case, None if
+        it did not raise one.
+
+    Returns:
+      True if the test case did not pass, False if it passed or is retried.
+    """
+    if err_msg:
+      self._ReportException(one_script_dict, err_msg)
+      return True
+    delay = self._RetryDelay(one_script_dict, result)
+    if delay is not None:
+      test_dispatcher.Requeue(one_script_dict, delay)
+      return False
+    results[one_script_dict['TEST_SCRIPT']] = result
+    return self._CheckAndReportResult(one_script_dict, result)
+
+  def _ExpectedDuration(self, one_script_dict):
+    """Return the expected duration of a test case in seconds.
+
+    It is the average of the latest runs of the script in the history, on
+    this host if it ever ran here, otherwise on any host. A script never run
+    before is expected to take default_duration.
+
+    Args:
+      one_script_dict: <dict> test case dictionary.
+
+    Returns:
+      a float of seconds.
+    """
+    if self.expected_durations is None:
+      self.expected_durations = {}
+      if self.history:
+        self.history.Flush()
+        self.expected_durations = self.history.ExpectedDurations()
+        self.expected_durations.update(self.history.ExpectedDurations(
+            global_settings['host_name']))
+    return self.expected_durations.get(one_script_dict['TEST_SCRIPT'],
+                                       self.default_duration)
+
+  def _LongestFirst(self, script_list):
+    """Order test cases by their expected duration, longest first.
+
+    When test cases run concurrently, starting the long ones first keeps a
+    long test from running alone at the end of the run. Test cases expected
+    to take the same time keep their order.
+
+    Args:
+      script_list: a list of test case dictionaries.
+
+    Returns:
+      a new sorted list.
+    """
+    decorated = [(-self._ExpectedDuration(one_script_dict), index,
+                  one_script_dict)
+                 for index, one_script_dict in enumerate(script_list)]
+    decorated.sort()
+    return [one_script_dict for unused_key, unused_index, one_script_dict
+            in decorated]
+
+  def _RunOneScript(self, one_script_dict):
+    """Run one test case and return its return code.
+
+    A CACHEABLE test case with a cached pass is not run, the cached return
+    code is returned.
+
+    Args:
+      one_script_dict: <dict> test case dictionary.
+
+    Returns:
+      None/int the return code of the test case, None if it timed out.
+    """
+    context = self._TestContext(one_script_dict)
+    result = self._CachedResult(one_script_dict, context)
+    if result is not None:
+      return result
+    start_time = time.time()
+    start = common_util.MonotonicTime()
+    usage = None
+    try:
+      result, usage, allocation_line = self._CommandStreamer(
+          context, one_script_dict.get('KILL_ON_FATAL', False))
+      if allocation_line is not None:
+        self.allocation_failures[id(one_script_dict)] = allocation_line
+      return result
+    finally:
+      self.timings[id(one_script_dict)] = (start_time,
+                                           common_util.MonotonicTime() - start,
+                                           usage)
+
+  def _TestContext(self, one_script_dict):
+    """Make the testcontext.TestContext to run a test case with."""
+    return testcontext.FromConfig(
+        one_script_dict, self.environment,
+        resourcelimits.FromConfig(one_script_dict), self.kill_grace)
+
+  def _CachedResult(self, one_script_dict, context):
+    """Look up the cached pass of a CACHEABLE test case.
+
+    The cache key of a CACHEABLE test case which has to run is kept in
+    self.cache_keys, so its pass can be stored once it is reported.
+
+    Args:
+      one_script_dict: <dict> test case dictionary.
+      context: the testcontext.TestContext of the test case.
+
+    Returns:
+      the cached return code, None if the test case has to run.
+    """
+    if not self.result_cache or not one_script_dict.get('CACHEABLE', False):
+      return None
+    key = self.result_cache.Key(one_script_dict, context.environment)
+    if not self.no_cache:
+      result = self.result_cache.Lookup(key)
+      if result is not None:
+        logger.info('Test: %s passed in the result cache' %
+                    one_script_dict['TEST_SCRIPT'])
+        return result
+    self.cache_keys[id(one_script_dict)] = key
+    return None
+
+  def _RecordHistory(self, one_script_dict, result, status):
+    """Record the result of a test case in the history.
+
+    Args:
+      one_script_dict: <dict> test case dictionary.
+      result: None/int the return code of the test case.
+      status: <string> the test result constant reported.
+    """
+    self.allocation_failures.pop(id(one_script_dict), None)
+    timing = self.timings.pop(id(one_script_dict), None)
+    if self.history is None or timing is None:
+      return
+    start_time, duration, usage = timing
+    self.history.Record(one_script_dict['TEST_SCRIPT'], start_time, duration,
+                        result, status, usage)
+
+  def _ReportException(self, one_script_dict, err_msg):
+    """Report a test case which raised an exception as ERROR.
+
+    Args:
+      one_script_dict: <dict> test case dictionary.
+      err_msg: <string> the exception and stack trace.
+    """
+    cmd = one_script_dict['TEST_SCRIPT']
+    log_message = 'Test: %s got Exception %s' % (cmd, err_msg)
+    logger.warn(log_message)
+    # Here the exception must come from executing the test, since I can't
+    # decide what might be the cause here. Just fail it and keep going to
+    # the next test.
+    self.reporter.TestCaseReport(cmd, constants.ERROR)
+    self.error += 1
+    self._RecordHistory(one_script_dict, None, constants.ERROR)
+    self.cache_keys.pop(id(one_script_dict), None)
+    self.retries.pop(id(one_script_dict), None)
 
   def _CheckAndReportResult(self, one_script_dict, result):
     """Check and report test result to reporter.
@@ -399,6 +936,9 @@ class BaseRunner(pyreringutil.PyreRingFrameworkAdaptor):
     right way to do it. mode 256 will have no effect on positive values under
     256 which is desired. This is true on 32 bit system, not verified on 64 bit
     system yet.
+    A test which did not pass and went over one of its resource limits is
+    reported as LIMIT instead of FAIL or ERROR. A test which passed on a retry
+    is reported as FLAKY, which is not a failure.
 
     Args:
       one_script_dict: <dict> test case dictionary.
@@ -407,98 +947,277 @@ class BaseRunner(pyreringutil.PyreRingFrameworkAdaptor):
     Returns:
       Boolean: True if the test is not a pass.
     """
-    test_fail_flag = False
     cmd = one_script_dict['TEST_SCRIPT']
-    if result is None:
+    timing = self.timings.get(id(one_script_dict))
+    usage = None
+    if timing:
+      usage = timing[2]
+    status, breach = self._ResultStatus(one_script_dict, result, usage)
+    retried = self.retries.pop(id(one_script_dict), 0)
+    if status == constants.TIMEOUT:
       # If it is timeout, None is returned.
       logger.warn('Test: %s timeout' % cmd)
-      self.reporter.TestCaseReport(cmd, constants.TIMEOUT)
       self.timeout += 1
-      test_fail_flag = True
-    elif result == one_script_dict['EXPECTED_RETURN']%256:
-      # This is a pass.
+    elif status == constants.PASS and retried:
+      # It passed, but only after it failed.
+      logger.warn('Test: %s %d on retry %d' % (cmd, result, retried))
+      status = constants.FLAKY
+      self.flaky += 1
+      self.flaky_scripts.append(cmd)
+    elif status == constants.PASS:
       logger.info('Test: %s %d' % (cmd, result))
-      self.reporter.TestCaseReport(cmd, constants.PASS)
       self.passed += 1
-    elif result == one_script_dict['ERROR']%256:
+    elif status == constants.LIMIT:
+      logger.warn('Test: %s %d over limit %s' % (cmd, result, breach))
+      self.reporter.ExtraMessage('%s went over limit %s\n' % (cmd, breach))
+      self.limit += 1
+    elif status == constants.ERROR:
       # This is a test error.
       logger.warn('Test: %s %d' % (cmd, result))
-      self.reporter.TestCaseReport(cmd, constants.ERROR)
       self.error += 1
-      test_fail_flag = True
     else:
       logger.warn('Test: %s %d' % (cmd, result))
-      self.reporter.TestCaseReport(cmd, constants.FAIL)
       self.failed += 1
-      test_fail_flag = True
+    if retried and status != constants.FLAKY:
+      self.reporter.ExtraMessage('%s still %s after %d retries\n' %
+                                 (cmd, status, retried))
+    test_fail_flag = status not in [constants.PASS, constants.FLAKY]
+    # The resource usage of a test which was run is shown in the report.
+    msg = ''
+    if usage:
+      msg = str(usage)
+    self.reporter.TestCaseReport(cmd, status, msg)
+    self._RecordHistory(one_script_dict, result, status)
+    key = self.cache_keys.pop(id(one_script_dict), None)
+    if status == constants.PASS and key is not None:
+      self.result_cache.Store(key, result)
 
     return test_fail_flag
 
+  def _ResultStatus(self, one_script_dict, result, usage):
+    """Find the status of a test result, see _CheckAndReportResult.
+
+    Args:
+      one_script_dict: <dict> test case dictionary.
+      result: None/int based on the test return.
+      usage: None/resourceusage.ResourceUsage of the test.
+
+    Returns:
+      a tuple of the test result constant and the limit breached, None
+      unless the status is LIMIT.
+    """
+    if result is None:
+      return constants.TIMEOUT, None
+    if result == one_script_dict['EXPECTED_RETURN']%256:
+      return constants.PASS, None
+    breach = resourcelimits.FromConfig(one_script_dict).Breached(
+        result, usage, self.allocation_failures.get(id(one_script_dict)))
+    if breach:
+      return constants.LIMIT, breach
+    if result == one_script_dict['ERROR']%256:
+      return constants.ERROR, None
+    return constants.FAIL, None
+
+  def _RetryDelay(self, one_script_dict, result):
+    """Decide if a test case should run again before it is reported.
+
+    A FAIL or TIMEOUT test case is run again up to RETRIES times, or
+    max_retries times if RETRIES is not in its header.
+
+    Args:
+      one_script_dict: <dict> test case dictionary.
+      result: None/int the return code of the latest run of the test case.
+
+    Returns:
+      the seconds to wait before the test case runs again, None if it should
+      be reported.
+    """
+    retries = one_script_dict.get('RETRIES')
+    if retries is None:
+      retries = self.max_retries
+    retried = self.retries.get(id(one_script_dict), 0)
+    if retried >= retries:
+      return None
+    timing = self.timings.get(id(one_script_dict))
+    usage = None
+    if timing:
+      usage = timing[2]
+    status = self._ResultStatus(one_script_dict, result, usage)[0]
+    if status not in RETRIED_STATUSES:
+      return None
+    retried += 1
+    self.retries[id(one_script_dict)] = retried
+    delay = self.retry_backoff * 2 ** (retried - 1)
+    logger.warn('Test: %s %s, retry %d of %d in %.1f seconds' %
+                (one_script_dict['TEST_SCRIPT'], status, retried, retries,
+                 delay))
+    return delay
+
+  def _ZygoteCommand(self, cmd):
+    """Check if a test command can be run by the zygote.
+
+    It can if zygote is set and the command is an executable python script
+    given by path, with plain arguments the shell would pass on as they are.
+
+    Args:
+      cmd: <string> the test command.
+
+    Returns:
+      a tuple of the script and the list of its arguments, None if the command
+      has to be run by a shell.
+    """
+    if not self.use_zygote:
+      return None
+    if filesystemhandlerextend.HasShellSyntax(cmd):
+      return None
+    words = cmd.split()
+    script = words[0]
+    if ('/' not in script or not os.access(script, os.X_OK) or
+        not zygote.IsPythonScript(script)):
+      return None
+    return script, words[1:]
+
+  def _Zygote(self):
+    """Return the zygote, start it on first use or if it went away.
+
+    It is started with the environment of the tests, and imports the
+    zygote_preload modules, by default the top level modules of
+    python_lib_dir.
+    """
+    self.zygote_lock.acquire()
+    try:
+      if self.zygote is not None and not self.zygote.IsRunning():
+        logger.warning('zygote server went away, restarting it')
+        self.zygote.Stop()
+        self.zygote = None
+      if self.zygote is None:
+        preload = global_settings.get('zygote_preload')
+        if preload:
+          preload = [name.strip() for name in preload.split(',')
+                     if name.strip()]
+        else:
+          preload = zygote.FindModules(
+              global_settings.get('python_lib_dir', '').split(os.pathsep))
+        self.zygote = zygote.Zygote(preload, self.environment)
+        self.zygote.Start()
+      return self.zygote
+    finally:
+      self.zygote_lock.release()
+
   @DEBUG
-  def _CommandStreamer(self, cmd, args, time_out):
+  def _CommandStreamer(self, context, kill_on_fatal=False):
     """Run the run command with a timeout.
 
     This method will spawn a subshell to run the command and log the output to
-    the log_pipe.
+    the log_pipe. The output is scanned for FATAL_STRING and suspicious words
+    while the command runs.
 
     Args:
-      cmd: <string> the sys command to execute
-      args: <string> the args to follow the command
-      time_out: <int> a time limit for this cmd in seconds
+      context: a testcontext.TestContext with the command, its dir,
+        environment, timeout and limits.
+      kill_on_fatal: <boolean> kill the command as soon as a fatal string shows
+        up in its output, instead of waiting for it to finish.
 
     Returns:
-      the return code of the execution.
-    """
-    logger.info('-----running test %s %s... with timeout:%s' % (cmd, args,
-                                                                time_out))
-    # Back up current path.
-    current_path = os.getcwd()
-    # Run into a bug: if cmd = 'touch /pyrering.txt' and no args. Then
-    # os.path.split(cmd)[0] will return a head = 'touch' and try to
-    # ChDir(head), that will cause me problem. So in case the cmd already have
-    # some arguments enbed. split the cmd first.
-    head = os.path.split(cmd.split()[0])[0]
-    # Go to the script dir to run it locally.
-    if head:
-      self.filesystem.ChDir(head)
-
+      a tuple of the return code of the execution, the
+      resourceusage.ResourceUsage of the command and the first output line
+      telling a memory allocation failed, or None.
+    """
+    cmd = context.command
+    logger.info('-----running test %s... with timeout:%s' % (cmd,
+                                                             context.timeout))
+    scanner, monitor, stopped = self._OutputMonitor(kill_on_fatal)
+
+    # Now run the test and collect return code and output message.
+    message = outputspool.OutputSpool(self.output_memory_cap)
+    zygote_command = self._ZygoteCommand(cmd)
     try:
-      # Now run the test and collect return code and output message.
-      ret, message = self.filesystem.RunCommandToLoggerWithTimeout(
-          cmd, time_out)
-      fatal_strings = global_settings.get('FATAL_STRING').split(',')
-      # This is to check if the screen output contains any FATAL_STRING, then
-      # test should be failed automatically, no matter what is the return code.
-      for line in message.splitlines():
-        if not ret:
-          for fatal_string in fatal_strings:
-            if fatal_string and fatal_string in line:
-              ret = -1
-              self.reporter.ExtraMessage('%s failed by fatal string:\n\t%s\n' %
-                                         (cmd, line))
-              logger.warn('%s failed by fatal string:\n\t%s' % (cmd, line))
-              break
-        else:
-          for catch_string in CATCHING_LIST:
-            # Catch suspicious output messages to log and reporter.
-            if catch_string.search(line):
-              self.reporter.ExtraMessage('%s:\n\t%s\n' % (cmd, line))
-              logger.warn('Caught one suspicous string: %s')
-              break
-
-      logger.info('-----completed test %s %s with return code %s' % (cmd,
-                                                                     args,
-                                                                     ret))
-
-      # If file_errors is True, create a separate output file for each non zero
-      # return code.
-      if self.file_errors and ret <> 0:
-        test_cmd = cmd.split()[0]
-        testcase = os.path.basename(test_cmd)
-        path = os.path.join(global_settings['report_dir'], testcase) + '.out'
-        self.reporter.SendTestOutput(path, testcase, message)
+      if zygote_command:
+        script, script_args = zygote_command
+        ret, message, usage = self._Zygote().RunScriptToLoggerWithTimeout(
+            script, script_args, context.timeout, context.cwd, message,
+            monitor, context.limits, context.kill_grace, context.environment)
+      else:
+        ret, message, usage = self.filesystem.RunCommandToLoggerWithTimeout(
+            cmd, context.timeout, context.cwd, message, monitor,
+            context.limits, context.kill_grace, context.environment)
+      ret = self._CheckOutput(cmd, ret, message, usage, scanner, stopped)
     finally:
-      self.filesystem.ChDir(current_path)
+      message.Close()
+    return ret, usage, scanner.allocation_line
+
+  def _OutputMonitor(self, kill_on_fatal):
+    """Make a monitor to scan the output of a test while it runs.
+
+    Args:
+      kill_on_fatal: <boolean> the monitor asks to kill the test as soon as a
+        fatal string shows up in its output.
+
+    Returns:
+      a tuple of the outputmatcher.OutputScanner, the monitor, a callable
+      taking one chunk of output and returning True to kill the test, and a
+      list which is not empty once the monitor asked to kill the test.
+    """
+    scanner = outputmatcher.OutputScanner(
+        outputmatcher.GetMatcher(global_settings.get('FATAL_STRING')))
+    # Set to True if the command is killed by a fatal string.
+    stopped = []
+
+    def Monitor(mesg):
+      """Scan one chunk of output, return True to kill the command."""
+      scanner.Feed(mesg)
+      if kill_on_fatal and scanner.fatal_line is not None:
+        stopped.append(True)
+        return True
+      return False
+    return scanner, Monitor, stopped
+
+  def _CheckOutput(self, cmd, ret, message, usage, scanner, stopped):
+    """Check the output of a finished test for fatal and suspicious lines.
+
+    Args:
+      cmd: <string> the test command.
+      ret: the return code of the test, None if it timed out.
+      message: the outputspool.OutputSpool with the output of the test.
+      usage: the resourceusage.ResourceUsage of the test.
+      scanner: the outputmatcher.OutputScanner from _OutputMonitor.
+      stopped: the list from _OutputMonitor.
+
+    Returns:
+      the return code of the test, -1 if it is failed by a fatal string.
+    """
+    scanner.Finish()
+    # If the screen output contains any FATAL_STRING, the test should be
+    # failed automatically, no matter what is the return code. After that,
+    # or if the test failed anyway, suspicious lines are reported.
+    suspicious_after = -1
+    if (not ret or stopped) and scanner.fatal_line is not None:
+      suspicious_after, line = scanner.fatal_line
+      ret = -1
+      self.reporter.ExtraMessage('%s failed by fatal string:\n\t%s\n' %
+                                 (cmd, line))
+      logger.warn('%s failed by fatal string:\n\t%s' % (cmd, line))
+      if stopped:
+        logger.warn('%s killed by fatal string' % cmd)
+    if ret:
+      for line in scanner.SuspiciousLines(suspicious_after):
+        # Catch suspicious output messages to log and reporter.
+        self.reporter.ExtraMessage('%s:\n\t%s\n' % (cmd, line))
+        logger.warn('Caught one suspicous string: %s' % line)
+      if scanner.suspicious_dropped:
+        self.reporter.ExtraMessage('%s: %d more suspicious lines\n' %
+                                   (cmd, scanner.suspicious_dropped))
+
+    logger.info('-----completed test %s with return code %s' % (cmd, ret))
+    logger.info('-----resource usage of test %s: %s' % (cmd, usage))
+
+    # If file_errors is True, create a separate output file for each non
+    # zero return code.
+    if self.file_errors and ret <> 0:
+      test_cmd = cmd.split()[0]
+      testcase = os.path.basename(test_cmd)
+      path = os.path.join(global_settings['report_dir'], testcase) + '.out'
+      self.reporter.SendTestOutput(path, testcase, message)
     return ret
 
   @DEBUG
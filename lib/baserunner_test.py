@@ -35,6 +35,8 @@ from lib import mock_reporter
 from lib import mock_scanscripts
 from lib import pyreringconfig
 from lib import pyreringutil
+from lib import sharding
+from lib import testhistory
 
 global_settings = pyreringconfig.GlobalPyreRingConfig.settings
 
@@ -230,6 +232,17 @@ class BaseRunnerTest(unittest.TestCase):
     self.assertEqual(result, 1)
     self.assertEqual(self.runner.failed, 1)
 
+  def testKillOnFatalMessage(self):
+    """A test with KILL_ON_FATAL is killed once a fatal string shows up."""
+    self.one_config['TEST_SCRIPT'] = 'echo Fatal:;sleep 10'
+    self.one_config['KILL_ON_FATAL'] = True
+    self.scanner.SetConfig([self.one_config])
+    start_time = time.time()
+    result = self.runner.Run(['testKillOnFatalMessage'], False)
+    self.assertTrue(time.time() - start_time < 5)
+    self.assertEqual(result, 1)
+    self.assertEqual(self.runner.failed, 1)
+
   def testOutputLargeMessage(self):
     """Test a test can have large screen output.
 
@@ -287,6 +300,443 @@ class BaseRunnerTest(unittest.TestCase):
     self.assertEqual(result, 4)
     self.assertEqual(self.runner.failed, 4)
 
+  def testFileErrorsWithSpooledOutput(self):
+    """A failing test output over the memory cap is filed in full."""
+    global_settings['file_errors'] = True
+    global_settings['output_memory_cap'] = 100
+    runner = baserunner.BaseRunner(
+        name='test',
+        scanner=self.scanner,
+        email_message=self.emailmessage,
+        filesystem=filesystemhandlerextend.FileSystemHandlerExtend(),
+        reporter=self.reporter)
+    runner.Prepare()
+    self.one_config['TEST_SCRIPT'] = (
+        'i=0; while [ $i -lt 100 ]; do echo line $i; i=$((i+1)); done; exit 1')
+    self.scanner.SetConfig([self.one_config])
+    result = runner.Run(['testFileErrorsWithSpooledOutput'], False)
+    self.assertEqual(result, 1)
+    output_file = os.path.join(global_settings['report_dir'], 'i=0;.out')
+    lines = open(output_file).read().splitlines()
+    self.assertEqual(lines[0], 'i=0;')
+    self.assertEqual(lines[-1], 'line 99')
+
+  def testHistoryRecorded(self):
+    """Each test result is appended to the history with its duration."""
+    config_list = []
+    for script in ['sleep 1', 'exit 1']:
+      one_config = pyreringutil.PRConfigParser().Default()
+      one_config['TEST_SCRIPT'] = script
+      config_list.append(one_config)
+    self.scanner.SetConfig(config_list)
+    self.runner.Run(['testHistoryRecorded'], False)
+    records = testhistory.TestHistory(os.path.join(
+        global_settings['report_dir'], testhistory.HISTORY_FILE)).Read()
+    self.assertEqual([(one.script, one.return_code, one.status)
+                      for one in records],
+                     [('sleep 1', 0, 'PASS'), ('exit 1', 1, 'FAIL')])
+    self.assertTrue(records[0].duration >= 1)
+    self.assertTrue(records[1].duration < 1)
+    self.assertEqual(records[0].host, 'test.host')
+    self.assertEqual(records[0].run_id, records[1].run_id)
+
+  def testFlakyRetried(self):
+    """A test passing on a retry is FLAKY, which is not a failure."""
+    mark = os.path.join(self.tempdir, 'mark')
+    self.one_config['TEST_SCRIPT'] = ('test -f %s && exit 0; touch %s; exit 1'
+                                      % (mark, mark))
+    self.one_config['RETRIES'] = 2
+    self.scanner.SetConfig([self.one_config])
+    self.assertEqual(self.runner.Run(['testFlakyRetried'], False), 0)
+    self.assertEqual((self.runner.flaky, self.runner.failed), (1, 0))
+    records = testhistory.TestHistory(os.path.join(
+        global_settings['report_dir'], testhistory.HISTORY_FILE)).Read()
+    self.assertEqual([one.status for one in records], ['FLAKY'])
+    self.assertTrue('FLAKY in 1 of its latest 1 runs' in
+                    ''.join(self.reporter.extra))
+
+  def testRetriesRunOutWithBackoff(self):
+    """A test failing every retry is reported once, after max_retries."""
+    global_settings['max_retries'] = 2
+    global_settings['retry_backoff'] = 0.2
+    config2 = pyreringutil.PRConfigParser().Default()
+    config2['TEST_SCRIPT'] = 'exit 255'
+    self.one_config['TEST_SCRIPT'] = 'exit 1'
+    self.scanner.SetConfig([self.one_config, config2])
+    runner = self._ConcurrentRunner(2)
+    start_time = time.time()
+    self.assertEqual(runner.Run(['testRetriesRunOut'], False), 2)
+    # The backoff waits 0.2 and 0.4 seconds, ERROR is not retried.
+    self.assertTrue(time.time() - start_time >= 0.6)
+    self.assertEqual((runner.failed, runner.error, runner.flaky), (1, 1, 0))
+    self.assertTrue('exit 1 still FAIL after 2 retries' in
+                    ''.join(self.reporter.extra))
+
+  def testResourceUsageReported(self):
+    """The resource usage of a test goes to the report and the history."""
+    self.one_config['TEST_SCRIPT'] = ('i=0; while [ $i -lt 10000 ]; '
+                                      'do i=$((i+1)); done')
+    self.scanner.SetConfig([self.one_config])
+    self.runner.Run(['testResourceUsageReported'], False)
+    self.assertTrue('max rss' in ''.join(self.reporter.body))
+    records = testhistory.TestHistory(os.path.join(
+        global_settings['report_dir'], testhistory.HISTORY_FILE)).Read()
+    self.assertTrue(records[0].usage.max_rss_kb > 0)
+
+  def testCpuTimeoutReportedAsLimit(self):
+    """A test killed by its CPU time limit is LIMIT rather than FAIL."""
+    self.one_config['TEST_SCRIPT'] = 'while true; do :; done'
+    self.one_config['CPU_TIMEOUT'] = 1
+    self.scanner.SetConfig([self.one_config])
+    result = self.runner.Run(['testCpuTimeoutReportedAsLimit'], False)
+    self.assertEqual(result, 1)
+    self.assertEqual(self.runner.failed, 0)
+    self.assertEqual(self.runner.limit, 1)
+    self.assertTrue('CPU_TIMEOUT 1' in ''.join(self.reporter.extra))
+
+  def testAddressSpaceLimitReportedAsLimit(self):
+    """A test failing to allocate under MAX_RSS_MB is LIMIT at a low rss."""
+    self.one_config['TEST_SCRIPT'] = (
+        'python -c "x = \' \' * (512 * 1024 * 1024)"')
+    self.one_config['MAX_RSS_MB'] = 256
+    self.scanner.SetConfig([self.one_config])
+    result = self.runner.Run(['testAddressSpaceLimitReportedAsLimit'], False)
+    self.assertEqual(result, 1)
+    self.assertEqual(self.runner.failed, 0)
+    self.assertEqual(self.runner.limit, 1)
+    self.assertTrue('allocation failed' in ''.join(self.reporter.extra))
+
+  def testZygoteRunsPythonScripts(self):
+    """Python scripts are forked from the zygote, with its modules loaded."""
+    global_settings['zygote'] = True
+    global_settings['zygote_preload'] = 'xml.dom.minidom'
+    runner = baserunner.BaseRunner(
+        name='test',
+        scanner=self.scanner,
+        email_message=self.emailmessage,
+        filesystem=filesystemhandlerextend.FileSystemHandlerExtend(),
+        reporter=self.reporter)
+    runner.Prepare()
+    script = os.path.join(self.tempdir, 'preloaded.py')
+    script_file = open(script, 'w')
+    script_file.write('#!%s\nimport sys\n'
+                      'sys.exit("xml.dom.minidom" not in sys.modules)\n' %
+                      sys.executable)
+    script_file.close()
+    os.chmod(script, 0755)
+    self.one_config['TEST_SCRIPT'] = script
+    shell_config = pyreringutil.PRConfigParser().Default()
+    # A new interpreter runs it in a shell, without the module.
+    shell_config['TEST_SCRIPT'] = '%s; exit $?' % script
+    shell_config['EXPECTED_RETURN'] = 1
+    self.scanner.SetConfig([self.one_config, shell_config])
+    result = runner.Run(['testZygoteRunsPythonScripts'], False)
+    self.assertEqual(result, 0)
+    self.assertEqual(runner.passed, 2)
+    self.assertEqual(runner.zygote, None)
+
+  def testZygoteRestarted(self):
+    """A zygote server which went away is started again on next use."""
+    global_settings['zygote'] = True
+    global_settings['zygote_preload'] = 'xml.dom.minidom'
+    runner = baserunner.BaseRunner(
+        name='test',
+        scanner=self.scanner,
+        email_message=self.emailmessage,
+        filesystem=filesystemhandlerextend.FileSystemHandlerExtend(),
+        reporter=self.reporter)
+    runner.Prepare()
+    try:
+      first = runner._Zygote()
+      first.server.kill()
+      first.server.wait()
+      second = runner._Zygote()
+      self.assertFalse(second is first)
+      self.assertTrue(second.IsRunning())
+      script = os.path.join(self.tempdir, 'restarted.py')
+      script_file = open(script, 'w')
+      script_file.write('print "restarted"\n')
+      script_file.close()
+      ret, output, unused_usage = second.RunScriptToLoggerWithTimeout(
+          script, [], 10)
+      self.assertEqual(ret, 0)
+      self.assertEqual(output.getvalue(), 'restarted\n')
+    finally:
+      runner.zygote.Stop()
+
+  def testEnvironmentPassedToTests(self):
+    """Tests get the test environment, os.environ is left alone."""
+    before = dict(os.environ)
+    self.one_config['TEST_SCRIPT'] = (
+        'test "$source_dir" = "%s"' % global_settings['source_dir'])
+    self.scanner.SetConfig([self.one_config])
+    result = self.runner.Run(['testEnvironmentPassedToTests'], False)
+    self.assertEqual(result, 0)
+    self.assertEqual(dict(os.environ), before)
+
+  def testCachedPassNotRun(self):
+    """A CACHEABLE test which passed is not run again, unless no_cache."""
+    global_settings['result_cache'] = os.path.join(self.tempdir, 'cache')
+    script = os.path.join(self.tempdir, 'check.sh')
+    script_file = open(script, 'w')
+    script_file.write('echo run >> %s.count\n' % script)
+    script_file.close()
+    os.chmod(script, 0755)
+    self.one_config['TEST_SCRIPT'] = script
+    self.one_config['CACHEABLE'] = True
+    self.scanner.SetConfig([self.one_config])
+    runs = []
+    for no_cache in [False, False, True]:
+      global_settings['no_cache'] = no_cache
+      runner = baserunner.BaseRunner(
+          name='test',
+          scanner=self.scanner,
+          email_message=self.emailmessage,
+          filesystem=filesystemhandlerextend.FileSystemHandlerExtend(),
+          reporter=self.reporter)
+      runner.Prepare()
+      self.assertEqual(runner.Run(['testCachedPassNotRun'], False), 0)
+      self.assertEqual(runner.passed, 1)
+      runs.append(len(open(script + '.count').readlines()))
+    self.assertEqual(runs, [1, 1, 2])
+
+  def testLongestExpectedFirst(self):
+    """Concurrent tests are started longest expected first."""
+    global_settings['default_duration'] = 5
+    history = testhistory.TestHistory(
+        os.path.join(global_settings['report_dir'], testhistory.HISTORY_FILE),
+        'old_run', 'other.host')
+    history.Record('short', 0, 1, 0, 'PASS')
+    history.Record('long', 0, 10, 0, 'PASS')
+    history.Record('local', 0, 100, 0, 'PASS')
+    history.host = 'test.host'
+    history.Record('local', 0, 2, 0, 'PASS')
+    history.Flush()
+    runner = self._ConcurrentRunner(2)
+    script_list = []
+    for script in ['short', 'new', 'local', 'long']:
+      one_config = pyreringutil.PRConfigParser().Default()
+      one_config['TEST_SCRIPT'] = script
+      script_list.append(one_config)
+    self.assertEqual([one['TEST_SCRIPT']
+                      for one in runner._LongestFirst(script_list)],
+                     ['long', 'new', 'local', 'short'])
+
+  def testShardKeepsSetup(self):
+    """Only the shard of a suite runs, SETUP runs on every shard."""
+    global_settings['total_shards'] = 2
+    script_list = []
+    for number in range(10):
+      one_config = pyreringutil.PRConfigParser().Default()
+      one_config['TEST_SCRIPT'] = 'echo %d' % number
+      script_list.append(one_config)
+    self.scanner.SetConfig(script_list)
+    self.scanner.SetConfig(script_list, 'setup')
+    ran = 0
+    for index in range(2):
+      global_settings['shard_index'] = index
+      runner = baserunner.BaseRunner(
+          name='test',
+          scanner=self.scanner,
+          email_message=self.emailmessage,
+          filesystem=filesystemhandlerextend.FileSystemHandlerExtend(),
+          reporter=self.reporter)
+      runner.Prepare()
+      runner._RunSingleSuite('testShardKeepsSetup')
+      shard_passed = runner.passed
+      self.assertTrue(0 < shard_passed < 10)
+      ran += shard_passed
+      runner._RunSingleSuite('SETUP.sh')
+      self.assertEqual(runner.passed - shard_passed, 10)
+    self.assertEqual(ran, 10)
+
+  def testDurationShardsIgnoreLocalHistory(self):
+    """Shards with different histories split by the same durations file."""
+    global_settings['total_shards'] = 2
+    global_settings['shard_method'] = 'duration'
+    script_list = []
+    durations = {}
+    for number in range(10):
+      one_config = pyreringutil.PRConfigParser().Default()
+      one_config['TEST_SCRIPT'] = os.path.join(
+          global_settings['source_dir'], 'test%d.sh' % number)
+      script_list.append(one_config)
+      durations['test%d.sh' % number] = number
+    durations_file = os.path.join(self.tempdir, 'durations')
+    sharding.WriteDurations(durations_file, durations)
+    global_settings['shard_durations'] = durations_file
+    seen = []
+    for index in range(2):
+      global_settings['shard_index'] = index
+      global_settings['report_dir'] = os.path.join(self.tempdir,
+                                                   'report%d' % index)
+      os.makedirs(global_settings['report_dir'])
+      # Each host only recorded the tests of its own shard.
+      history = testhistory.TestHistory(
+          os.path.join(global_settings['report_dir'],
+                       testhistory.HISTORY_FILE), 'old_run', 'host%d' % index)
+      for one_config in script_list[index::2]:
+        history.Record(one_config['TEST_SCRIPT'], 0, 100 * index, 0, 'PASS')
+      history.Flush()
+      runner = baserunner.BaseRunner(
+          name='test',
+          scanner=self.scanner,
+          email_message=self.emailmessage,
+          filesystem=filesystemhandlerextend.FileSystemHandlerExtend(),
+          reporter=self.reporter)
+      runner.Prepare()
+      shard = runner._Shard(script_list)
+      self.assertTrue(shard)
+      seen.extend([one_config['TEST_SCRIPT'] for one_config in shard])
+    self.assertEqual(sorted(seen),
+                     sorted([one_config['TEST_SCRIPT']
+                             for one_config in script_list]))
+
+  def testDurationShardWithoutFileByHash(self):
+    """Without a durations file the duration shards are split by hash."""
+    global_settings['total_shards'] = 2
+    global_settings['shard_method'] = 'duration'
+    runner = baserunner.BaseRunner(
+        name='test',
+        scanner=self.scanner,
+        email_message=self.emailmessage,
+        filesystem=filesystemhandlerextend.FileSystemHandlerExtend(),
+        reporter=self.reporter)
+    runner.Prepare()
+    self.assertEqual(runner.shard_method, 'hash')
+
+  def testRerunFailed(self):
+    """Only the tests failed in the last run run again, with setup."""
+    history = testhistory.TestHistory(
+        os.path.join(global_settings['report_dir'], testhistory.HISTORY_FILE),
+        'old_run', 'test.host')
+    history.Record('exit 0', 0, 1, 0, 'PASS')
+    history.Record('exit 1', 0, 1, 1, 'FAIL')
+    history.Record('exit 2', 0, 1, None, 'TIMEOUT')
+    history.Flush()
+    global_settings['rerun_failed'] = True
+    global_settings['setup_suite'] = 'SETUP.sh'
+    config_list = []
+    for script in ['exit 0', 'exit 1', 'exit 2', 'exit 3']:
+      one_config = pyreringutil.PRConfigParser().Default()
+      one_config['TEST_SCRIPT'] = script
+      config_list.append(one_config)
+    self.scanner.SetConfig(config_list)
+    self.scanner.SetConfig([config_list[0]], 'setup')
+    runner = baserunner.BaseRunner(
+        name='test',
+        scanner=self.scanner,
+        email_message=self.emailmessage,
+        filesystem=filesystemhandlerextend.FileSystemHandlerExtend(),
+        reporter=self.reporter)
+    runner.Prepare()
+    self.assertEqual(runner.setup_suite, ['SETUP.sh'])
+    self.assertEqual(runner.Run(['testRerunFailed'], False), 2)
+    # The one SETUP.sh suite and the two failed tests.
+    self.assertEqual(runner.passed, 1)
+    self.assertEqual(runner.failed, 2)
+
+  def testChangedSinceReference(self):
+    """changed_since is a run id, the last run or a time."""
+    history = testhistory.TestHistory(
+        os.path.join(global_settings['report_dir'], testhistory.HISTORY_FILE),
+        'old_run', 'test.host')
+    history.Record('exit 0', 100, 1, 0, 'PASS')
+    history.run_id = 'other_run'
+    history.host = 'other.host'
+    history.Record('exit 0', 200, 1, 0, 'PASS')
+    history.Flush()
+    self.assertEqual(self.runner._ReferenceTime('old_run'), 100)
+    self.assertEqual(self.runner._ReferenceTime('other_run'), 200)
+    self.assertEqual(self.runner._ReferenceTime('last'), 100)
+    self.assertEqual(self.runner._ReferenceTime('1234.5'), 1234.5)
+    self.assertRaises(ValueError, self.runner._ReferenceTime, 'no_run')
+
+  def _ConcurrentRunner(self, jobs):
+    """Return a runner which runs tests on a pool of jobs threads."""
+    global_settings['jobs'] = jobs
+    runner = baserunner.BaseRunner(
+        name='test',
+        scanner=self.scanner,
+        email_message=self.emailmessage,
+        filesystem=filesystemhandlerextend.FileSystemHandlerExtend(),
+        reporter=self.reporter)
+    runner.Prepare()
+    return runner
+
+  def testConcurrentRun(self):
+    """Tests run at the same time when jobs is more than 1."""
+    config_list = []
+    for unused_count in range(4):
+      one_config = pyreringutil.PRConfigParser().Default()
+      one_config['TEST_SCRIPT'] = 'sleep 2'
+      config_list.append(one_config)
+    config_list[-1]['TEST_SCRIPT'] = 'sleep 2; exit 1'
+    self.scanner.SetConfig(config_list)
+    runner = self._ConcurrentRunner(4)
+    start_time = time.time()
+    result = runner.Run(['testConcurrentRun'], False)
+    self.assertTrue(time.time() - start_time < 7)
+    self.assertEqual(result, 1)
+    self.assertEqual(runner.passed, 3)
+    self.assertEqual(runner.failed, 1)
+
+  def testInterruptedConcurrentRunReported(self):
+    """The tests killed by an interrupt are reported as ERROR."""
+    self.one_config['TEST_SCRIPT'] = 'exit 0'
+    slow_config = pyreringutil.PRConfigParser().Default()
+    slow_config['TEST_SCRIPT'] = 'sleep 30'
+    runner = self._ConcurrentRunner(2)
+    report_finished = runner._ReportFinished
+    interrupted = []
+
+    def ReportAndInterrupt(*args):
+      fail_flag = report_finished(*args)
+      if not interrupted:
+        interrupted.append(True)
+        raise KeyboardInterrupt
+      return fail_flag
+    runner._ReportFinished = ReportAndInterrupt
+    start_time = time.time()
+    self.assertRaises(KeyboardInterrupt, runner._RunScriptsConcurrently,
+                      [self.one_config, slow_config], {})
+    self.assertTrue(time.time() - start_time < 10)
+    self.assertEqual(runner.passed, 1)
+    self.assertEqual(runner.error, 1)
+    self.assertFalse(runner.filesystem.running_groups.groups)
+
+  def testLaneWaitsReported(self):
+    """The suite report shows how long each lane waited."""
+    config_list = []
+    for unused_count in range(3):
+      one_config = pyreringutil.PRConfigParser().Default()
+      one_config['TEST_SCRIPT'] = 'sleep 1'
+      one_config['NFS'] = True
+      config_list.append(one_config)
+    self.scanner.SetConfig(config_list)
+    global_settings['nfs_jobs'] = 1
+    runner = self._ConcurrentRunner(3)
+    self.assertEqual(runner.Run(['testLaneWaitsReported'], False), 0)
+    body = ''.join(self.reporter.body)
+    self.assertTrue('lane waits: nfs 3 tests' in body)
+
+  def testConcurrentRunSerialLane(self):
+    """CONCURRENT False tests still run, one at a time."""
+    self.one_config['TEST_SCRIPT'] = 'exit 0'
+    config2 = pyreringutil.PRConfigParser().Default()
+    config2['TEST_SCRIPT'] = 'echo Fatal:'
+    config2['CONCURRENT'] = False
+    config3 = pyreringutil.PRConfigParser().Default()
+    config3['TEST_SCRIPT'] = 'exit 255'
+    config3['CONCURRENT'] = False
+    self.scanner.SetConfig([self.one_config, config2, config3])
+    runner = self._ConcurrentRunner(2)
+    result = runner.Run(['testConcurrentRunSerialLane'], False)
+    self.assertEqual(result, 2)
+    self.assertEqual(runner.passed, 1)
+    self.assertEqual(runner.failed, 1)
+    self.assertEqual(runner.error, 1)
+
 
 if __name__ == '__main__':
   unittest.main()
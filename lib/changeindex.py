@@ -0,0 +1,162 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""An on disk index of when the content of files last changed.
+
+The class ChangeIndex keeps, for each file it has looked at, the signature of
+the file (mtime, size, inode and device), the md5 of its content and the time
+that content was first seen. A file whose signature has not changed is not
+read again. A file whose signature changed is hashed, and only a different md5
+moves its change time, so touching a file or copying it back does not make it
+changed.
+
+A file the index has never seen is taken as changed at its mtime. A file
+which is gone or can not be read is taken as changed now.
+
+The index is a persistentdict.PersistentDict, so runs on the same host can
+share it.
+"""
+
+import logging
+import time
+
+from lib import common_util
+from lib import filesystemhandlerextend
+from lib import persistentdict
+
+try:
+  import hashlib
+  _md5 = hashlib.md5
+except ImportError:
+  import md5
+  _md5 = md5.new
+
+logger = logging.getLogger('PyreRing')
+DEBUG = common_util.DebugLog
+
+# Bump it whenever the entries are kept differently, so old entries are
+# dropped.
+FORMAT_VERSION = 1
+# Files modified less than this many seconds before the scan are hashed again
+# on the next scan, their signature could hide a change in the same second.
+RACY_WINDOW = 2
+# The size of the blocks files are hashed by.
+READ_SIZE = 64 * 1024
+
+
+def _HashFile(path):
+  """Return the md5 of the content of a file.
+
+  Raises:
+    IOError: if the file can not be read.
+  """
+  digest = _md5()
+  data_file = open(path, 'rb')
+  try:
+    data = data_file.read(READ_SIZE)
+    while data:
+      digest.update(data)
+      data = data_file.read(READ_SIZE)
+  finally:
+    data_file.close()
+  return digest.hexdigest()
+
+
+class ChangeIndex(object):
+  """The content change time of files, keyed by path."""
+
+  def __init__(self, index_file,
+               filesystem=filesystemhandlerextend.FileSystemHandlerExtend()):
+    """Init the index, the index file is read on the first lookup.
+
+    Args:
+      index_file: the path of the index file.
+      filesystem: a FileSystemHandlerExtend object to stat the files.
+    """
+    self.filesystem = filesystem
+    self.store = persistentdict.PersistentDict(index_file, FORMAT_VERSION)
+    self.entries = None
+    # The entries added since the last Save.
+    self.changes = {}
+    self.start_time = time.time()
+    self.hashed = 0
+
+  def _Entries(self):
+    if self.entries is None:
+      self.entries = self.store.Load()
+    return self.entries
+
+  def ChangeTime(self, path):
+    """Find the time the content of a file last changed.
+
+    Args:
+      path: the path of the file.
+
+    Returns:
+      a float of seconds since epoch.
+    """
+    try:
+      stat = self.filesystem.Stat(path)
+    except OSError:
+      return self.start_time
+    signature = (stat.st_mtime, stat.st_size, stat.st_ino, stat.st_dev)
+    entry = self._Entries().get(path)
+    if entry is not None and entry[0] == signature:
+      return entry[2]
+    try:
+      digest = _HashFile(path)
+    except IOError:
+      return self.start_time
+    self.hashed += 1
+    if entry is None:
+      change_time = stat.st_mtime
+    elif entry[1] == digest:
+      change_time = entry[2]
+    else:
+      # It changed after it was last checked, even if its mtime is older.
+      change_time = max(stat.st_mtime, entry[3])
+    if stat.st_mtime > self.start_time - RACY_WINDOW:
+      signature = None
+    entry = (signature, digest, change_time, self.start_time)
+    self.entries[path] = entry
+    self.changes[path] = entry
+    return change_time
+
+  def ChangedSince(self, paths, reference_time):
+    """Return True if any of the files changed after a time.
+
+    Args:
+      paths: a list of file paths.
+      reference_time: a float of seconds since epoch.
+    """
+    for path in paths:
+      if self.ChangeTime(path) > reference_time:
+        return True
+    return False
+
+  @DEBUG
+  def Save(self):
+    """Merge the new entries into the index file."""
+    if not self.changes:
+      return
+    logger.debug('change index: %d files hashed' % self.hashed)
+    try:
+      self.entries = self.store.Update(self.changes)
+    except (IOError, OSError), e:
+      # The index only saves time, the next scan hashes the files again.
+      logger.warning('failed to save change index %s: %s' %
+                     (self.store.path, e))
+    self.changes = {}
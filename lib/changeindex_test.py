@@ -0,0 +1,91 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unittest for changeindex module."""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from lib import changeindex
+
+
+class ChangeIndexTest(unittest.TestCase):
+  """Unit test cases for ChangeIndex class."""
+
+  def setUp(self):
+    self.tempdir = tempfile.mkdtemp()
+    self.index_file = os.path.join(self.tempdir, 'change_index')
+    self.path = os.path.join(self.tempdir, 'data.txt')
+
+  def tearDown(self):
+    shutil.rmtree(self.tempdir)
+
+  def _Write(self, content, age):
+    """Write the file, modified age seconds ago."""
+    data_file = open(self.path, 'w')
+    data_file.write(content)
+    data_file.close()
+    mtime = int(time.time()) - age
+    os.utime(self.path, (mtime, mtime))
+    return mtime
+
+  def _Index(self):
+    """Return a new index, as a new run would."""
+    return changeindex.ChangeIndex(self.index_file)
+
+  def testNewFileChangedAtMtime(self):
+    """A file never seen changed at its mtime, and is not hashed again."""
+    mtime = self._Write('one', 100)
+    index = self._Index()
+    self.assertEqual(index.ChangeTime(self.path), mtime)
+    index.Save()
+    index = self._Index()
+    self.assertEqual(index.ChangeTime(self.path), mtime)
+    self.assertEqual(index.hashed, 0)
+
+  def testTouchIsNotAChange(self):
+    """A new mtime with the same content keeps the change time."""
+    mtime = self._Write('one', 100)
+    index = self._Index()
+    index.ChangeTime(self.path)
+    index.Save()
+    self._Write('one', 50)
+    index = self._Index()
+    self.assertEqual(index.ChangeTime(self.path), mtime)
+    self.assertEqual(index.hashed, 1)
+
+  def testOldMtimeChangeFound(self):
+    """New content is a change after the last check, whatever its mtime."""
+    self._Write('one', 100)
+    index = self._Index()
+    index.ChangeTime(self.path)
+    index.Save()
+    self._Write('two', 200)
+    reference_time = time.time() - 10
+    index = self._Index()
+    self.assertTrue(index.ChangedSince([self.path], reference_time))
+
+  def testMissingFileChanged(self):
+    """A file which is gone is changed now."""
+    index = self._Index()
+    self.assertTrue(index.ChangedSince([self.path], time.time() - 10))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -22,6 +22,8 @@ __author__ = 'mwu@google.com (Mingyu Wu)'
 
 
 import logging
+import os
+import time
 
 logger = logging.getLogger('PyreRing')
 
@@ -40,3 +42,19 @@ def DebugLog(f, name=None):
     logger.debug('results are: %s' % str(result))
     return result
   return Debug
+
+
+def MonotonicTime():
+  """Return a time in seconds which never goes backwards.
+
+  time.time() jumps when the system clock is set, so it should not be used to
+  measure timeouts. time.monotonic() is used when the python version has it,
+  otherwise the elapsed real time of os.times() which comes from the same
+  monotonic kernel clock with a resolution of a clock tick.
+
+  Returns:
+    a float of seconds from some fixed point in the past.
+  """
+  if hasattr(time, 'monotonic'):
+    return time.monotonic()
+  return os.times()[4]
@@ -27,5 +27,9 @@ FAIL = 'FAIL'
 TIMEOUT = 'TIMEOUT'
 NOTRUN = 'NOT_RUN'
 ERROR = 'ERROR'
+# The test went over one of its resource limits.
+LIMIT = 'LIMIT'
+# The test failed, then passed when it was run again.
+FLAKY = 'FLAKY'
 
 # PyreRing config file constants
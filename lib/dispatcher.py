@@ -0,0 +1,447 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A dispatcher to run a list of test scripts on a pool of worker threads.
+
+The Dispatcher class takes a list of test config dictionaries, as returned by
+ScanScripts.BaseScan, and runs them with a given run function on at most 'jobs'
+worker threads at a time. Scripts with CONCURRENT set to False are put in a
+serial lane and scripts with ROOT_ACCESS set to True in a root_access lane:
+they only start when nothing else is running and nothing else starts while
+they run. Scripts with NFS set to True are put in an nfs lane, where at most
+nfs_jobs of them run at the same time, so they don't saturate the filer.
+Other scripts are in the default lane. The time each script waited to start,
+since it was queued or requeued, is summed up for each lane. The report
+function can Requeue a finished script to run it again, after a delay, while
+the other scripts keep running. If Run is interrupted, nothing more is started
+and the abort function kills the scripts still running before the worker
+threads are joined. The killed scripts are then reported with the interrupt
+as their error message.
+
+Each script also takes a number of slots out of a slot budget, given by the
+weight of its SIZE, for example SMALL=1, MEDIUM=4 and LARGE=all. A script
+only starts when its slots are free. Scripts start in their order: once a
+pending script waits for slots or to run alone, the scripts after it wait
+too, so a steady supply of small scripts can not starve a large one. Only a
+script waiting for its lane, like the nfs lane, lets the others pass. A
+script weighing more than the budget runs alone.
+
+All bookkeeping and the report function are called in the thread which called
+Dispatcher.Run, so the caller does not need to lock its own counters. The
+worker threads only execute the run function. A subclass can run the scripts
+some other way by overriding _Launch and _WaitForOne, keeping the same limits.
+"""
+
+import heapq
+import itertools
+import logging
+import Queue
+import sys
+import threading
+import time
+import traceback
+
+from lib import common_util
+
+logger = logging.getLogger('PyreRing')
+
+# How long the dispatching thread waits on the result queue at a time. It is
+# kept short so a KeyboardInterrupt is noticed while tests are running.
+WAIT_INTERVAL = 1
+# The most seconds to wait for the workers of the killed scripts to return.
+JOIN_TIMEOUT = 10
+# The weight of a script taking the whole slot budget.
+ALL = 'all'
+DEFAULT_WEIGHTS = 'SMALL=1,MEDIUM=4,LARGE=all'
+DEFAULT_NFS_JOBS = 2
+
+DEFAULT_LANE = 'default'
+NFS_LANE = 'nfs'
+ROOT_ACCESS_LANE = 'root_access'
+SERIAL_LANE = 'serial'
+# The scripts in these lanes run alone.
+EXCLUSIVE_LANES = [ROOT_ACCESS_LANE, SERIAL_LANE]
+
+
+def ParseWeights(value):
+  """Parse a size_weights setting.
+
+  Args:
+    value: <string> comma separated SIZE=weight pairs, the weight is a number
+      of slots or 'all'.
+
+  Returns:
+    a dictionary of the weight of each upper case SIZE, an int or ALL.
+
+  Raises:
+    ValueError: if a pair can not be parsed.
+  """
+  weights = {}
+  for pair in value.split(','):
+    if not pair.strip():
+      continue
+    if '=' not in pair:
+      raise ValueError('Invalid size weight: %s' % pair)
+    size, weight = pair.split('=', 1)
+    weight = weight.strip().lower()
+    if weight != ALL:
+      weight = int(weight)
+      if weight < 0:
+        raise ValueError('Invalid size weight: %s' % pair)
+    weights[size.strip().upper()] = weight
+  return weights
+
+
+def ExceptionMessage(one_script_dict):
+  """Describe the exception being handled, raised by running a script.
+
+  Args:
+    one_script_dict: <dict> test config dictionary of the script.
+
+  Returns:
+    a string of the exception and its stack trace.
+  """
+  return ('Exception[%s] on command[%s]. \n\tSTACK TRACE:\n%s'
+          % (sys.exc_info()[0], one_script_dict['TEST_SCRIPT'],
+             traceback.format_exc()))
+
+
+class Synchronized(object):
+  """A proxy to serialize all method calls to the wrapped object.
+
+  It is used to share one reporter between worker threads. Attribute reads
+  which are not methods are passed through without locking.
+  """
+
+  def __init__(self, wrapped, lock=None):
+    """Wrap an object with a lock.
+
+    Args:
+      wrapped: any object whose methods should not run concurrently.
+      lock: a lock to use. A new threading.RLock is created if None.
+    """
+    self.__dict__['_wrapped'] = wrapped
+    self.__dict__['_lock'] = lock or threading.RLock()
+
+  def __getattr__(self, name):
+    attribute = getattr(self._wrapped, name)
+    if not callable(attribute):
+      return attribute
+    lock = self._lock
+
+    def Locked(*args, **kwargs):
+      """Call the wrapped method while holding the lock."""
+      lock.acquire()
+      try:
+        return attribute(*args, **kwargs)
+      finally:
+        lock.release()
+    return Locked
+
+  def __setattr__(self, name, value):
+    setattr(self._wrapped, name, value)
+
+
+class Dispatcher(object):
+  """Runs test scripts concurrently on a bounded number of threads."""
+
+  def __init__(self, run_function, jobs=1, slots=None, weights=None,
+               nfs_jobs=DEFAULT_NFS_JOBS, abort_function=None):
+    """Init the dispatcher with a function to run one script.
+
+    Args:
+      run_function: a callable taking one test config dictionary and returning
+        the result of the run. It is called in a worker thread.
+      jobs: <int> the max number of scripts running at the same time.
+      slots: <int> the slot budget shared by the running scripts. None or 0
+        for jobs slots.
+      weights: a dictionary of the slots taken by each SIZE, as returned by
+        ParseWeights. A SIZE not in it takes 1 slot. None for 1 slot each.
+      nfs_jobs: <int> the max number of NFS scripts running at the same time.
+      abort_function: a callable without arguments, which kills the scripts
+        still running when Run is interrupted. None if they can't be killed.
+    """
+    self.run_function = run_function
+    self.abort_function = abort_function
+    self.jobs = max(1, int(jobs))
+    self.slots = int(slots or self.jobs)
+    self.weights = weights or {}
+    self.nfs_jobs = max(1, int(nfs_jobs))
+    self.pending = []
+    self.running = 0
+    self.used_slots = 0
+    self.exclusive_running = 0
+    self.lane_running = {}
+    # The running scripts, in the order they started.
+    self.running_scripts = []
+    # Maps the id of each pending script to the time it was queued at.
+    self.queued_times = {}
+    # Maps a lane to [scripts started, total wait, longest wait] in seconds.
+    self.lane_waits = {}
+    self.done_queue = Queue.Queue()
+    # Maps the id of each running script to its worker thread.
+    self.workers = {}
+    # A heap of (time, sequence, one_script_dict) of the scripts requeued to
+    # run again at that time, the sequence keeps the order of equal times.
+    self.delayed = []
+    self.sequence = itertools.count()
+
+  def _Lane(self, one_script_dict):
+    """Return the lane of a script."""
+    if not one_script_dict.get('CONCURRENT', True):
+      return SERIAL_LANE
+    if one_script_dict.get('ROOT_ACCESS', False):
+      return ROOT_ACCESS_LANE
+    if one_script_dict.get('NFS', False):
+      return NFS_LANE
+    return DEFAULT_LANE
+
+  def _IsExclusive(self, one_script_dict):
+    """Check if a script has to run alone in its lane."""
+    return self._Lane(one_script_dict) in EXCLUSIVE_LANES
+
+  def _Weight(self, one_script_dict):
+    """Return the slots taken by a script, at most the whole budget."""
+    size = str(one_script_dict.get('SIZE') or '').upper()
+    weight = self.weights.get(size, 1)
+    if weight == ALL:
+      return self.slots
+    return min(weight, self.slots)
+
+  def _Fits(self, one_script_dict):
+    """Check if the script can start now.
+
+    Args:
+      one_script_dict: <dict> test case dictionary.
+
+    Returns:
+      True if starting the script now keeps within the limits.
+    """
+    if self.exclusive_running:
+      return False
+    if self._IsExclusive(one_script_dict):
+      return not self.running
+    if self._LaneFull(one_script_dict):
+      return False
+    return (self.running < self.jobs and
+            self.used_slots + self._Weight(one_script_dict) <= self.slots)
+
+  def _LaneFull(self, one_script_dict):
+    """Check if the lane of a script runs as many scripts as it can."""
+    return (self._Lane(one_script_dict) == NFS_LANE and
+            self.lane_running.get(NFS_LANE, 0) >= self.nfs_jobs)
+
+  def _PopRunnable(self):
+    """Remove and return the first pending script which can start now.
+
+    The scripts after one which waits for slots, or to run alone, are not
+    started before it, so their slots add up to what it needs.
+
+    Returns:
+      A test config dictionary or None if nothing can start now.
+    """
+    for index in range(len(self.pending)):
+      one_script_dict = self.pending[index]
+      if self._Fits(one_script_dict):
+        return self.pending.pop(index)
+      if not self._LaneFull(one_script_dict):
+        return None
+    return None
+
+  def _Queue(self, one_script_dict):
+    """Add a script to the pending ones, its wait starts now."""
+    self.queued_times[id(one_script_dict)] = common_util.MonotonicTime()
+    self.pending.append(one_script_dict)
+
+  def _Start(self, one_script_dict):
+    """Take the capacity of one script and start it."""
+    lane = self._Lane(one_script_dict)
+    wait = (common_util.MonotonicTime() -
+            self.queued_times.pop(id(one_script_dict)))
+    lane_wait = self.lane_waits.setdefault(lane, [0, 0.0, 0.0])
+    lane_wait[0] += 1
+    lane_wait[1] += wait
+    lane_wait[2] = max(lane_wait[2], wait)
+    self.running += 1
+    self.running_scripts.append(one_script_dict)
+    self.lane_running[lane] = self.lane_running.get(lane, 0) + 1
+    self.used_slots += self._Weight(one_script_dict)
+    if self._IsExclusive(one_script_dict):
+      self.exclusive_running += 1
+    self._Launch(one_script_dict)
+
+  def _Launch(self, one_script_dict):
+    """Start one script on a new worker thread."""
+    worker = threading.Thread(target=self._Worker, args=(one_script_dict,))
+    # The worker threads should never keep PyreRing alive on their own.
+    worker.setDaemon(True)
+    self.workers[id(one_script_dict)] = worker
+    worker.start()
+
+  def _Finish(self, one_script_dict):
+    """Release the capacity held by a finished script."""
+    self.running -= 1
+    self.running_scripts.remove(one_script_dict)
+    self.lane_running[self._Lane(one_script_dict)] -= 1
+    self.used_slots -= self._Weight(one_script_dict)
+    if self._IsExclusive(one_script_dict):
+      self.exclusive_running -= 1
+    self.workers.pop(id(one_script_dict), None)
+
+  def _Abort(self, report_function, err_msg):
+    """Stop dispatching, kill the running scripts and report them.
+
+    The worker threads are daemons and the scripts run in their own sessions,
+    so without this they would be left running when PyreRing exits. What the
+    killed scripts return is dropped, each one is reported with err_msg, so
+    are the requeued scripts waiting to run again.
+
+    Args:
+      report_function: the report function given to Run.
+      err_msg: <string> the error message of the killed scripts.
+    """
+    logger.critical('stopping %d running scripts' % self.running)
+    self.pending = []
+    self.queued_times = {}
+    requeued = [one_script_dict for unused_time, unused_sequence,
+                one_script_dict in sorted(self.delayed)]
+    self.delayed = []
+    if self.abort_function:
+      self.abort_function()
+    deadline = common_util.MonotonicTime() + JOIN_TIMEOUT
+    for worker in self.workers.values():
+      worker.join(max(0, deadline - common_util.MonotonicTime()))
+    for one_script_dict in list(self.running_scripts):
+      self._Finish(one_script_dict)
+      report_function(one_script_dict, None, err_msg)
+    for one_script_dict in requeued:
+      report_function(one_script_dict, None, err_msg)
+
+  def _Worker(self, one_script_dict):
+    """Thread body: run one script and queue the outcome.
+
+    Any exception from the run function is turned into an error message, so
+    it can be reported by the dispatching thread.
+    """
+    try:
+      result = self.run_function(one_script_dict)
+    except Exception:
+      self.done_queue.put((one_script_dict, None,
+                           ExceptionMessage(one_script_dict)))
+    else:
+      self.done_queue.put((one_script_dict, result, None))
+
+  def _WaitForOne(self, max_wait=None):
+    """Block until a running script finishes.
+
+    Args:
+      max_wait: the most seconds to wait, None to wait until a script
+        finishes.
+
+    Returns:
+      A tuple of (one_script_dict, result, err_msg) for the finished script,
+      None if none finished in max_wait seconds.
+    """
+    deadline = None
+    if max_wait is not None:
+      deadline = common_util.MonotonicTime() + max_wait
+    while True:
+      wait = WAIT_INTERVAL
+      if deadline is not None:
+        wait = min(wait, deadline - common_util.MonotonicTime())
+        if wait <= 0:
+          return None
+      try:
+        return self.done_queue.get(True, wait)
+      except Queue.Empty:
+        continue
+
+  def Requeue(self, one_script_dict, delay=0):
+    """Run a finished script again.
+
+    It is meant to be called by the report function. The script is queued
+    after the pending scripts once delay seconds passed, the other scripts
+    are started and reported meanwhile.
+
+    Args:
+      one_script_dict: <dict> test config dictionary of the script.
+      delay: a number of seconds to wait before the script is queued.
+    """
+    heapq.heappush(self.delayed, (common_util.MonotonicTime() + delay,
+                                  self.sequence.next(), one_script_dict))
+
+  def _QueueDelayed(self):
+    """Queue the requeued scripts whose delay passed.
+
+    Returns:
+      the seconds until the next requeued script is due, None if there is
+      none.
+    """
+    now = common_util.MonotonicTime()
+    while self.delayed and self.delayed[0][0] <= now:
+      self._Queue(heapq.heappop(self.delayed)[2])
+    if not self.delayed:
+      return None
+    return self.delayed[0][0] - now
+
+  def Run(self, script_list, report_function):
+    """Run all scripts and report each one as it finishes.
+
+    Args:
+      script_list: a list of test config dictionaries, in the order they
+        should be started.
+      report_function: a callable taking (one_script_dict, result, err_msg).
+        err_msg is None unless the run function raised an exception. It should
+        return True if the script did not pass. It may Requeue the script
+        instead of reporting it.
+
+    Returns:
+      True if any call of report_function returned True.
+    """
+    self.pending = []
+    for one_script_dict in script_list:
+      self._Queue(one_script_dict)
+    fail_flag = False
+    try:
+      while self.pending or self.running or self.delayed:
+        max_wait = self._QueueDelayed()
+        one_script_dict = self._PopRunnable()
+        while one_script_dict is not None:
+          logger.debug('dispatching %s' % one_script_dict['TEST_SCRIPT'])
+          self._Start(one_script_dict)
+          one_script_dict = self._PopRunnable()
+        if not self.running:
+          # Only requeued scripts are left, waiting for their delay.
+          time.sleep(max_wait)
+          continue
+        finished = self._WaitForOne(max_wait)
+        if finished is None:
+          continue
+        one_script_dict, result, err_msg = finished
+        self._Finish(one_script_dict)
+        # Be careful about short circuit "or", need to report first.
+        fail_flag = (report_function(one_script_dict, result, err_msg) or
+                     fail_flag)
+    except:
+      # Scripts are only left running or requeued if the loop was
+      # interrupted, typically by a KeyboardInterrupt. The exception is kept,
+      # since handling others while aborting would replace it.
+      exc_info = sys.exc_info()
+      if self.running or self.delayed:
+        self._Abort(report_function,
+                    'Interrupted by %s while running' % exc_info[0].__name__)
+      raise exc_info[0], exc_info[1], exc_info[2]
+    return fail_flag
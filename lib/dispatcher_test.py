@@ -0,0 +1,292 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unittest for dispatcher module."""
+
+import threading
+import time
+import unittest
+
+from lib import dispatcher
+
+
+class FakeRun(object):
+  """A run function which records how many runs overlap."""
+
+  def __init__(self, duration=0.2):
+    self.duration = duration
+    self.lock = threading.Lock()
+    self.running = []
+    self.max_running = 0
+    self.overlapped = {}
+
+  def __call__(self, one_script_dict):
+    name = one_script_dict['TEST_SCRIPT']
+    self.lock.acquire()
+    try:
+      self.running.append(name)
+      self.max_running = max(self.max_running, len(self.running))
+      for other in self.running:
+        if other != name:
+          self.overlapped[name] = True
+          self.overlapped[other] = True
+    finally:
+      self.lock.release()
+    time.sleep(self.duration)
+    if name == 'raise':
+      raise ValueError('run failed')
+    self.lock.acquire()
+    try:
+      self.running.remove(name)
+    finally:
+      self.lock.release()
+    return 0
+
+
+class DispatcherTest(unittest.TestCase):
+  """Unit test cases for Dispatcher class."""
+
+  def setUp(self):
+    self.reported = []
+
+  def _Report(self, one_script_dict, result, err_msg):
+    self.reported.append((one_script_dict['TEST_SCRIPT'], result, err_msg))
+    return result != 0
+
+  def _Scripts(self, names, concurrent=True):
+    return [{'TEST_SCRIPT': name, 'CONCURRENT': concurrent} for name in names]
+
+  def testAllScriptsReported(self):
+    """Every script is run and reported once."""
+    fake_run = FakeRun(0.01)
+    one = dispatcher.Dispatcher(fake_run, 3)
+    fail_flag = one.Run(self._Scripts(['a', 'b', 'c', 'd', 'e']), self._Report)
+    self.assertFalse(fail_flag)
+    self.assertEqual(sorted([name for name, _, _ in self.reported]),
+                     ['a', 'b', 'c', 'd', 'e'])
+
+  def testJobsLimitConcurrency(self):
+    """No more than jobs scripts run at the same time."""
+    fake_run = FakeRun()
+    one = dispatcher.Dispatcher(fake_run, 2)
+    one.Run(self._Scripts(['a', 'b', 'c', 'd', 'e']), self._Report)
+    self.assertEqual(fake_run.max_running, 2)
+
+  def testNonConcurrentScriptsRunAlone(self):
+    """CONCURRENT False scripts never overlap with any other script."""
+    fake_run = FakeRun()
+    script_list = (self._Scripts(['a', 'b']) +
+                   self._Scripts(['serial1', 'serial2'], False) +
+                   self._Scripts(['c', 'd']))
+    one = dispatcher.Dispatcher(fake_run, 4)
+    one.Run(script_list, self._Report)
+    self.assertFalse('serial1' in fake_run.overlapped)
+    self.assertFalse('serial2' in fake_run.overlapped)
+    self.assertTrue('a' in fake_run.overlapped)
+
+  def testSizeWeightsPackSlots(self):
+    """Scripts take the slots of their SIZE, LARGE ones run alone."""
+    fake_run = FakeRun()
+    script_list = self._Scripts(['m1', 'm2', 'm3', 'large', 's1', 's2'])
+    sizes = {'m': 'MEDIUM', 'l': 'LARGE', 's': 'small'}
+    for one_script_dict in script_list:
+      one_script_dict['SIZE'] = sizes[one_script_dict['TEST_SCRIPT'][0]]
+    weights = dispatcher.ParseWeights(dispatcher.DEFAULT_WEIGHTS)
+    one = dispatcher.Dispatcher(fake_run, 32, 8, weights)
+    one.Run(script_list, self._Report)
+    self.assertEqual(len(self.reported), 6)
+    self.assertFalse('large' in fake_run.overlapped)
+    # Two MEDIUM scripts fill the 8 slots, the SMALL ones wait behind the
+    # LARGE one.
+    self.assertEqual(fake_run.max_running, 2)
+    self.assertEqual(one.used_slots, 0)
+
+  def testLargeScriptNotStarved(self):
+    """Small scripts queued after a large one do not keep it waiting."""
+    lock = threading.Lock()
+    started = []
+
+    def Run(one_script_dict):
+      lock.acquire()
+      try:
+        started.append(one_script_dict['TEST_SCRIPT'])
+      finally:
+        lock.release()
+      time.sleep(0.05)
+      return 0
+
+    script_list = self._Scripts(['s%d' % number for number in range(3)] +
+                                ['large'] +
+                                ['s%d' % number for number in range(3, 20)])
+    script_list[3]['SIZE'] = 'LARGE'
+    weights = dispatcher.ParseWeights(dispatcher.DEFAULT_WEIGHTS)
+    one = dispatcher.Dispatcher(Run, 4, 4, weights)
+    one.Run(script_list, self._Report)
+    self.assertEqual(len(self.reported), 21)
+    self.assertEqual(sorted(started[:3]), ['s0', 's1', 's2'])
+    self.assertEqual(started[3], 'large')
+
+  def testLanes(self):
+    """ROOT_ACCESS scripts run alone, NFS ones nfs_jobs at a time."""
+    fake_run = FakeRun()
+    script_list = self._Scripts(['nfs1', 'nfs2', 'nfs3', 'a', 'b', 'root'])
+    for one_script_dict in script_list[:3]:
+      one_script_dict['NFS'] = True
+    script_list[5]['ROOT_ACCESS'] = True
+    one = dispatcher.Dispatcher(fake_run, 8, nfs_jobs=1)
+    one.Run(script_list, self._Report)
+    self.assertEqual(len(self.reported), 6)
+    self.assertFalse('root' in fake_run.overlapped)
+    # One NFS script at a time, with a and b.
+    self.assertEqual(fake_run.max_running, 3)
+    self.assertEqual(sorted(one.lane_waits), ['default', 'nfs', 'root_access'])
+    started, total, longest = one.lane_waits['nfs']
+    self.assertEqual(started, 3)
+    self.assertTrue(longest >= 0.4)
+    self.assertTrue(total >= longest)
+
+  def testParseWeights(self):
+    """Weights are slots or all, keyed by upper case SIZE."""
+    self.assertEqual(dispatcher.ParseWeights(' small=1, Large = ALL,'),
+                     {'SMALL': 1, 'LARGE': dispatcher.ALL})
+    self.assertRaises(ValueError, dispatcher.ParseWeights, 'SMALL')
+    self.assertRaises(ValueError, dispatcher.ParseWeights, 'SMALL=x')
+
+  def testExceptionReportedAsErrorMessage(self):
+    """An exception from the run function is passed on to the report."""
+    fake_run = FakeRun(0.01)
+    one = dispatcher.Dispatcher(fake_run, 2)
+    fail_flag = one.Run(self._Scripts(['raise', 'a']), self._Report)
+    self.assertTrue(fail_flag)
+    for name, result, err_msg in self.reported:
+      if name == 'raise':
+        self.assertTrue('run failed' in err_msg)
+        self.assertEqual(result, None)
+      else:
+        self.assertEqual(err_msg, None)
+
+  def testRequeue(self):
+    """A requeued script runs again after its delay, others don't wait."""
+    fake_run = FakeRun(0.01)
+    one = dispatcher.Dispatcher(fake_run, 2)
+    requeued = []
+
+    def Report(one_script_dict, result, err_msg):
+      if one_script_dict['TEST_SCRIPT'] == 'a' and not requeued:
+        requeued.append(True)
+        one.Requeue(one_script_dict, 0.5)
+        return False
+      return self._Report(one_script_dict, result, err_msg)
+
+    start_time = time.time()
+    self.assertFalse(one.Run(self._Scripts(['a', 'b']), Report))
+    self.assertTrue(time.time() - start_time >= 0.5)
+    self.assertEqual([name for name, unused_result, unused_err_msg
+                      in self.reported], ['b', 'a'])
+
+  def testRequeuedWaitFromRequeue(self):
+    """The wait of a requeued script starts when it is queued again."""
+    fake_run = FakeRun(0.01)
+    one = dispatcher.Dispatcher(fake_run, 2)
+    requeued = []
+
+    def Report(one_script_dict, result, err_msg):
+      if not requeued:
+        requeued.append(True)
+        one.Requeue(one_script_dict, 0.5)
+      return False
+
+    self.assertFalse(one.Run(self._Scripts(['a']), Report))
+    started, unused_total, longest = one.lane_waits['default']
+    self.assertEqual(started, 2)
+    self.assertTrue(longest < 0.3)
+    self.assertFalse(one.queued_times)
+
+  def testInterruptKillsRunningScripts(self):
+    """An interrupted run starts nothing more and kills the running ones."""
+    stop = threading.Event()
+    started = []
+    stopped = []
+
+    def Run(one_script_dict):
+      name = one_script_dict['TEST_SCRIPT']
+      started.append(name)
+      if name == 'slow':
+        stop.wait(30)
+        stopped.append(name)
+      return 0
+
+    def Report(one_script_dict, result, err_msg):
+      self._Report(one_script_dict, result, err_msg)
+      if len(self.reported) == 1:
+        raise KeyboardInterrupt
+
+    one = dispatcher.Dispatcher(Run, 2, abort_function=stop.set)
+    start_time = time.time()
+    self.assertRaises(KeyboardInterrupt, one.Run,
+                      self._Scripts(['slow', 'quick', 'next']), Report)
+    self.assertTrue(time.time() - start_time < 10)
+    self.assertEqual(sorted(started), ['quick', 'slow'])
+    # The worker of the killed script was joined.
+    self.assertEqual(stopped, ['slow'])
+    self.assertFalse(one.pending)
+    # The killed script is reported with the interrupt.
+    self.assertEqual(self.reported[0], ('quick', 0, None))
+    self.assertEqual(self.reported[1],
+                     ('slow', None,
+                      'Interrupted by KeyboardInterrupt while running'))
+    self.assertEqual(one.running, 0)
+
+  def testInterruptReportsRequeued(self):
+    """A script waiting to run again is reported when the run stops."""
+    one = dispatcher.Dispatcher(FakeRun(0.01), 2)
+    reports = []
+
+    def Report(one_script_dict, result, err_msg):
+      self._Report(one_script_dict, result, err_msg)
+      if not reports:
+        reports.append(True)
+        one.Requeue(one_script_dict, 30)
+        return False
+      if len(self.reported) == 2:
+        raise KeyboardInterrupt
+      return False
+
+    self.assertRaises(KeyboardInterrupt, one.Run,
+                      self._Scripts(['a', 'b']), Report)
+    self.assertEqual(self.reported[2],
+                     (self.reported[0][0], None,
+                      'Interrupted by KeyboardInterrupt while running'))
+    self.assertFalse(one.delayed)
+
+  def testSynchronizedPassesAttributes(self):
+    """Synchronized proxy passes on method calls and attributes."""
+    class Target(object):
+      value = 1
+
+      def Add(self, number):
+        self.value += number
+        return self.value
+
+    proxy = dispatcher.Synchronized(Target())
+    self.assertEqual(proxy.Add(2), 3)
+    self.assertEqual(proxy.value, 3)
+    proxy.value = 5
+    self.assertEqual(proxy.Add(1), 6)
+
+
+if __name__ == '__main__':
+  unittest.main()
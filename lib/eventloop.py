@@ -0,0 +1,144 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A single threaded event loop of file descriptors and timers.
+
+The EventLoop class waits in poll() on any number of file descriptors and
+calls a callback for each one which is ready to read. Timers are kept in a
+heap ordered by their deadline, the poll() wait ends at the first deadline,
+so a loop can supervise hundreds of commands with one thread and without
+busy waiting.
+
+All callbacks are called in the thread calling RunOnce, one at a time.
+"""
+
+import errno
+import heapq
+import itertools
+import select
+import time
+
+from lib import common_util
+
+# The longest RunOnce waits with nothing to wake it up.
+MAX_WAIT = 1
+
+
+class Timer(object):
+  """A callback to call once at a given time, until cancelled."""
+
+  def __init__(self, deadline, callback, args):
+    """Init the timer.
+
+    Args:
+      deadline: the common_util.MonotonicTime to call the callback at.
+      callback: a callable.
+      args: a tuple of the arguments of the callback.
+    """
+    self.deadline = deadline
+    self.callback = callback
+    self.args = args
+
+  def Cancel(self):
+    """Make sure the callback is not called, it is fine to cancel twice."""
+    self.callback = None
+    self.args = None
+
+  def IsActive(self):
+    """Return True if the callback is still to be called."""
+    return self.callback is not None
+
+
+class EventLoop(object):
+  """Calls back on readable file descriptors and expired timers."""
+
+  def __init__(self):
+    self.poller = select.poll()
+    # Maps a file descriptor to its reader callback.
+    self.readers = {}
+    # A heap of (deadline, sequence, Timer), the sequence keeps the timers
+    # with the same deadline in the order they were set.
+    self.timers = []
+    self.sequence = itertools.count()
+
+  def AddReader(self, fd, callback):
+    """Call callback() each time fd is ready to read or is closed.
+
+    Args:
+      fd: <int> a file descriptor.
+      callback: a callable without arguments.
+    """
+    self.readers[fd] = callback
+    self.poller.register(fd, select.POLLIN | select.POLLPRI)
+
+  def RemoveReader(self, fd):
+    """Stop watching a file descriptor, it is fine if it is not watched."""
+    if self.readers.pop(fd, None) is not None:
+      self.poller.unregister(fd)
+
+  def CallLater(self, delay, callback, *args):
+    """Call callback(*args) in delay seconds.
+
+    Args:
+      delay: a number of seconds, fractions are allowed.
+      callback: a callable.
+      args: the arguments to call it with.
+
+    Returns:
+      a Timer, to cancel the call.
+    """
+    timer = Timer(common_util.MonotonicTime() + delay, callback, args)
+    heapq.heappush(self.timers,
+                   (timer.deadline, self.sequence.next(), timer))
+    return timer
+
+  def _NextWait(self, max_wait):
+    """Return the seconds to wait for the first active timer."""
+    while self.timers and not self.timers[0][2].IsActive():
+      heapq.heappop(self.timers)
+    if not self.timers:
+      return max_wait
+    wait = self.timers[0][0] - common_util.MonotonicTime()
+    return max(0, min(wait, max_wait))
+
+  def RunOnce(self, max_wait=MAX_WAIT):
+    """Wait for some events, then call their callbacks.
+
+    Args:
+      max_wait: the most seconds to wait if nothing happens.
+    """
+    wait = self._NextWait(max_wait)
+    events = []
+    if self.readers:
+      try:
+        events = self.poller.poll(wait * 1000)
+      except select.error, e:
+        if e[0] != errno.EINTR:
+          raise
+    elif wait:
+      time.sleep(wait)
+    for fd, unused_event in events:
+      # An earlier callback may have removed the reader.
+      callback = self.readers.get(fd)
+      if callback is not None:
+        callback()
+    now = common_util.MonotonicTime()
+    while self.timers and self.timers[0][0] <= now:
+      unused_deadline, unused_sequence, timer = heapq.heappop(self.timers)
+      if timer.IsActive():
+        callback, args = timer.callback, timer.args
+        timer.Cancel()
+        callback(*args)
@@ -0,0 +1,75 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unittest for eventloop module."""
+
+import os
+import unittest
+
+from lib import eventloop
+
+
+class EventLoopTest(unittest.TestCase):
+  """Unit test cases for EventLoop class."""
+
+  def setUp(self):
+    self.loop = eventloop.EventLoop()
+    self.calls = []
+
+  def testTimersInOrder(self):
+    """Timers are called in the order of their deadlines, once."""
+    self.loop.CallLater(0.02, self.calls.append, 'second')
+    self.loop.CallLater(0, self.calls.append, 'first')
+    self.loop.CallLater(0.02, self.calls.append, 'third')
+    while len(self.calls) < 3:
+      self.loop.RunOnce()
+    self.loop.RunOnce(0.05)
+    self.assertEqual(self.calls, ['first', 'second', 'third'])
+
+  def testCancel(self):
+    """A cancelled timer is not called."""
+    timer = self.loop.CallLater(0, self.calls.append, 'cancelled')
+    timer.Cancel()
+    self.assertFalse(timer.IsActive())
+    self.loop.CallLater(0.01, self.calls.append, 'called')
+    while not self.calls:
+      self.loop.RunOnce()
+    self.loop.RunOnce(0)
+    self.assertEqual(self.calls, ['called'])
+
+  def testReader(self):
+    """A reader is called when its fd is readable, not after it is removed."""
+    read_fd, write_fd = os.pipe()
+    try:
+      self.loop.AddReader(read_fd,
+                          lambda: self.calls.append(os.read(read_fd, 10)))
+      self.loop.RunOnce(0)
+      self.assertEqual(self.calls, [])
+      os.write(write_fd, 'data')
+      self.loop.RunOnce()
+      self.assertEqual(self.calls, ['data'])
+      self.loop.RemoveReader(read_fd)
+      self.loop.RemoveReader(read_fd)
+      os.write(write_fd, 'more')
+      self.loop.RunOnce(0)
+      self.assertEqual(self.calls, ['data'])
+    finally:
+      os.close(read_fd)
+      os.close(write_fd)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,407 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A shell runner supervising all its tests from one event loop.
+
+The EventRunner class runs the same tests as BaseRunner and reports them the
+same way, but it does not spend a thread on each running test. All the test
+commands of a suite are child processes of one eventloop.EventLoop: their
+output pipes are read as soon as poll() says so, and their timeouts, kill
+grace periods and exit checks are timers of the loop. The number of tests
+running at the same time is bounded by jobs, slots and nfs_jobs, as with
+BaseRunner, so jobs can be in the hundreds.
+
+The zygote runs one script at a time per thread, so it is not used by this
+runner.
+"""
+
+import logging
+import signal
+import time
+
+from lib import baserunner
+from lib import common_util
+from lib import dispatcher
+from lib import emailmessage
+from lib import eventloop
+from lib import filesystemhandlerextend
+from lib import outputspool
+
+logger = logging.getLogger('PyreRing')
+
+MIN_EXIT_CHECK_INTERVAL = filesystemhandlerextend.MIN_EXIT_CHECK_INTERVAL
+MAX_EXIT_CHECK_INTERVAL = filesystemhandlerextend.MAX_EXIT_CHECK_INTERVAL
+
+
+class RunningTest(object):
+  """One test command supervised by an event loop.
+
+  The command is started by the filesystem as RunCommandToLoggerWithTimeout
+  would. Its output is passed on as it comes. Its exit is checked at an
+  interval backing off from MIN_EXIT_CHECK_INTERVAL to
+  MAX_EXIT_CHECK_INTERVAL, and right away once its pipe is closed. A command
+  which times out gets SIGTERM, and SIGKILL kill_grace seconds later, with
+  all the processes it started.
+  """
+
+  def __init__(self, loop, filesystem, context, output, monitor, done):
+    """Init the test, it is not started yet.
+
+    Args:
+      loop: the eventloop.EventLoop to run the test on.
+      filesystem: a filesystemhandlerextend.FileSystemHandlerExtend to start,
+        read and reap the command with.
+      context: the testcontext.TestContext of the test.
+      output: an outputspool.OutputSpool to keep the output in.
+      monitor: a callable, called with each chunk of output. If it returns
+        True, the command is killed at once.
+      done: a callable, called in the loop with the return code and the
+        resourceusage.ResourceUsage of the command once it exited. The return
+        code is None if it timed out.
+    """
+    self.loop = loop
+    self.filesystem = filesystem
+    self.context = context
+    self.output = output
+    self.monitor = monitor
+    self.done = done
+    self.proc = None
+    self.pipe_open = False
+    self.timed_out = False
+    # The descendants of the command found when it was killed, None if it was
+    # not killed.
+    self.descendants = None
+    self.interval = MIN_EXIT_CHECK_INTERVAL
+    self.timeout_timer = None
+    self.kill_timer = None
+    self.check_timer = None
+
+  def Start(self):
+    """Start the command and set its timers."""
+    context = self.context
+    self.proc = self.filesystem.StartCommand(context.command, context.cwd,
+                                              context.limits,
+                                              context.environment)
+    self.pipe_open = True
+    self.loop.AddReader(self.proc.stdout.fileno(), self._Read)
+    self.timeout_timer = self.loop.CallLater(context.timeout, self._Timeout)
+    self.check_timer = self.loop.CallLater(self.interval, self._Check)
+
+  def _Output(self, mesg):
+    """Log and keep one chunk of output, return what the monitor says."""
+    logger.info(mesg)
+    self.output.write(mesg)
+    return self.monitor(mesg)
+
+  def _Read(self):
+    """Read the output which is ready, the pipe is closed at the end."""
+    mesg = self.filesystem.ReadPipe(self.proc.stdout)
+    if mesg:
+      if self._Output(mesg):
+        self.Kill(0)
+    else:
+      # The pipe is closed, the command should be exiting now.
+      self._ClosePipe()
+      self._CheckSoon()
+
+  def _ClosePipe(self):
+    if self.pipe_open:
+      self.pipe_open = False
+      self.loop.RemoveReader(self.proc.stdout.fileno())
+      self.proc.stdout.close()
+
+  def _Timeout(self):
+    logger.debug('test %s timed out' % self.context.command)
+    self.timed_out = True
+    self.Kill(self.context.kill_grace)
+
+  def Kill(self, grace):
+    """Kill the command and everything it started.
+
+    Args:
+      grace: a number of seconds the command has to exit after SIGTERM, 0 to
+        send SIGKILL at once.
+    """
+    if self.descendants is not None:
+      return
+    # The descendants must be found while the command is running, its
+    # orphans are moved to init when it exits.
+    self.descendants = filesystemhandlerextend.Descendants(
+        filesystemhandlerextend.ProcessTable(), self.proc.pid)
+    if grace > 0:
+      filesystemhandlerextend.SignalGroup(self.proc.pid, signal.SIGTERM)
+      self.kill_timer = self.loop.CallLater(
+          grace, filesystemhandlerextend.SignalGroup, self.proc.pid,
+          signal.SIGKILL)
+    else:
+      filesystemhandlerextend.SignalGroup(self.proc.pid, signal.SIGKILL)
+    self._CheckSoon()
+
+  def _CheckSoon(self):
+    """Check the exit of the command again at the shortest interval."""
+    self.check_timer.Cancel()
+    self.interval = MIN_EXIT_CHECK_INTERVAL
+    self.check_timer = self.loop.CallLater(self.interval, self._Check)
+
+  def _Check(self):
+    reaped = self.filesystem.Reap(self.proc, False)
+    if reaped is None:
+      self.interval = min(self.interval * 2, MAX_EXIT_CHECK_INTERVAL)
+      self.check_timer = self.loop.CallLater(self.interval, self._Check)
+      return
+    ret, usage = reaped
+    self._CancelTimers()
+    if self.descendants is not None:
+      # The group gets SIGKILL even if the command exited, to stop the
+      # processes it left behind.
+      filesystemhandlerextend.SignalGroup(self.proc.pid, signal.SIGKILL)
+      filesystemhandlerextend.KillGroup(self.proc.pid, self.descendants)
+    # Collect what is left in the pipe, but don't wait for a background
+    # process which still holds it.
+    if self.pipe_open:
+      mesg = self.filesystem.ReadPipe(self.proc.stdout)
+      if mesg:
+        self._Output(mesg)
+      self._ClosePipe()
+    if self.timed_out:
+      ret = None
+    self.done(ret, usage)
+
+  def _CancelTimers(self):
+    for timer in [self.timeout_timer, self.kill_timer, self.check_timer]:
+      if timer is not None:
+        timer.Cancel()
+
+  def Abort(self):
+    """Kill the command at once and wait for it, done is not called."""
+    self._CancelTimers()
+    self._ClosePipe()
+    if self.proc.returncode is None:
+      self.filesystem.KillCommand(self.proc, 0)
+
+
+class EventDispatcher(dispatcher.Dispatcher):
+  """A Dispatcher starting the scripts on an event loop, not on threads."""
+
+  def __init__(self, start_function, loop, jobs=1, slots=None, weights=None,
+               nfs_jobs=dispatcher.DEFAULT_NFS_JOBS, abort_function=None):
+    """Init the dispatcher with a function to start one script.
+
+    Args:
+      start_function: a callable taking one test config dictionary and a done
+        callable. It starts the script on the loop and returns at once, done
+        is called with (result, err_msg) once the script finished.
+      loop: the eventloop.EventLoop the scripts run on.
+      jobs: <int> the max number of scripts running at the same time.
+      slots: <int> the slot budget shared by the running scripts.
+      weights: a dictionary of the slots taken by each SIZE.
+      nfs_jobs: <int> the max number of NFS scripts running at the same time.
+      abort_function: a callable without arguments, which kills the scripts
+        still running when Run is interrupted.
+    """
+    super(EventDispatcher, self).__init__(start_function, jobs, slots,
+                                          weights, nfs_jobs, abort_function)
+    self.loop = loop
+
+  def _Launch(self, one_script_dict):
+    """Start one script on the loop."""
+
+    def Done(result, err_msg):
+      """Queue the outcome of the script."""
+      self.done_queue.put((one_script_dict, result, err_msg))
+
+    try:
+      self.run_function(one_script_dict, Done)
+    except Exception:
+      Done(None, dispatcher.ExceptionMessage(one_script_dict))
+
+  def _WaitForOne(self, max_wait=None):
+    """Run the loop until a script finishes.
+
+    Args:
+      max_wait: the most seconds to run the loop for, None to run it until a
+        script finishes.
+
+    Returns:
+      A tuple of (one_script_dict, result, err_msg) for the finished script,
+      None if none finished in max_wait seconds.
+    """
+    deadline = None
+    if max_wait is not None:
+      deadline = common_util.MonotonicTime() + max_wait
+    while self.done_queue.empty():
+      wait = eventloop.MAX_WAIT
+      if deadline is not None:
+        wait = min(wait, deadline - common_util.MonotonicTime())
+        if wait <= 0:
+          return None
+      self.loop.RunOnce(wait)
+    return self.done_queue.get()
+
+
+class EventRunner(baserunner.BaseRunner):
+  """The shell runner with one event loop for all the running tests."""
+
+  def __init__(self,
+               name='/bin/sh',
+               scanner=None,
+               email_message=emailmessage.EmailMessage(),
+               filesystem=filesystemhandlerextend.FileSystemHandlerExtend(),
+               reporter=None):
+    """Init the EventRunner, the arguments are those of BaseRunner."""
+    super(EventRunner, self).__init__(name, scanner, email_message,
+                                      filesystem, reporter)
+    self.use_zygote = False
+    # The loop of the suite running now.
+    self.loop = None
+    # The RunningTest of each test case running now, keyed by the id of the
+    # test case dictionary.
+    self.running_tests = {}
+
+  def _RunScriptsSequentially(self, script_list, results):
+    """Run a list of test cases one by one, in their order.
+
+    As in BaseRunner, a KeyboardInterrupt only stops the test case running,
+    which is reported as ERROR, unless another one comes in the pause after
+    it.
+
+    Args:
+      script_list: a list of test case dictionaries.
+      results: <dict> to collect the return code of each test case.
+
+    Returns:
+      True if any test case did not pass.
+    """
+    suite_fail_flag = False
+    for one_script_dict in script_list:
+      try:
+        # Be careful about short circuit "or", need to run the test first.
+        suite_fail_flag = (
+            self._RunScriptsOnLoop([one_script_dict], results, 1) or
+            suite_fail_flag)
+      except KeyboardInterrupt:
+        # The dispatcher reported the test case as ERROR already.
+        suite_fail_flag = True
+        self._PauseAfterInterrupt(one_script_dict['TEST_SCRIPT'])
+    return suite_fail_flag
+
+  def _RunScriptsConcurrently(self, script_list, results):
+    """Run a list of test cases with at most self.jobs at a time.
+
+    The test cases expected to take longest are started first.
+
+    Args:
+      script_list: a list of test case dictionaries.
+      results: <dict> to collect the return code of each test case.
+
+    Returns:
+      True if any test case did not pass.
+    """
+    logger.info('running %d tests with %d jobs on an event loop' %
+                (len(script_list), self.jobs))
+    return self._RunScriptsOnLoop(self._LongestFirst(script_list), results,
+                                  self.jobs)
+
+  def _RunScriptsOnLoop(self, script_list, results, jobs):
+    """Run a list of test cases on a new event loop.
+
+    Args:
+      script_list: a list of test case dictionaries, in the order they should
+        be started.
+      results: <dict> to collect the return code of each test case.
+      jobs: <int> the max number of test cases running at the same time.
+
+    Returns:
+      True if any test case did not pass.
+    """
+    self.loop = eventloop.EventLoop()
+    test_dispatcher = EventDispatcher(self._StartScript, self.loop, jobs,
+                                      self.slots, self.size_weights,
+                                      self.nfs_jobs, self._AbortRunning)
+
+    def Report(one_script_dict, result, err_msg):
+      """Report one finished test case, return True if it did not pass."""
+      return self._ReportFinished(test_dispatcher, results, one_script_dict,
+                                  result, err_msg)
+    try:
+      return test_dispatcher.Run(script_list, Report)
+    finally:
+      self.lane_waits = test_dispatcher.lane_waits
+      self._AbortRunning()
+      self.loop = None
+
+  def _AbortRunning(self):
+    """Kill the test cases still running on the loop.
+
+    Tests are only left running by an exception, typically KeyboardInterrupt.
+    They are in their own sessions, so they did not get the signal.
+    """
+    for test in self.running_tests.values():
+      test.Abort()
+    self.running_tests = {}
+
+  def _StartScript(self, one_script_dict, done):
+    """Start one test case on the loop.
+
+    A CACHEABLE test case with a cached pass is not run, done is called with
+    the cached return code right away.
+
+    Args:
+      one_script_dict: <dict> test case dictionary.
+      done: a callable, called with (result, err_msg) once the test case
+        finished. result is None if it timed out, err_msg is None unless
+        checking the test case raised an exception.
+    """
+    context = self._TestContext(one_script_dict)
+    result = self._CachedResult(one_script_dict, context)
+    if result is not None:
+      done(result, None)
+      return
+    cmd = context.command
+    logger.info('-----running test %s... with timeout:%s' % (cmd,
+                                                             context.timeout))
+    scanner, monitor, stopped = self._OutputMonitor(
+        one_script_dict.get('KILL_ON_FATAL', False))
+    message = outputspool.OutputSpool(self.output_memory_cap)
+    start_time = time.time()
+    start = common_util.MonotonicTime()
+
+    def Finished(ret, usage):
+      """Check the output of the test case and pass on its result."""
+      del self.running_tests[id(one_script_dict)]
+      self.timings[id(one_script_dict)] = (start_time,
+                                           common_util.MonotonicTime() - start,
+                                           usage)
+      if scanner.allocation_line is not None:
+        self.allocation_failures[id(one_script_dict)] = scanner.allocation_line
+      try:
+        try:
+          ret = self._CheckOutput(cmd, ret, message, usage, scanner, stopped)
+        except Exception:
+          done(None, dispatcher.ExceptionMessage(one_script_dict))
+          return
+      finally:
+        message.Close()
+      done(ret, None)
+
+    test = RunningTest(self.loop, self.filesystem, context, message, monitor,
+                       Finished)
+    try:
+      test.Start()
+    except:
+      message.Close()
+      raise
+    self.running_tests[id(one_script_dict)] = test
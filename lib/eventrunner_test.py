@@ -0,0 +1,192 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unittest for eventrunner module."""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+from lib import baserunner
+from lib import eventrunner
+from lib import filesystemhandlerextend
+from lib import mock_emailmessage
+from lib import mock_reporter
+from lib import mock_scanscripts
+from lib import pyreringconfig
+from lib import pyreringutil
+
+global_settings = pyreringconfig.GlobalPyreRingConfig.settings
+
+
+class EventRunnerTest(unittest.TestCase):
+  """Unit test cases for EventRunner class."""
+
+  def setUp(self):
+    self.tempdir = tempfile.mkdtemp()
+    root_dir = os.path.abspath(os.path.join(os.path.split(sys.argv[0])[0],
+                                            '../'))
+    global_settings.update(
+        {'report_dir': os.path.join(self.tempdir, 'report'),
+         'email_recipients': os.getenv('LOGNAME'),
+         'host_name': 'test.host',
+         'log_file': 'pyrering.log',
+         'file_errors': False,
+         'project_name': 'pyrering_unittest',
+         'root_dir': root_dir,
+         'sendmail': False,
+         'runner': 'eventrunner',
+         'source_dir': os.path.join(root_dir, 'test'),
+         'tester': os.getenv('LOGNAME'),
+         'FATAL_STRING': 'Fatal:',
+         'header_file': 'header_info.txt',
+         'time': time.strftime('%Y%m%d%H%M'),
+         'skip_setup': False,
+        })
+    self.scanner = mock_scanscripts.MockScanScripts()
+    self.emailmessage = mock_emailmessage.MockEmailMessage()
+    self.reporter = mock_reporter.MockTxtReporter()
+    self.runner = None
+    if not os.path.isdir(global_settings['report_dir']):
+      os.makedirs(global_settings['report_dir'])
+    global_settings['log_file'] += '.unittest'
+
+  def tearDown(self):
+    if self.runner:
+      self.runner.CleanUp()
+    pyreringconfig.Reset()
+    self.scanner.CleanConfig()
+    shutil.rmtree(self.tempdir)
+
+  def _Runner(self, jobs):
+    """Return a runner which runs jobs tests at a time."""
+    global_settings['jobs'] = jobs
+    self.runner = eventrunner.EventRunner(
+        name='test',
+        scanner=self.scanner,
+        email_message=self.emailmessage,
+        filesystem=filesystemhandlerextend.FileSystemHandlerExtend(),
+        reporter=self.reporter)
+    self.runner.Prepare()
+    return self.runner
+
+  def _Config(self, command, timeout=None):
+    one_config = pyreringutil.PRConfigParser().Default()
+    one_config['TEST_SCRIPT'] = command
+    if timeout is not None:
+      one_config['TIMEOUT'] = timeout
+    return one_config
+
+  def testSequentialRun(self):
+    """Results are checked and reported as BaseRunner does."""
+    self.scanner.SetConfig([self._Config('echo one'),
+                            self._Config('exit 1'),
+                            self._Config('echo Fatal:'),
+                            self._Config('exit 255')])
+    runner = self._Runner(1)
+    self.assertEqual(runner.Run(['testSequentialRun'], False), 3)
+    self.assertEqual((runner.passed, runner.failed, runner.error), (1, 2, 1))
+    self.assertEqual(runner.running_tests, {})
+
+  def testSequentialInterruptStopsOneTest(self):
+    """A KeyboardInterrupt stops the running test only, as in BaseRunner."""
+    self.scanner.SetConfig([self._Config('echo one'),
+                            self._Config('sleep 30'),
+                            self._Config('echo three')])
+    runner = self._Runner(1)
+    start_script = runner._StartScript
+
+    def Interrupt():
+      raise KeyboardInterrupt
+
+    def StartAndInterrupt(one_script_dict, done):
+      start_script(one_script_dict, done)
+      if one_script_dict['TEST_SCRIPT'] == 'sleep 30':
+        runner.loop.CallLater(0.2, Interrupt)
+    runner._StartScript = StartAndInterrupt
+    pause = baserunner.INTERRUPT_PAUSE
+    baserunner.INTERRUPT_PAUSE = 0
+    try:
+      start_time = time.time()
+      self.assertEqual(
+          runner.Run(['testSequentialInterruptStopsOneTest'], False), 1)
+    finally:
+      baserunner.INTERRUPT_PAUSE = pause
+    self.assertTrue(time.time() - start_time < 10)
+    self.assertEqual((runner.passed, runner.error), (2, 1))
+    self.assertEqual(runner.running_tests, {})
+
+  def testManyConcurrentTests(self):
+    """Many tests run at the same time on one thread."""
+    config_list = [self._Config('sleep 1; echo %d' % number)
+                   for number in range(50)]
+    config_list[-1]['TEST_SCRIPT'] = 'sleep 1; exit 1'
+    self.scanner.SetConfig(config_list)
+    runner = self._Runner(50)
+    start_time = time.time()
+    self.assertEqual(runner.Run(['testManyConcurrentTests'], False), 1)
+    self.assertTrue(time.time() - start_time < 10)
+    self.assertEqual((runner.passed, runner.failed), (49, 1))
+
+  def testJobsBound(self):
+    """No more than jobs tests run at the same time."""
+    self.scanner.SetConfig([self._Config('sleep 1') for unused in range(4)])
+    runner = self._Runner(2)
+    start_time = time.time()
+    self.assertEqual(runner.Run(['testJobsBound'], False), 0)
+    self.assertTrue(time.time() - start_time >= 2)
+    self.assertEqual(runner.passed, 4)
+
+  def testTimeoutKillsDescendants(self):
+    """A test over its timeout is killed with what it started."""
+    global_settings['kill_grace'] = 0.5
+    self.scanner.SetConfig([
+        self._Config("trap '' TERM; sleep 30 & sleep 30", timeout=1),
+        self._Config('echo done')])
+    runner = self._Runner(2)
+    start_time = time.time()
+    self.assertEqual(runner.Run(['testTimeoutKillsDescendants'], False), 1)
+    self.assertTrue(time.time() - start_time < 10)
+    self.assertEqual((runner.timeout, runner.passed), (1, 1))
+
+  def testFlakyRetried(self):
+    """A test is retried on the loop while the others run."""
+    mark = os.path.join(self.tempdir, 'mark')
+    self.scanner.SetConfig([
+        self._Config('test -f %s && exit 0; touch %s; exit 1' % (mark, mark)),
+        self._Config('sleep 1')])
+    global_settings['max_retries'] = 1
+    runner = self._Runner(2)
+    self.assertEqual(runner.Run(['testFlakyRetried'], False), 0)
+    self.assertEqual((runner.flaky, runner.passed), (1, 1))
+
+  def testKillOnFatalMessage(self):
+    """A test with KILL_ON_FATAL is killed once a fatal string shows up."""
+    one_config = self._Config('echo Fatal:;sleep 10')
+    one_config['KILL_ON_FATAL'] = True
+    self.scanner.SetConfig([one_config])
+    runner = self._Runner(1)
+    start_time = time.time()
+    self.assertEqual(runner.Run(['testKillOnFatalMessage'], False), 1)
+    self.assertTrue(time.time() - start_time < 5)
+    self.assertEqual(runner.failed, 1)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -261,7 +261,7 @@ class FileSystemHandler(object):
       # If we're here, we timed out. Try asking the process to stop nicely.
       os.killpg(proc.pid, signal.SIGTERM)
       deadline = time.time() + self.SIGTERM_TIMEOUT
-      while time.time() < deadline and proc.poll() is not None:
+      while time.time() < deadline and proc.poll() is None:
         time.sleep(1)
 
       if proc.poll() is None:
@@ -27,17 +27,236 @@ import fcntl
 import glob
 import logging
 import os
+import select
 import signal
 import socket
 import subprocess
+import threading
 import time
 
 from lib import common_util
 from lib import filesystem_handler
+from lib import outputspool
+from lib import resourceusage
 
 logger = logging.getLogger('PyreRing')
 DEBUG = common_util.DebugLog
 
+# The size of each read from a command output pipe.
+READ_SIZE = 65536
+# Range of the interval in seconds to check if a running command has exited,
+# when its output pipe has nothing to say.
+MIN_EXIT_CHECK_INTERVAL = 0.001
+MAX_EXIT_CHECK_INTERVAL = 0.5
+# Seconds a timed out command has to exit after SIGTERM before SIGKILL.
+DEFAULT_KILL_GRACE = 5
+# The interval in seconds to check if a command has exited after SIGTERM.
+KILL_CHECK_INTERVAL = 0.05
+PROC_DIR = '/proc'
+# A command with any of these is run by a shell, since it may need one to
+# expand, redirect or split it.
+SHELL_CHARACTERS = '|&;<>()$`\\"\'*?[]{}~#=%!'
+# The first bytes of the files the kernel can exec.
+EXEC_MAGICS = ['#!', '\x7fELF']
+# The interpreters of the scripts which can't be exec'ed, by suffix.
+INTERPRETERS = {'.sh': ['/bin/sh'], '.py': ['python'], '.pl': ['perl']}
+# The errors of an exec which the shell may still run, like a missing #!
+# interpreter. The child set up can not fail with them.
+EXEC_ERRORS = [errno.ENOENT, errno.ENOEXEC]
+
+
+def HasShellSyntax(command):
+  """Return True if a command has any of SHELL_CHARACTERS."""
+  for character in SHELL_CHARACTERS:
+    if character in command:
+      return True
+  return False
+
+
+def DirectCommand(command, cwd=None):
+  """Find the arguments to exec a command with, without a shell.
+
+  A command can be run without a shell if it has no shell syntax and starts
+  with the path of an executable file. A #! script or a binary is exec'ed as
+  it is. Other scripts are run by the interpreter of their suffix in
+  INTERPRETERS, the shell would run them with /bin/sh.
+
+  Args:
+    command: a shell command.
+    cwd: the directory the command runs in, None for the current one.
+
+  Returns:
+    a list of the arguments, None if the command needs a shell.
+  """
+  if HasShellSyntax(command):
+    return None
+  words = command.split()
+  # A command without a path may be a shell builtin or function.
+  if not words or '/' not in words[0]:
+    return None
+  path = os.path.join(cwd or '', words[0])
+  if not os.path.isfile(path) or not os.access(path, os.X_OK):
+    # Leave the error message and return code to the shell.
+    return None
+  try:
+    script_file = open(path, 'rb')
+    try:
+      head = script_file.read(4)
+    finally:
+      script_file.close()
+  except IOError:
+    return None
+  for magic in EXEC_MAGICS:
+    if head.startswith(magic):
+      return words
+  interpreter = INTERPRETERS.get(os.path.splitext(words[0])[1])
+  if interpreter is None:
+    return None
+  return interpreter + words
+
+
+def ProcessTable():
+  """Read the running processes from /proc.
+
+  Returns:
+    a dictionary of pid to a tuple of (ppid, process group, session, start
+    time), the start time tells a process from a later one with the same pid.
+    Zombies are left out, they are dead already. It is empty if /proc can not
+    be read.
+  """
+  table = {}
+  try:
+    names = os.listdir(PROC_DIR)
+  except OSError:
+    return table
+  for name in names:
+    if not name.isdigit():
+      continue
+    try:
+      stat_file = open(os.path.join(PROC_DIR, name, 'stat'))
+      try:
+        stat = stat_file.read()
+      finally:
+        stat_file.close()
+    except IOError:
+      # The process is gone.
+      continue
+    # The command name is in parentheses and can hold spaces, the fields
+    # after it start with the state.
+    fields = stat[stat.rfind(')') + 2:].split()
+    if len(fields) < 20 or fields[0] == 'Z':
+      continue
+    table[int(name)] = (int(fields[1]), int(fields[2]), int(fields[3]),
+                        fields[19])
+  return table
+
+
+def Descendants(table, pid):
+  """Find the processes started by a process or in the group it leads.
+
+  Args:
+    table: a process table from ProcessTable.
+    pid: <int> the pid of the process group or session leader.
+
+  Returns:
+    a dictionary of pid to start time of the processes found, except pid.
+  """
+  found = {}
+  children = {}
+  for one_pid, (ppid, group, session, start_time) in table.iteritems():
+    if (group == pid or session == pid) and one_pid != pid:
+      found[one_pid] = start_time
+    children.setdefault(ppid, []).append(one_pid)
+  pending = [pid]
+  while pending:
+    for child in children.get(pending.pop(), []):
+      if child not in found:
+        found[child] = table[child][3]
+        pending.append(child)
+  return found
+
+
+def SignalGroup(pgid, signal_number):
+  """Send a signal to a process group, which may be gone already."""
+  try:
+    os.killpg(pgid, signal_number)
+  except OSError, e:
+    if e.errno != errno.ESRCH:
+      raise
+
+
+def KillGroup(pgid, descendants):
+  """Send SIGKILL to a process group and the descendants which left it.
+
+  Args:
+    pgid: <int> the process group id, the pid of its leader.
+    descendants: a dictionary from Descendants, found while the leader was
+      running. Its orphans are moved to init when it exits.
+  """
+  SignalGroup(pgid, signal.SIGKILL)
+  table = ProcessTable()
+  descendants = descendants.copy()
+  descendants.update(Descendants(table, pgid))
+  for pid, start_time in descendants.iteritems():
+    entry = table.get(pid)
+    if entry is not None and entry[3] == start_time:
+      logger.warning('process %d of group %d survived, killing it' %
+                     (pid, pgid))
+      try:
+        os.kill(pid, signal.SIGKILL)
+      except OSError, e:
+        if e.errno != errno.ESRCH:
+          raise
+
+
+class RunningGroups(object):
+  """The process groups of the running commands, to kill them all at once.
+
+  The threads supervising the commands add and remove them, KillAll is meant
+  for the thread which got a KeyboardInterrupt while they run. The commands
+  are in their own sessions, so they do not get the signal themselves.
+  """
+
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.groups = set()
+
+  def Add(self, pgid):
+    """Add the process group of a command which started."""
+    self.lock.acquire()
+    try:
+      self.groups.add(pgid)
+    finally:
+      self.lock.release()
+
+  def Remove(self, pgid):
+    """Remove the process group of a command which exited."""
+    self.lock.acquire()
+    try:
+      self.groups.discard(pgid)
+    finally:
+      self.lock.release()
+
+  def KillAll(self):
+    """Send SIGKILL to all the groups and the descendants which left them.
+
+    The groups are removed by their supervising threads, when they reap the
+    killed commands.
+
+    Returns:
+      the number of groups killed.
+    """
+    self.lock.acquire()
+    try:
+      groups = list(self.groups)
+    finally:
+      self.lock.release()
+    if groups:
+      table = ProcessTable()
+      for pgid in groups:
+        KillGroup(pgid, Descendants(table, pgid))
+    return len(groups)
+
 
 class FileSystemHandlerExtend(filesystem_handler.FileSystemHandler):
   """Extends original FileSystemHandler."""
@@ -50,7 +269,8 @@ class FileSystemHandlerExtend(filesystem_handler.FileSystemHandler):
     is. So I overwrite it here it just skip the changing of umask on the
     system.
     """
-    pass
+    # The commands started and not reaped yet.
+    self.running_groups = RunningGroups()
 
   def LookupEnvVariableWithDefault(self, var, value):
     """Calls os.environ.get to get env variable."""
@@ -71,47 +291,283 @@ class FileSystemHandlerExtend(filesystem_handler.FileSystemHandler):
   def FindAbsPath(self, relative_path):
     """calls os.path.abspath directly."""
     return os.path.abspath(relative_path)
+
+  def Stat(self, path):
+    """Calls os.stat directly."""
+    return os.stat(path)
+
+  def ScanDir(self, path):
+    """List a directory with the type of each entry.
+
+    os.scandir is used when the python version has it, it mostly gets the
+    types from the directory itself. Otherwise each entry is stat'ed.
+
+    Args:
+      path: the directory to list.
+
+    Returns:
+      a list of (name, is_dir, is_link) tuples. is_dir follows symbolic links.
+    """
+    if hasattr(os, 'scandir'):
+      return [(entry.name, entry.is_dir(), entry.is_symlink())
+              for entry in os.scandir(path)]
+    entries = []
+    for name in os.listdir(path):
+      full_path = os.path.join(path, name)
+      entries.append((name, os.path.isdir(full_path),
+                      os.path.islink(full_path)))
+    return entries
     
   def RunCommandFGToPipeWithTimeoutGetOutput(self, command, timeout=60):
     """Run command with a timeout."""
     return self._RunCmdInFGAndWait(command, subprocess.PIPE, subprocess.PIPE,
                                    timeout)
 
-  def _ReadPipe(self, fd):
+  def ReadPipe(self, fd):
     """Read and clean the content of the given file handler.
 
     Because of the 4k Bytes limitation of the buffer size. The file handler
-    needs to be read out as soon as possible. If the file handler is set to
-    none blocking mode, the read operation will return as soon as the content
-    is clean. As default file handler is set to blocking mode, so the read
-    operation will block and wait till the file handler is closed.
+    needs to be read out as soon as possible. The file handler has to be set to
+    none blocking mode, then the read operation will return as soon as the
+    content is clean. The file descriptor is read directly, the buffer of the
+    python file object is never used, so select/poll on it stays reliable.
 
     Args:
-      fd: an opened file handler.
+      fd: an opened file handler in none blocking mode.
 
     Returns:
-      The string message in the file handler. If nothing to read, an empty
-      string will be returned.
+      The string message in the file handler. If nothing to read or the writing
+      end is closed, an empty string will be returned.
     """
-    message = ''
-    bytes = ''
+    chunks = []
     # Loop reading, break when reach the end.
     while 1:
       try:
-        bytes = fd.read(4096)
-      except IOError, e:
-        # When reaching the end of the fd, IOError with errno EAGAIN is raised,
+        chunk = os.read(fd.fileno(), READ_SIZE)
+      except OSError, e:
+        # When reaching the end of the fd, OSError with errno EAGAIN is raised,
         # which is expected, re-raise the exception if not EAGAIN.
-        if e[0] != errno.EAGAIN:
+        if e.errno != errno.EAGAIN:
           raise
         break
-      if not bytes:
+      if not chunk:
         break
-      message += bytes
-    return message
+      chunks.append(chunk)
+    return ''.join(chunks)
+
+  def StartCommand(self, command, cwd=None, limits=None, env=None):
+    """Start a shell command with stdout and stderr combined into a pipe.
+
+    The command leads a new session, so it and all the processes it starts
+    can be killed together with killpg. A command DirectCommand finds the
+    arguments of is exec'ed without a shell, saving the fork and exec of
+    /bin/sh.
+
+    RunCommandToLoggerWithTimeout starts and supervises a command in the
+    calling thread. A caller supervising commands on its own, like an event
+    loop, starts them with this and uses ReadPipe on their output, Reap to
+    check their exit and KillCommand to stop them.
+
+    Args:
+      command: a shell command or script to run.
+      cwd: the directory to run the command in, None for the current one.
+      limits: a resourcelimits.ResourceLimits to set in the command process
+        before it starts, None for no limits.
+      env: a dictionary of the environment of the command, None for the one
+        of this process.
+
+    Returns:
+      a subprocess.Popen object, its stdout is set to none blocking mode.
+    """
+
+    def PrepareChild():
+      """Run in the child between fork and exec."""
+      os.setsid()
+      if limits and limits.IsSet():
+        limits.Apply()
+
+    proc = None
+    args = DirectCommand(command, cwd)
+    if args is not None:
+      try:
+        proc = subprocess.Popen(args, cwd=cwd, env=env,
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT,
+                                preexec_fn=PrepareChild)
+      except OSError, e:
+        # The #! interpreter is missing or the like, let the shell say so.
+        # Other errors, like one setting the limits, would fail the shell the
+        # same way.
+        if e.errno not in EXEC_ERRORS:
+          raise
+        logger.debug('failed to exec %s directly: %s' % (args, e))
+    if proc is None:
+      proc = subprocess.Popen(command, shell=True, cwd=cwd, env=env,
+                              stdout=subprocess.PIPE,
+                              stderr=subprocess.STDOUT,
+                              preexec_fn=PrepareChild)
+    # It is very important to set the stdout to nonblocking mode. Otherwise
+    # the code will block when it tries to read from the stdout pipe.
+    fcntl.fcntl(proc.stdout,
+                fcntl.F_SETFL,
+                fcntl.fcntl(proc.stdout, fcntl.F_GETFL)|os.O_NONBLOCK)
+    self.running_groups.Add(proc.pid)
+    return proc
+
+  def Reap(self, proc, block):
+    """Reap the command with wait4 to get its resource usage.
+
+    The return code is set on proc too, so subprocess does not try to reap it
+    again.
+
+    Args:
+      proc: a subprocess.Popen object from StartCommand.
+      block: <boolean> wait for the command to exit.
+
+    Returns:
+      a tuple of the return code, the negative signal number if it was
+      killed, and a resourceusage.ResourceUsage. None if block is False and
+      the command is still running.
+    """
+    options = 0
+    if not block:
+      options = os.WNOHANG
+    while True:
+      try:
+        pid, status, rusage = os.wait4(proc.pid, options)
+        break
+      except OSError, e:
+        if e.errno != errno.EINTR:
+          raise
+    if not pid:
+      return None
+    self.running_groups.Remove(proc.pid)
+    if os.WIFSIGNALED(status):
+      proc.returncode = -os.WTERMSIG(status)
+    else:
+      proc.returncode = os.WEXITSTATUS(status)
+    return proc.returncode, resourceusage.FromRusage(rusage)
+
+  def KillCommand(self, proc, grace):
+    """Kill a command started by StartCommand and everything it started.
+
+    The process group of the command gets SIGTERM, and SIGKILL if the command
+    has not exited grace seconds later. The group gets SIGKILL even if the
+    command exited, to stop the processes it left behind. At last /proc is
+    checked for the descendants of the command which left its group, and they
+    get SIGKILL too.
+
+    Args:
+      proc: a subprocess.Popen object from StartCommand.
+      grace: a number of seconds the command has to exit after SIGTERM, 0 to
+        send SIGKILL at once.
+
+    Returns:
+      a tuple of the return code, the negative signal number if it was
+      killed, and a resourceusage.ResourceUsage.
+    """
+    # The descendants must be found while the command is running, its
+    # orphans are moved to init when it exits.
+    descendants = Descendants(ProcessTable(), proc.pid)
+    reaped = None
+    if grace > 0:
+      SignalGroup(proc.pid, signal.SIGTERM)
+      deadline = common_util.MonotonicTime() + grace
+      reaped = self.Reap(proc, False)
+      while reaped is None and common_util.MonotonicTime() < deadline:
+        time.sleep(KILL_CHECK_INTERVAL)
+        reaped = self.Reap(proc, False)
+    SignalGroup(proc.pid, signal.SIGKILL)
+    if reaped is None:
+      reaped = self.Reap(proc, True)
+    KillGroup(proc.pid, descendants)
+    return reaped
+
+  def _SuperviseCommand(self, proc, timeout, output_function,
+                        kill_grace=DEFAULT_KILL_GRACE):
+    """Wait for a command to exit or time out, passing on its output.
+
+    The loop sleeps in poll() on the output pipe, so it wakes up as soon as
+    there is some output or the pipe is closed, which is normally when the
+    command exits. The exit of the command is also checked at an interval
+    backing off from MIN_EXIT_CHECK_INTERVAL to MAX_EXIT_CHECK_INTERVAL, for
+    the case that a background process of the command keeps the pipe open.
+    A SIGCHLD handler is not used, since it can only be set in the main thread
+    and it would take over the handler of the whole process.
+    A command which times out is killed with KillCommand, so are the
+    processes it started.
+
+    Args:
+      proc: a subprocess.Popen object from StartCommand.
+      timeout: a number of seconds, fractions are allowed.
+      output_function: a callable, called with each chunk of output. If it
+        returns True, the command is killed right away.
+      kill_grace: seconds a timed out command has to exit after SIGTERM.
+
+    Returns:
+      a tuple of the return code of the command, None if it timed out and was
+      killed, and its resourceusage.ResourceUsage.
+    """
+    pipe = proc.stdout
+    poller = select.poll()
+    poller.register(pipe.fileno(), select.POLLIN | select.POLLPRI)
+    pipe_open = True
+    interval = MIN_EXIT_CHECK_INTERVAL
+    deadline = common_util.MonotonicTime() + timeout
+    # Set once the command has been reaped or killed.
+    done = False
+    try:
+      while True:
+        reaped = self.Reap(proc, False)
+        if reaped is not None:
+          done = True
+          break
+        remaining = deadline - common_util.MonotonicTime()
+        if remaining <= 0:
+          unused_ret, usage = self.KillCommand(proc, kill_grace)
+          done = True
+          logger.debug('exit %s._SuperviseCommand as kill' % self.__class__)
+          return None, usage
+        wait = min(remaining, interval)
+        if pipe_open:
+          events = poller.poll(wait * 1000)
+        else:
+          time.sleep(wait)
+          events = []
+        if not events:
+          interval = min(interval * 2, MAX_EXIT_CHECK_INTERVAL)
+          continue
+        mesg = self.ReadPipe(pipe)
+        if mesg:
+          if output_function(mesg):
+            reaped = self.KillCommand(proc, 0)
+            done = True
+            logger.debug('exit %s._SuperviseCommand as stopped by output' %
+                         self.__class__)
+            return reaped
+        else:
+          # The pipe is closed, the command should be exiting now.
+          pipe_open = False
+          poller.unregister(pipe.fileno())
+          interval = MIN_EXIT_CHECK_INTERVAL
+      # It is a normal exit. Collect what is left in the pipe, but don't wait
+      # for a background process which still holds it.
+      if pipe_open:
+        mesg = self.ReadPipe(pipe)
+        if mesg:
+          output_function(mesg)
+      return reaped
+    finally:
+      pipe.close()
+      if not done:
+        # An exception, typically KeyboardInterrupt, stopped the wait. The
+        # command is in its own session, so it does not get the signal.
+        self.KillCommand(proc, 0)
 
   @DEBUG
-  def RunCommandToLoggerWithTimeout(self, command, timeout=600):
+  def RunCommandToLoggerWithTimeout(self, command, timeout=600, cwd=None,
+                                    output=None, monitor=None, limits=None,
+                                    kill_grace=DEFAULT_KILL_GRACE, env=None):
     """Open a subshell to run a command with a timeout and log the output.
 
     Same as RunCommandToPipeWithTimeout except the command output will be
@@ -119,100 +575,79 @@ class FileSystemHandlerExtend(filesystem_handler.FileSystemHandler):
 
     Args:
       command: a shell command or script to run
-      timeout: an integer for the timeout in seconds.
+      timeout: the timeout in seconds, an integer or a float.
+      cwd: the directory to run the command in. None means the current
+        directory. The current directory of this process is not changed, so
+        it is safe to call this from more than one thread.
+      output: an outputspool.OutputSpool to keep the output in. A new one with
+        the default memory cap is created if None.
+      monitor: a callable, called with each chunk of output while the command
+        runs. If it returns True, the command is killed at once and the return
+        code is the negative signal number.
+      limits: a resourcelimits.ResourceLimits to set in the command process
+        before it starts, None for no limits.
+      kill_grace: seconds a timed out command has to exit after SIGTERM,
+        before it and the processes it started get SIGKILL.
+      env: a dictionary of the environment of the command, None for the one
+        of this process. The environment of this process is not changed, so
+        each thread can run commands with its own.
 
     Returns:
-      a tuple with 2 values will be returned. The first one is the return code
+      a tuple with 3 values will be returned. The first one is the return code
       of the shell command run, None if it times out. The second one will be
-      the shell command output pipe with both stdout and stderr.
+      the OutputSpool with both stdout and stderr of the shell command. The
+      caller should Close() it when done. The third one is the
+      resourceusage.ResourceUsage of the command.
     """
-    output = ''
-    mesg = ''
-    start_time = 0
-    proc = subprocess.Popen(command, shell=True,
-                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-    # It is very important to set the stdout to nonblocking mode. Otherwise
-    # the code will block when it tries to read from the stdout pipe. fd.read()
-    fcntl.fcntl(proc.stdout,
-                fcntl.F_SETFL,
-                fcntl.fcntl(proc.stdout, fcntl.F_GETFL)|os.O_NONBLOCK)
-    p = proc.stdout
-    # Wait for the timeout while need to clean up the proc.stdout buffer, so it
-    # will not fill up for the 4k bytes limit.
-    while start_time < timeout and proc.poll() is None:
-      time.sleep(1)
-      start_time += 1
-      mesg = self._ReadPipe(p)
-      if mesg:
-        logger.info(mesg)
-        output += mesg
-
-    if proc.poll() is not None:
-      # It is a normal exit
-      mesg = self._ReadPipe(p)
-      if mesg:
-        logger.info(mesg)
-        output += mesg
-      return proc.wait(), output
-    else:
-      os.kill(proc.pid, signal.SIGKILL)
-      logger.debug('exit %s.RunCommandToLoggerWithTimeout as kill' %
-                   self.__class__)
-      return None, output
+    if output is None:
+      output = outputspool.OutputSpool()
+
+    def LogOutput(mesg):
+      """Log one chunk of output and keep it, return True to stop."""
+      logger.info(mesg)
+      output.write(mesg)
+      if monitor:
+        return monitor(mesg)
+      return False
+
+    proc = self.StartCommand(command, cwd, limits, env)
+    ret, usage = self._SuperviseCommand(proc, timeout, LogOutput, kill_grace)
+    return ret, output, usage
 
   @DEBUG
-  def RunCommandToPipeWithTimeout(self, log_pipe, command, timeout=600):
+  def RunCommandToPipeWithTimeout(self, log_pipe, command, timeout=600,
+                                  output=None):
     """Open a subshell to run a command with a timeout option.
 
-    This method is used to get run a script in a subshell without preexec_fn
-    option set in subprocess. I have some problem with that option set. So I
-    have to write a new one without that option. It will run shell script in a
-    subshell and return the return code and a pipe with the output.
+    It will run shell script in a subshell in its own session and return the
+    return code and a pipe with the output.
 
     Args:
       log_pipe: a file descriptor to write the output of the command to.
       command: a shell command or script to run
-      timeout: an integer for the timeout in seconds.
+      timeout: the timeout in seconds, an integer or a float.
+      output: an outputspool.OutputSpool to keep the output in. A new one with
+        the default memory cap is created if None.
 
     Returns:
       a tuple with 2 values will be returned. The first one is the return code
       of the shell command run, None if it times out. The second one will be
-      the shell command output pipe with both stdout and stderr.
+      the OutputSpool with both stdout and stderr of the shell command.
     
     Caveats:
       The pipe can only hold 4k byte chars in buffer as default. So the bugger
       must be cleaned up frequently. fcntl will set the buffer to none block
       mode, so reading the buffer will not block the process.
     """
-    output = ''
-    mesg = ''
-    start_time = 0
-    proc = subprocess.Popen(command, shell=True,
-                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-    # It is very important to set the stdout to nonblocking mode. Otherwise
-    # the code will block when it tries to read from the stdout pipe. fd.read()
-    fcntl.fcntl(proc.stdout,
-                fcntl.F_SETFL,
-                fcntl.fcntl(proc.stdout, fcntl.F_GETFL)|os.O_NONBLOCK)
-    p = proc.stdout
-    # Wait for the timeout while need to clean up the proc.stdout buffer, so it
-    # will not fill up for the 4k bytes limit.
-    while start_time < timeout and proc.poll() is None:
-      time.sleep(1)
-      start_time += 1
-      mesg = self._ReadPipe(p)
-      if mesg:
-        log_pipe.write(mesg)
-        log_pipe.flush()
-        output += mesg
-
-    if proc.poll() is not None:
-      # it is a normal exit
-      mesg = self._ReadPipe(p)
+    if output is None:
+      output = outputspool.OutputSpool()
+
+    def WriteOutput(mesg):
+      """Write one chunk of output to log_pipe and keep it."""
       log_pipe.write(mesg)
       log_pipe.flush()
-      output += mesg
-      return proc.wait(), output
-    else:
-      os.kill(proc.pid, signal.SIGKILL)
-      return None, output
+      output.write(mesg)
+
+    proc = self.StartCommand(command)
+    ret, unused_usage = self._SuperviseCommand(proc, timeout, WriteOutput)
+    return ret, output
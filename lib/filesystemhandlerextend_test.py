@@ -0,0 +1,234 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unittest for filesystemhandlerextend module."""
+
+import errno
+import os
+import shutil
+import signal
+import tempfile
+import time
+import unittest
+
+from lib import filesystemhandlerextend
+from lib import outputspool
+from lib import resourcelimits
+
+
+class FileSystemHandlerExtendTest(unittest.TestCase):
+  """Unit test cases for the command running part of the filesystem."""
+
+  def setUp(self):
+    self.filesystem = filesystemhandlerextend.FileSystemHandlerExtend()
+    self.tempdir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.tempdir)
+
+  def testQuickCommandReturnsQuickly(self):
+    """A quick command should not wait for a polling quantum."""
+    start_time = time.time()
+    for unused_count in range(5):
+      ret, output, unused_usage = (
+          self.filesystem.RunCommandToLoggerWithTimeout('true', 10))
+      self.assertEqual(ret, 0)
+      self.assertEqual(output.getvalue(), '')
+    self.assertTrue(time.time() - start_time < 1)
+
+  def testOutputAndReturnCode(self):
+    """Both stdout and stderr are collected with the return code."""
+    ret, output, unused_usage = self.filesystem.RunCommandToLoggerWithTimeout(
+        'echo out; echo err >&2; exit 3', 10)
+    self.assertEqual(ret, 3)
+    self.assertEqual(sorted(output.Lines()), ['err', 'out'])
+
+  def testFractionalTimeout(self):
+    """A fractional timeout kills the command in time."""
+    start_time = time.time()
+    ret, output, unused_usage = self.filesystem.RunCommandToLoggerWithTimeout(
+        'echo started; sleep 10', 0.5)
+    self.assertEqual(ret, None)
+    self.assertEqual(output.getvalue(), 'started\n')
+    self.assertTrue(time.time() - start_time < 2)
+
+  def testBackgroundProcessHoldsPipe(self):
+    """The exit is found even if a background process keeps the pipe open."""
+    start_time = time.time()
+    ret, unused_output, unused_usage = (
+        self.filesystem.RunCommandToLoggerWithTimeout('sleep 3 & exit 0', 10))
+    self.assertEqual(ret, 0)
+    self.assertTrue(time.time() - start_time < 2)
+
+  def testRunInDirectory(self):
+    """The command runs in cwd, the current directory is not changed."""
+    current_dir = os.getcwd()
+    ret, output, unused_usage = self.filesystem.RunCommandToLoggerWithTimeout(
+        'pwd', 10, self.tempdir)
+    self.assertEqual(ret, 0)
+    self.assertEqual(os.path.realpath(output.getvalue().strip()),
+                     os.path.realpath(self.tempdir))
+    self.assertEqual(os.getcwd(), current_dir)
+
+  def testResourceUsage(self):
+    """The CPU and memory used by the command and its children are given."""
+    ret, unused_output, usage = self.filesystem.RunCommandToLoggerWithTimeout(
+        'i=0; while [ $i -lt 100000 ]; do i=$((i+1)); done; sh -c true', 10)
+    self.assertEqual(ret, 0)
+    self.assertTrue(usage.user_cpu + usage.system_cpu > 0.05)
+    self.assertTrue(usage.max_rss_kb > 0)
+    self.assertTrue(usage.voluntary_switches + usage.involuntary_switches > 0)
+
+  def testTimeoutKillsDescendants(self):
+    """A timed out command is killed with all the processes it started."""
+    pid_file = os.path.join(self.tempdir, 'pids')
+    start_time = time.time()
+    ret, unused_output, unused_usage = (
+        self.filesystem.RunCommandToLoggerWithTimeout(
+            'trap "" TERM; sleep 30 & echo $! > %s; '
+            'setsid sleep 30 & echo $! >> %s; wait' % (pid_file, pid_file),
+            1, kill_grace=0.5))
+    self.assertEqual(ret, None)
+    self.assertTrue(time.time() - start_time < 10)
+    pids = [int(line) for line in open(pid_file).read().split()]
+    self.assertEqual(len(pids), 2)
+    for pid in pids:
+      self.assertFalse(pid in filesystemhandlerextend.ProcessTable())
+
+  def testKillAllRunningCommands(self):
+    """The running commands are tracked until reaped and can be killed."""
+    proc = self.filesystem.StartCommand('sleep 30')
+    try:
+      self.assertEqual(self.filesystem.running_groups.groups,
+                       set([proc.pid]))
+      self.assertEqual(self.filesystem.running_groups.KillAll(), 1)
+      ret, unused_usage = self.filesystem.Reap(proc, True)
+      self.assertEqual(ret, -signal.SIGKILL)
+      self.assertFalse(self.filesystem.running_groups.groups)
+    finally:
+      proc.stdout.close()
+
+  def _WriteScript(self, name, content):
+    path = os.path.join(self.tempdir, name)
+    script_file = open(path, 'w')
+    script_file.write(content)
+    script_file.close()
+    os.chmod(path, 0755)
+    return path
+
+  def testDirectCommand(self):
+    """Only plain commands starting with an executable script skip sh."""
+    shebang = self._WriteScript('shebang', '#!/bin/sh\nexit 0\n')
+    plain = self._WriteScript('plain.sh', 'exit 0\n')
+    unknown = self._WriteScript('plain.txt', 'exit 0\n')
+    self.assertEqual(filesystemhandlerextend.DirectCommand(shebang + ' a b'),
+                     [shebang, 'a', 'b'])
+    self.assertEqual(filesystemhandlerextend.DirectCommand(plain),
+                     ['/bin/sh', plain])
+    self.assertEqual(
+        filesystemhandlerextend.DirectCommand('./plain.sh', self.tempdir),
+        ['/bin/sh', './plain.sh'])
+    for command in [unknown, 'true', shebang + ' > out', shebang + ' $HOME',
+                    os.path.join(self.tempdir, 'missing.sh')]:
+      self.assertEqual(filesystemhandlerextend.DirectCommand(command), None)
+    os.chmod(plain, 0644)
+    self.assertEqual(filesystemhandlerextend.DirectCommand(plain), None)
+
+  def testDirectExec(self):
+    """A script is exec'ed without a shell in between."""
+    script = self._WriteScript('parent', '#!/bin/sh\n'
+                               'echo $1; cat /proc/$PPID/comm; exit 4\n')
+    ret, output, unused_usage = self.filesystem.RunCommandToLoggerWithTimeout(
+        '%s hello' % script, 10)
+    self.assertEqual(ret, 4)
+    lines = output.getvalue().splitlines()
+    self.assertEqual(lines[0], 'hello')
+    self.assertTrue(lines[1].startswith('python'))
+    ret, output, unused_usage = self.filesystem.RunCommandToLoggerWithTimeout(
+        '%s hello; exit $?' % script, 10)
+    self.assertEqual(ret, 4)
+    self.assertEqual(output.getvalue().splitlines()[1], 'sh')
+
+  def testMissingInterpreterFallsBack(self):
+    """A script the kernel can't exec is left to the shell to report."""
+    script = self._WriteScript('broken', '#!/nonexistent/interpreter\n')
+    ret, unused_output, unused_usage = (
+        self.filesystem.RunCommandToLoggerWithTimeout(script, 10))
+    self.assertEqual(ret, 127)
+
+  def testSetupErrorNotRetried(self):
+    """A command whose set up fails is not run again by the shell."""
+    marker = os.path.join(self.tempdir, 'marker')
+
+    class FailingLimits(resourcelimits.ResourceLimits):
+
+      def Apply(self):
+        marker_file = open(marker, 'a')
+        marker_file.write('x')
+        marker_file.close()
+        raise OSError(errno.EPERM, 'not permitted')
+
+    script = self._WriteScript('script', '#!/bin/sh\nexit 0\n')
+    self.assertRaises(OSError, self.filesystem.StartCommand, script,
+                      limits=FailingLimits(nice=1))
+    self.assertEqual(open(marker).read(), 'x')
+
+  def testResourceLimits(self):
+    """The limits are set in the command before it starts."""
+    limits = resourcelimits.ResourceLimits(cpu_timeout=30, max_open_files=64,
+                                           nice=1)
+    ret, output, unused_usage = self.filesystem.RunCommandToLoggerWithTimeout(
+        'ulimit -t; ulimit -n', 10, limits=limits)
+    self.assertEqual(ret, 0)
+    self.assertEqual(output.getvalue(), '30\n64\n')
+
+  def testCpuTimeoutKillsCommand(self):
+    """A command over its CPU time limit is killed by SIGXCPU."""
+    limits = resourcelimits.ResourceLimits(cpu_timeout=1)
+    ret, unused_output, usage = self.filesystem.RunCommandToLoggerWithTimeout(
+        'exec python -c "while True: pass"', 10, limits=limits)
+    self.assertTrue(limits.Breached(ret, usage))
+
+  def testRunCommandToPipe(self):
+    """Output goes to the log pipe and is returned."""
+    log_file = os.path.join(self.tempdir, 'log')
+    log_pipe = open(log_file, 'w')
+    try:
+      ret, output = self.filesystem.RunCommandToPipeWithTimeout(
+          log_pipe, 'echo hello', 10)
+    finally:
+      log_pipe.close()
+    self.assertEqual(ret, 0)
+    self.assertEqual(output.getvalue(), 'hello\n')
+    self.assertEqual(open(log_file).read(), 'hello\n')
+
+  def testLargeOutputSpooledToFile(self):
+    """Output over the memory cap goes to a file and is read back in full."""
+    spool = outputspool.OutputSpool(1024)
+    ret, output, unused_usage = self.filesystem.RunCommandToLoggerWithTimeout(
+        'i=0; while [ $i -lt 1000 ]; do echo line $i; i=$((i+1)); done', 10,
+        output=spool)
+    self.assertEqual(ret, 0)
+    self.assertTrue(output is spool)
+    self.assertTrue(output.IsFileBacked())
+    lines = list(output.Lines())
+    self.assertEqual(len(lines), 1000)
+    self.assertEqual(lines[-1], 'line 999')
+    output.Close()
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -22,6 +22,7 @@ So I extended them by myself. This is mock part.
 
 __author__ = 'mwu@google.com (Mingyu Wu)'
 
+import errno
 import os
 import re
 
@@ -99,6 +100,48 @@ class MockFileSystemHandlerExtend(
     else:
       return self.walk_list.reverse()
 
+  def Stat(self, path):
+    """Mock os.stat() with the size of a file in fake_files.
+
+    Args:
+      path: the path to stat.
+
+    Returns:
+      an os.stat_result with the size and a fake inode of the file, other
+      fields are 0.
+
+    Raises:
+      OSError: if the path is not in fake_files.
+    """
+    if path not in self.fake_files:
+      raise OSError(errno.ENOENT, 'No such file or directory', path)
+    size = len(self.fake_files[path].getvalue())
+    return os.stat_result((0, hash(path), 0, 0, 0, 0, size, 0, 0, 0))
+
+  def ScanDir(self, path):
+    """Mock a directory listing from the paths in fake_files.
+
+    Args:
+      path: the directory to list.
+
+    Returns:
+      a list of (name, is_dir, is_link) tuples of the files and dirs right
+      under path. There are no links.
+
+    Raises:
+      OSError: if no path in fake_files is under the given path.
+    """
+    prefix = path.rstrip(self.SEP) + self.SEP
+    entries = {}
+    for key in self.fake_files.iterkeys():
+      if not key.startswith(prefix) or key == prefix:
+        continue
+      parts = key[len(prefix):].split(self.SEP, 1)
+      entries[parts[0]] = len(parts) > 1 or entries.get(parts[0], False)
+    if not entries and not self.CheckDir(path):
+      raise OSError(errno.ENOENT, 'No such file or directory', path)
+    return [(name, is_dir, False) for name, is_dir in entries.iteritems()]
+
   def GetHostName(self):
     """Mock socket.gethostname()."""
     return self.fake_env_vars['HOSTNAME']
@@ -31,13 +31,14 @@ class MockScanScripts(scanscripts.ScanScripts):
     self.setup = []
     self.teardown = []
 
-  def BaseScan(self, name):
+  def BaseScan(self, name, changed_since=None):
     """Mock BaseScan method.
 
     Return pre-set test lists other than do an actual scan.
 
     Args:
       name: <string> the name of the test.
+      changed_since: ignored.
 
     Returns:
       list of test cases.
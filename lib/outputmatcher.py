@@ -0,0 +1,197 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Scan test output for fatal strings and suspicious words as it arrives.
+
+The class OutputMatcher compiles the FATAL_STRING substrings and the
+suspicious words (fatal, error, warn in any case) into one regular expression,
+so each chunk of output is searched once, no matter how many strings there
+are. It is built once for each FATAL_STRING value by GetMatcher.
+
+The class OutputScanner keeps the scan state of one test. Chunks of output are
+fed to it while the test runs. Lines split between chunks are put back
+together. It remembers the first fatal line, the suspicious lines and the
+first line telling a memory allocation failed, so the runner can decide what
+to report once the return code is known.
+"""
+
+import re
+
+# Words catching suspicious output, matched in any case.
+SUSPICIOUS_WORDS = ['fatal', 'error', 'warn']
+# Substrings of the messages of failed memory allocations, from python, libc
+# and C++.
+ALLOCATION_FAILURES = ['MemoryError', 'Cannot allocate memory', 'bad_alloc',
+                       'out of memory', 'Out of memory']
+# A line longer than this is scanned without waiting for its end.
+MAX_LINE_LENGTH = 64 * 1024
+# The max number of suspicious lines kept for one test.
+MAX_SUSPICIOUS_LINES = 1000
+
+# Matchers built so far, keyed by FATAL_STRING.
+_matchers = {}
+
+
+def _AnyCase(word):
+  """Return a pattern matching the word in any case.
+
+  The whole expression can't be compiled with re.I, since fatal strings are
+  case sensitive.
+  """
+  return ''.join(['[%s%s]' % (char.lower(), char.upper()) for char in word])
+
+
+class OutputMatcher(object):
+  """Compiled patterns for fatal strings and suspicious words."""
+
+  def __init__(self, fatal_strings):
+    """Compile the patterns.
+
+    Args:
+      fatal_strings: a list of substrings, any of them in a line makes the
+        test fail. Empty strings are ignored.
+    """
+    self.fatal_strings = [one for one in fatal_strings if one]
+    suspicious = '|'.join([_AnyCase(word) for word in SUSPICIOUS_WORDS])
+    self.suspicious_pattern = re.compile(suspicious)
+    allocation = '|'.join([re.escape(one) for one in ALLOCATION_FAILURES])
+    self.allocation_pattern = re.compile(allocation)
+    if self.fatal_strings:
+      fatal = '|'.join([re.escape(one) for one in self.fatal_strings])
+      self.fatal_pattern = re.compile(fatal)
+      self.pattern = re.compile('%s|%s|%s' % (fatal, suspicious, allocation))
+    else:
+      self.fatal_pattern = None
+      self.pattern = re.compile('%s|%s' % (suspicious, allocation))
+
+  def IsFatal(self, line):
+    """Return True if the line has any fatal string."""
+    return bool(self.fatal_pattern and self.fatal_pattern.search(line))
+
+  def IsSuspicious(self, line):
+    """Return True if the line has any suspicious word."""
+    return bool(self.suspicious_pattern.search(line))
+
+  def IsAllocationFailure(self, line):
+    """Return True if the line tells a memory allocation failed."""
+    return bool(self.allocation_pattern.search(line))
+
+
+def GetMatcher(fatal_string):
+  """Return the OutputMatcher for a FATAL_STRING setting.
+
+  Args:
+    fatal_string: a string of comma separated fatal substrings.
+
+  Returns:
+    an OutputMatcher, compiled only the first time a value is given.
+  """
+  fatal_string = fatal_string or ''
+  matcher = _matchers.get(fatal_string)
+  if matcher is None:
+    matcher = OutputMatcher(fatal_string.split(','))
+    _matchers[fatal_string] = matcher
+  return matcher
+
+
+class OutputScanner(object):
+  """Incremental scan of the output of one test."""
+
+  def __init__(self, matcher):
+    """Init the scan state.
+
+    Args:
+      matcher: an OutputMatcher.
+    """
+    self.matcher = matcher
+    # The start of a line not ended yet.
+    self.partial = ''
+    # The offset of self.partial in the whole output.
+    self.offset = 0
+    # (offset, line) of the first line with a fatal string.
+    self.fatal_line = None
+    # (offset, line) of the lines with a suspicious word.
+    self.suspicious_lines = []
+    self.suspicious_dropped = 0
+    # The first line telling a memory allocation failed.
+    self.allocation_line = None
+
+  def Feed(self, chunk):
+    """Scan the next chunk of output.
+
+    Args:
+      chunk: a string of output.
+    """
+    data = self.partial + chunk
+    end = data.rfind('\n') + 1
+    if not end and len(data) > MAX_LINE_LENGTH:
+      end = len(data)
+    self._Scan(data[:end])
+    self.partial = data[end:]
+    self.offset += end
+
+  def Finish(self):
+    """Scan the last line if the output does not end with a line end."""
+    if self.partial:
+      self._Scan(self.partial)
+      self.offset += len(self.partial)
+      self.partial = ''
+
+  def _Scan(self, text):
+    """Scan some complete lines.
+
+    The combined pattern finds the lines having any match, then each of them
+    is checked with the fatal and suspicious patterns apart, as a match of one
+    can hide an overlapping match of the other.
+
+    Args:
+      text: a string of whole lines.
+    """
+    position = 0
+    match = self.matcher.pattern.search(text, position)
+    while match:
+      line_start = text.rfind('\n', 0, match.start()) + 1
+      line_end = text.find('\n', match.end())
+      if line_end < 0:
+        line_end = len(text)
+      line = text[line_start:line_end].rstrip('\r')
+      self._Record(self.offset + line_start, line)
+      position = line_end + 1
+      match = self.matcher.pattern.search(text, position)
+
+  def _Record(self, offset, line):
+    """Remember a line with a match."""
+    if self.fatal_line is None and self.matcher.IsFatal(line):
+      self.fatal_line = (offset, line)
+    if (self.allocation_line is None and
+        self.matcher.IsAllocationFailure(line)):
+      self.allocation_line = line
+    if self.matcher.IsSuspicious(line):
+      if len(self.suspicious_lines) < MAX_SUSPICIOUS_LINES:
+        self.suspicious_lines.append((offset, line))
+      else:
+        self.suspicious_dropped += 1
+
+  def SuspiciousLines(self, after=-1):
+    """Return the suspicious lines after an offset.
+
+    Args:
+      after: only lines starting after this offset of the output are returned.
+
+    Returns:
+      a list of lines.
+    """
+    return [line for offset, line in self.suspicious_lines if offset > after]
@@ -0,0 +1,104 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unittest for outputmatcher module."""
+
+import unittest
+
+from lib import outputmatcher
+
+
+class OutputMatcherTest(unittest.TestCase):
+  """Unit test cases for OutputMatcher class."""
+
+  def testFatalStringsAreCaseSensitive(self):
+    """Fatal strings match as given, suspicious words in any case."""
+    matcher = outputmatcher.OutputMatcher(['Fatal:', 'core dumped'])
+    self.assertTrue(matcher.IsFatal('a Fatal: here'))
+    self.assertTrue(matcher.IsFatal('Segfault (core dumped)'))
+    self.assertFalse(matcher.IsFatal('a fatal: here'))
+    self.assertTrue(matcher.IsSuspicious('a fatal: here'))
+    self.assertTrue(matcher.IsSuspicious('WARNING'))
+    self.assertFalse(matcher.IsSuspicious('all good'))
+
+  def testNoFatalStrings(self):
+    """Empty fatal strings never match."""
+    matcher = outputmatcher.OutputMatcher(['', ''])
+    self.assertFalse(matcher.IsFatal(''))
+    self.assertFalse(matcher.IsFatal('Fatal:'))
+
+  def testGetMatcherCaches(self):
+    """The same FATAL_STRING gives the same matcher."""
+    self.assertTrue(outputmatcher.GetMatcher('a,b') is
+                    outputmatcher.GetMatcher('a,b'))
+    self.assertFalse(outputmatcher.GetMatcher(None).IsFatal('Fatal:'))
+
+
+class OutputScannerTest(unittest.TestCase):
+  """Unit test cases for OutputScanner class."""
+
+  def setUp(self):
+    self.scanner = outputmatcher.OutputScanner(
+        outputmatcher.GetMatcher('Fatal:'))
+
+  def testLineSplitBetweenChunks(self):
+    """A fatal string split between two chunks is still found."""
+    self.scanner.Feed('ok line\nsomething Fa')
+    self.assertEqual(self.scanner.fatal_line, None)
+    self.scanner.Feed('tal: broken\nnext')
+    self.assertEqual(self.scanner.fatal_line, (8, 'something Fatal: broken'))
+
+  def testLastLineWithoutLineEnd(self):
+    """The last line is scanned by Finish."""
+    self.scanner.Feed('one\nerror at the end')
+    self.assertEqual(self.scanner.SuspiciousLines(), [])
+    self.scanner.Finish()
+    self.assertEqual(self.scanner.SuspiciousLines(), ['error at the end'])
+
+  def testSuspiciousLinesAfterFatal(self):
+    """Suspicious lines can be taken from after the fatal line only."""
+    self.scanner.Feed('warn 1\nFatal: stop\nerror 2\nok\nWarning 3\n')
+    self.scanner.Finish()
+    offset, line = self.scanner.fatal_line
+    self.assertEqual(line, 'Fatal: stop')
+    self.assertEqual(self.scanner.SuspiciousLines(),
+                     ['warn 1', 'Fatal: stop', 'error 2', 'Warning 3'])
+    self.assertEqual(self.scanner.SuspiciousLines(offset),
+                     ['error 2', 'Warning 3'])
+
+  def testSuspiciousLinesCapped(self):
+    """Only a bounded number of suspicious lines is kept."""
+    count = outputmatcher.MAX_SUSPICIOUS_LINES + 10
+    self.scanner.Feed('error\n' * count)
+    self.assertEqual(len(self.scanner.SuspiciousLines()),
+                     outputmatcher.MAX_SUSPICIOUS_LINES)
+    self.assertEqual(self.scanner.suspicious_dropped, 10)
+
+  def testLongLineWithoutLineEnd(self):
+    """A very long line is scanned before its end shows up."""
+    self.scanner.Feed('x' * outputmatcher.MAX_LINE_LENGTH + 'Fatal:')
+    self.assertNotEqual(self.scanner.fatal_line, None)
+    self.assertEqual(self.scanner.partial, '')
+
+  def testAllocationLine(self):
+    """The first line telling an allocation failed is kept."""
+    self.scanner.Feed('ok\nMemoryError\nstd::bad_alloc\n')
+    self.assertEqual(self.scanner.allocation_line, 'MemoryError')
+    self.assertEqual(self.scanner.fatal_line, None)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,138 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A bounded memory store for the output of a test.
+
+The class OutputSpool keeps the output of a command in a list of chunks in
+memory. Once the output grows over a memory cap, everything is moved to an
+anonymous temporary file and the rest of the output is appended there. The
+output is read back line by line or copied to another file through mmap, so
+the memory used stays the same whatever the size of the output is.
+"""
+
+import mmap
+import tempfile
+
+# The default number of bytes kept in memory before spooling to a file.
+DEFAULT_MEMORY_CAP = 1024 * 1024
+# The size of each block copied out of a file backed spool.
+COPY_SIZE = 1024 * 1024
+
+
+class OutputSpool(object):
+  """Keep output in memory up to a cap, then in a temporary file."""
+
+  def __init__(self, memory_cap=DEFAULT_MEMORY_CAP):
+    """Init an empty spool.
+
+    Args:
+      memory_cap: <int> the max number of bytes kept in memory.
+    """
+    self.memory_cap = memory_cap
+    self.chunks = []
+    self.size = 0
+    self.spool_file = None
+
+  def write(self, data):
+    """Append some data to the spool, same as file.write."""
+    if not data:
+      return
+    if self.spool_file is None and self.size + len(data) > self.memory_cap:
+      self._RollOver()
+    if self.spool_file is None:
+      self.chunks.append(data)
+    else:
+      self.spool_file.write(data)
+    self.size += len(data)
+
+  def _RollOver(self):
+    """Move the chunks in memory to a new temporary file."""
+    self.spool_file = tempfile.TemporaryFile(prefix='pyrering_output')
+    self.spool_file.writelines(self.chunks)
+    self.chunks = []
+
+  def __len__(self):
+    return self.size
+
+  def IsFileBacked(self):
+    """Return True if the output has been moved to a temporary file."""
+    return self.spool_file is not None
+
+  def _Map(self):
+    """Return a read only mmap of the spool file."""
+    self.spool_file.flush()
+    return mmap.mmap(self.spool_file.fileno(), self.size,
+                     access=mmap.ACCESS_READ)
+
+  def Lines(self):
+    """Iterate through the output line by line.
+
+    Yields:
+      each line of the output without the line end.
+    """
+    if not self.size:
+      return
+    if self.spool_file is None:
+      for line in ''.join(self.chunks).splitlines():
+        yield line
+      return
+    mapped = self._Map()
+    try:
+      while True:
+        line = mapped.readline()
+        if not line:
+          break
+        yield line.rstrip('\r\n')
+    finally:
+      mapped.close()
+
+  def CopyTo(self, file_handler):
+    """Write the whole output to an open file.
+
+    Args:
+      file_handler: a file object opened for writing.
+    """
+    if self.spool_file is None:
+      file_handler.writelines(self.chunks)
+      return
+    if not self.size:
+      return
+    mapped = self._Map()
+    try:
+      for offset in range(0, self.size, COPY_SIZE):
+        file_handler.write(mapped[offset:offset + COPY_SIZE])
+    finally:
+      mapped.close()
+
+  def getvalue(self):
+    """Return the whole output as one string, same as StringIO.getvalue.
+
+    This loads a file backed spool into memory, so it should only be used when
+    the output is known to be small.
+    """
+    if self.spool_file is None:
+      return ''.join(self.chunks)
+    self.spool_file.flush()
+    self.spool_file.seek(0)
+    return self.spool_file.read()
+
+  def Close(self):
+    """Free the memory or the temporary file of the spool."""
+    self.chunks = []
+    self.size = 0
+    if self.spool_file is not None:
+      self.spool_file.close()
+      self.spool_file = None
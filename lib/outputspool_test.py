@@ -0,0 +1,78 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unittest for outputspool module."""
+
+import StringIO
+import unittest
+
+from lib import outputspool
+
+
+class OutputSpoolTest(unittest.TestCase):
+  """Unit test cases for OutputSpool class."""
+
+  def _Fill(self, spool):
+    for count in range(100):
+      spool.write('line %d\n' % count)
+
+  def testSmallOutputStaysInMemory(self):
+    """Output under the cap is not spooled to a file."""
+    spool = outputspool.OutputSpool(10000)
+    self._Fill(spool)
+    self.assertFalse(spool.IsFileBacked())
+    self.assertEqual(len(list(spool.Lines())), 100)
+    spool.Close()
+
+  def testLargeOutputGoesToFile(self):
+    """Output over the cap is spooled to a file and nothing is lost."""
+    spool = outputspool.OutputSpool(100)
+    self._Fill(spool)
+    self.assertTrue(spool.IsFileBacked())
+    self.assertEqual(spool.chunks, [])
+    lines = list(spool.Lines())
+    self.assertEqual(len(lines), 100)
+    self.assertEqual(lines[0], 'line 0')
+    self.assertEqual(lines[-1], 'line 99')
+    spool.Close()
+
+  def testMemoryAndFileSpoolsAreTheSame(self):
+    """Both kinds of spool give back the same content."""
+    in_memory = outputspool.OutputSpool(100000)
+    in_file = outputspool.OutputSpool(10)
+    for spool in [in_memory, in_file]:
+      self._Fill(spool)
+      spool.write('no line end')
+    self.assertEqual(list(in_memory.Lines()), list(in_file.Lines()))
+    self.assertEqual(in_memory.getvalue(), in_file.getvalue())
+    self.assertEqual(len(in_memory), len(in_file))
+    expected = in_memory.getvalue()
+    for spool in [in_memory, in_file]:
+      copy = StringIO.StringIO()
+      spool.CopyTo(copy)
+      self.assertEqual(copy.getvalue(), expected)
+      spool.Close()
+
+  def testEmptySpool(self):
+    """An empty spool has no lines."""
+    spool = outputspool.OutputSpool(0)
+    spool.write('')
+    self.assertEqual(list(spool.Lines()), [])
+    self.assertEqual(spool.getvalue(), '')
+
+
+if __name__ == '__main__':
+  unittest.main()
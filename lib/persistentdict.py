@@ -0,0 +1,146 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A dictionary kept in a pickle file, shared by concurrent PyreRing runs.
+
+The class PersistentDict loads a dictionary from a file and merges changes
+back into it. A change is written to a new temporary file in the same
+directory, which is then renamed over the old file, so a reader always sees a
+whole file without taking any lock. Writers take an exclusive flock on a side
+lock file, load what other runs have saved meanwhile, merge their own changes
+on top and write the result, so no run loses the updates of another.
+
+The file carries a version. A file with another version, or one which can not
+be read, is taken as empty and replaced on the next update.
+"""
+
+import fcntl
+import logging
+import os
+import tempfile
+
+try:
+  import cPickle as pickle
+except ImportError:
+  import pickle
+
+logger = logging.getLogger('PyreRing')
+
+LOCK_SUFFIX = '.lock'
+
+
+class PersistentDict(object):
+  """A dictionary saved in a file with locked merging updates."""
+
+  def __init__(self, path, version):
+    """Init the dictionary, nothing is read yet.
+
+    Args:
+      path: the path of the file to keep the dictionary.
+      version: any picklable value. A file saved with another version is
+        ignored.
+    """
+    self.path = path
+    self.version = version
+
+  def _Lock(self):
+    """Take the exclusive lock of the file and return the lock file."""
+    lock_file = open(self.path + LOCK_SUFFIX, 'a')
+    try:
+      fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+    except:
+      lock_file.close()
+      raise
+    return lock_file
+
+  def _Unlock(self, lock_file):
+    """Release the lock taken by _Lock."""
+    try:
+      fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    finally:
+      lock_file.close()
+
+  def Load(self):
+    """Read the dictionary from the file.
+
+    Returns:
+      a dictionary, empty if the file does not exist, can not be read or has
+      another version.
+    """
+    try:
+      data_file = open(self.path, 'rb')
+    except IOError:
+      return {}
+    try:
+      try:
+        data = pickle.load(data_file)
+      except Exception, e:
+        # A broken file is only a lost cache, it is rebuilt on the next update.
+        logger.warning('ignored unreadable file %s: %s' % (self.path, e))
+        return {}
+    finally:
+      data_file.close()
+    if (not isinstance(data, dict) or
+        data.get('version') != self.version or
+        not isinstance(data.get('entries'), dict)):
+      logger.info('ignored file %s with another version' % self.path)
+      return {}
+    return data['entries']
+
+  def Update(self, changes, removed=(), prune=None):
+    """Merge changes into the file.
+
+    Args:
+      changes: a dictionary of the keys to add or replace.
+      removed: a list of keys to delete.
+      prune: a function given the merged dictionary under the lock, returning
+        a list of more keys to delete. None to delete no more.
+
+    Returns:
+      the dictionary now saved, with the changes of other runs too.
+    """
+    lock_file = self._Lock()
+    try:
+      entries = self.Load()
+      entries.update(changes)
+      for key in removed:
+        entries.pop(key, None)
+      if prune:
+        for key in prune(entries):
+          entries.pop(key, None)
+      self._Write({'version': self.version, 'entries': entries})
+    finally:
+      self._Unlock(lock_file)
+    return entries
+
+  def _Write(self, data):
+    """Replace the file with the data in one rename."""
+    handle, temp_path = tempfile.mkstemp(
+        prefix=os.path.basename(self.path),
+        dir=os.path.dirname(os.path.abspath(self.path)))
+    try:
+      temp_file = os.fdopen(handle, 'wb')
+      try:
+        pickle.dump(data, temp_file, pickle.HIGHEST_PROTOCOL)
+        temp_file.flush()
+        os.fsync(temp_file.fileno())
+      finally:
+        temp_file.close()
+      os.rename(temp_path, self.path)
+    except:
+      if os.path.exists(temp_path):
+        os.remove(temp_path)
+      raise
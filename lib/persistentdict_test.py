@@ -0,0 +1,80 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unittest for persistentdict module."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from lib import persistentdict
+
+
+class PersistentDictTest(unittest.TestCase):
+  """Unit test cases for PersistentDict class."""
+
+  def setUp(self):
+    self.tempdir = tempfile.mkdtemp()
+    self.path = os.path.join(self.tempdir, 'data')
+
+  def tearDown(self):
+    shutil.rmtree(self.tempdir)
+
+  def testMissingFileIsEmpty(self):
+    """A dictionary never saved loads empty."""
+    self.assertEqual(persistentdict.PersistentDict(self.path, 1).Load(), {})
+
+  def testUpdatesAreMerged(self):
+    """Updates from two instances are both kept."""
+    first = persistentdict.PersistentDict(self.path, 1)
+    second = persistentdict.PersistentDict(self.path, 1)
+    first.Update({'a': 1, 'b': 2})
+    saved = second.Update({'c': 3}, ['b'])
+    self.assertEqual(saved, {'a': 1, 'c': 3})
+    self.assertEqual(first.Load(), {'a': 1, 'c': 3})
+    self.assertEqual(sorted(os.listdir(self.tempdir)), ['data', 'data.lock'])
+
+  def testOtherVersionIgnored(self):
+    """A file saved with another version loads empty."""
+    persistentdict.PersistentDict(self.path, 1).Update({'a': 1})
+    self.assertEqual(persistentdict.PersistentDict(self.path, 2).Load(), {})
+
+  def testBrokenFileIgnored(self):
+    """A broken file loads empty and is replaced on update."""
+    open(self.path, 'w').write('not a pickle')
+    one = persistentdict.PersistentDict(self.path, 1)
+    self.assertEqual(one.Load(), {})
+    one.Update({'a': 1})
+    self.assertEqual(one.Load(), {'a': 1})
+
+  def testPruneSeesMergedEntries(self):
+    """prune is given the entries of all runs and its keys are deleted."""
+    persistentdict.PersistentDict(self.path, 1).Update({'a': 1, 'b': 2})
+    seen = []
+
+    def Prune(entries):
+      seen.append(sorted(entries))
+      return ['a']
+
+    saved = persistentdict.PersistentDict(self.path, 1).Update(
+        {'c': 3}, prune=Prune)
+    self.assertEqual(seen, [['a', 'b', 'c']])
+    self.assertEqual(saved, {'b': 2, 'c': 3})
+
+
+if __name__ == '__main__':
+  unittest.main()
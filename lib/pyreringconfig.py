@@ -68,6 +68,74 @@ class PyreRingConfig(object):
                   regardless of the return code of the test.
     default_suite: The name of default test suite, not currently used.
                    No default value.
+    output_memory_cap: the number of bytes of the output of one test kept in
+                       memory. Output beyond it is spooled to a temporary
+                       file. default value is 1048576.
+    zygote_preload: comma separated modules the zygote imports before it
+                    forks the tests. Empty for the top level modules found in
+                    python_lib_dir. default value is empty.
+    kill_grace: the seconds a timed out test has to exit after SIGTERM,
+                before it and all the processes it started get SIGKILL.
+                default value is 5.
+    report_checkpoint: the number of test results between two rewrites of the
+                       report file while the test runs. 1 rewrites it after
+                       every result, 0 writes it only at the start and the
+                       end. default value is 100.
+    scan_index: the file to keep the parsed config headers of the test
+                scripts between runs, so unchanged scripts are not read
+                again. Empty to read every script on every run.
+                default value is <root_dir>/conf/scan_index
+    header_scan_lines: the number of leading lines of a test script searched
+                       for the PR_START line. The rest of a script without it
+                       is not read. default value is 1000.
+    header_scan_bytes: the same limit in bytes. default value is 1048576.
+    history_file: the file under report_dir to append the duration, return
+                  code and status of every test to. Empty to keep no history.
+                  default value is pyrering.history
+    history_max_size: the size in bytes history_file is compacted at, by
+                      dropping its oldest records down to half this size. 0
+                      to let it grow. default value is 33554432.
+    retry_backoff: the seconds to wait before the first retry of a test, each
+                   retry waits twice as long as the one before it.
+                   default value is 0.
+    flake_samples: the number of latest runs in history_file the flake rate
+                   of a FLAKY test is reported from. default value is 20.
+    default_duration: the expected duration in seconds of a test with no
+                      history. When tests run concurrently, the ones expected
+                      to take longest start first. default value is 60.
+    shard_method: how the tests of a suite are split between shards, 'hash'
+                  by the hash of the script paths or 'duration' to balance
+                  the durations in the shard_durations file. Without one,
+                  the tests are split by hash. default value is hash.
+    size_weights: comma separated SIZE=slots pairs, the slots taken by a test
+                  of each SIZE in its header when tests run at the same time.
+                  'all' takes the whole slot budget, so the test runs alone.
+                  A SIZE not listed takes 1 slot.
+                  default value is SMALL=1,MEDIUM=4,LARGE=all
+    slots: the slot budget shared by the tests running at the same time. 0
+           for as many slots as jobs. default value is 0.
+    nfs_jobs: the number of tests with NFS = True in their header allowed to
+              run at the same time, when jobs is more than 1.
+              default value is 2.
+    setup_suite: comma separated suites run before the user suites. If any
+                 test in them fails, no other test runs. Empty for none.
+                 default value is SETUP.sh,SETUP.py,SETUP.par,SETUP.suite
+    teardown_suite: comma separated suites run after the user suites. Empty
+                    for none. default value is
+                    TEARDOWN.sh,TEARDOWN.py,TEARDOWN.par,TEARDOWN.suite
+    change_index: the file to keep the md5 and change time of the scripts and
+                  their dependencies, used by changed_since.
+                  default value is <root_dir>/conf/change_index
+    result_cache: the file to keep the passed results of the tests with
+                  CACHEABLE = True in their header. A test is not run again
+                  while its script, header, environment and INPUTS files are
+                  unchanged. Empty to run every test.
+                  default value is <root_dir>/conf/result_cache
+    result_cache_ttl: the seconds a cached pass is used for.
+                      default value is 604800, a week.
+    result_cache_size: the number of results kept in the cache, the least
+                       recently used ones are dropped first.
+                       default value is 10000.
 
   Managed by config file and user can overwrite through command line options:
     report_dir: the PyreRing report and log directory.
@@ -88,6 +156,42 @@ class PyreRingConfig(object):
               default name is pyrering.log
     file_errors: a boolean value that turns on filing the output of each none
                  passing testcase to a separate output file.
+    jobs: the number of test scripts to run at the same time. Scripts with
+          CONCURRENT = False or ROOT_ACCESS = True in their header always run
+          alone.
+          default value is 1.
+    shard_index: the shard of each suite this run runs, from 0 to
+                 total_shards - 1. SETUP and TEARDOWN are not split, every
+                 shard runs them. default value is 0.
+    shard_durations: the durations file the 'duration' shard_method splits
+                     the suites by, the same on all shards. See the sharding
+                     module for its format. No default value.
+    total_shards: the number of shards each suite is split into.
+                  default value is 1.
+    max_retries: the times a FAIL or TIMEOUT test without RETRIES in its
+                 header is run again before it is reported. A test passing on
+                 a retry is reported as FLAKY, which is not a failure.
+                 default value is 0.
+    rerun_failed: a boolean value to only run the tests which were FAIL,
+                  TIMEOUT, ERROR or LIMIT in the last run on this host, as read
+                  from history_file. Setup and teardown suites run whole.
+                  default value is False.
+    changed_since: only run the scripts changed, or with INPUTS or DEPENDS_ON
+                   files changed, since a run id in the history file, 'last'
+                   for the latest run on this host, or seconds since epoch.
+                   Setup and teardown suites run whole. Files never seen by
+                   change_index before are judged by their mtime.
+                   No default value.
+    no_cache: a boolean value to run every test, even one with a cached pass.
+              Passed results still refresh the cache. default value is False.
+    zygote: a boolean value to run the python test scripts forked from a warm
+            python process, instead of starting a new interpreter for each.
+            Scripts with shell syntax in their command or a #! line without
+            python still run in a shell. It is not used by eventrunner.
+            default value is False.
+    runner: the runner to run the tests with. baserunner runs each test on a
+            thread of its own, eventrunner supervises all the running tests
+            from one event loop. default value is baserunner.
     reset: a boolean value user sets from the command line. If true, the run
            time configuration will replace existing configuration file. It has
            no effect in the conf file.
@@ -136,9 +240,10 @@ User can edit it later to change default values at: %s.
       # so I have to strip the quotes around the values
       key = key.strip()
       value = value.strip(' \t\r\'"')
-      # sendmail, reset and skip_setup should be treated as boolean values,
-      # others are treated as strings.
-      if key in ['sendmail', 'reset', 'skip_setup']:
+      # sendmail, reset, skip_setup, no_cache, rerun_failed and zygote should
+      # be treated as boolean values, others are treated as strings.
+      if key in ['sendmail', 'reset', 'skip_setup', 'no_cache',
+                 'rerun_failed', 'zygote']:
         settings[key] = (value.lower().startswith('true') or
                          value.startswith('1'))
       else:
@@ -176,12 +281,48 @@ User can edit it later to change default values at: %s.
         'email_recipients': getpass.getuser(),
         'log_file': 'pyrering.log',
         'file_errors': False,
+        'jobs': 1,
+        'max_retries': 0,
         'reset': False,
         'runner': 'baserunner',
         'FATAL_STRING': '',
         'header_file': 'header_info.txt',
         'skip_setup': False,
         'log_level': 'INFO',
+        'output_memory_cap': 1024 * 1024,
+        'kill_grace': 5,
+        'report_checkpoint': 100,
+        'scan_index': self.filesystem.PathJoin(pyrering_root,
+                                               'conf',
+                                               'scan_index'),
+        'header_scan_lines': 1000,
+        'header_scan_bytes': 1024 * 1024,
+        'history_file': 'pyrering.history',
+        'history_max_size': 32 * 1024 * 1024,
+        'retry_backoff': 0,
+        'flake_samples': 20,
+        'default_duration': 60,
+        'shard_index': 0,
+        'total_shards': 1,
+        'shard_method': 'hash',
+        'shard_durations': '',
+        'result_cache': self.filesystem.PathJoin(pyrering_root,
+                                                 'conf',
+                                                 'result_cache'),
+        'result_cache_ttl': 7 * 24 * 3600,
+        'result_cache_size': 10000,
+        'no_cache': False,
+        'rerun_failed': False,
+        'zygote': False,
+        'zygote_preload': '',
+        'size_weights': 'SMALL=1,MEDIUM=4,LARGE=all',
+        'slots': 0,
+        'nfs_jobs': 2,
+        'change_index': self.filesystem.PathJoin(pyrering_root,
+                                                 'conf',
+                                                 'change_index'),
+        'setup_suite': 'SETUP.sh,SETUP.py,SETUP.par,SETUP.suite',
+        'teardown_suite': 'TEARDOWN.sh,TEARDOWN.py,TEARDOWN.par,TEARDOWN.suite',
         # A timestamp string to identify the time pyrering is started.
         # The format should be yyymmddHHMM
         'time': time.strftime('%Y%m%d%H%M'),
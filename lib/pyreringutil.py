@@ -51,6 +51,11 @@ DEBUG = common_util.DebugLog
 START_SIGN = '# PR_START'
 END_SIGN = '# PR_END'
 BINARY_SUFFIXES = ['.par']
+# Give up looking for START_SIGN after this many leading lines or bytes.
+HEADER_SCAN_LINES = 1000
+HEADER_SCAN_BYTES = 1024 * 1024
+# The longest line read at a time while looking for the config section.
+HEADER_LINE_LIMIT = 64 * 1024
 
 
 class PyreRingFrameworkAdaptor(object):
@@ -113,14 +118,75 @@ class PyreRingFrameworkAdaptor(object):
     raise NotImplementedError('CheckFramework method not implemented.')
   
 
+def TestEnvironment(settings, base_environment=None):
+  """Build the environment the test scripts run with.
+
+  The environment of PyreRing is not changed, the tests are started with the
+  dictionary returned. There are some environment variables we need to pass
+  on to the test scripts.
+  1. the source_dir: this variable defines the root directory of the project
+  specific directory. testcase scripts should be under a subdir of this dir.
+  And all other project specific things should be put under this dir.
+  Also users can refer os.environ['source_dir'] to get the absolute path and
+  looking around the file system for other files.
+
+  2. PYTHONPATH: here we will add the use defined python libs to python path,
+  so user will not need to bother with python path management. The default
+  one is $source_dir, also user can add any other path by defining
+  'python_lib_dir' variable in the configure file.
+  So in the test script, pythonpath will be set automatically, user can drop
+  their lib files to $source_dir as the top level and follow the import
+  format of python import rule or any where they define in
+  python_lib_dir
+
+  3. PERL5LIB: Similar as PYTHONPATH with extra 'perl_lib_dir' for user to
+  define extra libary path.
+
+  Args:
+    settings: <dict> the global settings.
+    base_environment: <dict> the environment to add to, os.environ if None.
+
+  Returns:
+    a new dictionary of the environment.
+  """
+  environment_path_list = (
+      ('PYTHONPATH', 'python_lib_dir'),
+      ('PATH', 'shell_lib_dir'),
+      ('PERL5LIB', 'perl_lib_dir'),
+      )
+  if base_environment is None:
+    base_environment = os.environ
+  environment = dict(base_environment)
+
+  # This is default lib path we need to add on
+  lib_path = settings['source_dir']
+  environment['source_dir'] = lib_path
+
+  for environment_path, user_var in environment_path_list:
+    new_paths = [lib_path]
+    if user_var in settings:
+      new_paths.extend(settings[user_var].split(os.pathsep))
+    for new_path in new_paths:
+      path = environment.get(environment_path)
+      if path is None:
+        # There is no such variable in environment.
+        environment[environment_path] = new_path
+      elif not new_path in path.split(os.pathsep):
+        # Attach the new_path if it is not already in it.
+        environment[environment_path] = os.pathsep.join([path, new_path])
+    logger.debug('%s is set to: %s' % (environment_path,
+                                       environment[environment_path]))
+  return environment
+
+
 class PyreRingSuiteRunner(object):
   """This class is a univeral runner.
 
   It is supposed to be constructed with any test framework which has implemented
   PyreRingFrameworkAdaptor abstract class.
-  It takes care of populating the environment variables: PYTHONPATH and PATH,
-  feeding a list of test suites to the framework it is constructed with and
-  archiving test result files.
+  It takes care of feeding a list of test suites to the framework it is
+  constructed with and archiving test result files. The framework runs the
+  tests with the environment from TestEnvironment.
   """
 
   def __init__(self, framework, suite_list):
@@ -179,77 +245,6 @@ class PyreRingSuiteRunner(object):
     """
     self.framework.Cleanup()
 
-  def _SetEnvironment(self):
-    """Called by Run to set up environment variables.
-
-    there are some environment variables we need to pass on to the subshell
-    which will be used to run the actual test scripts.
-    1. the source_dir: this variable defines the root directory of the project
-    specific directory. testcase scripts should be under a subdir of this dir.
-    And all other project specific things should be put under this dir.
-    Also users can refer os.environ['source_dir'] to get the absolute path and
-    looking around the file system for other files.
-
-    2. PYTHONPATH: here we will add the use defined python libs to python path,
-    so user will not need to bother with python path management. The default
-    one is $source_dir, also user can add any other path by defining
-    'python_lib_dir' variable in the configure file.
-    So in the test script, pythonpath will be set automatically, user can drop
-    their lib files to $source_dir as the top level and follow the import
-    format of python import rule or any where they define in
-    python_lib_dir
-
-    3. PERL5LIB: Similar as PYTHONPATH with extra 'perl_lib_dir' for user to
-    define extra libary path.
-
-    Returns:
-      None
-    """
-    environment_path_list = (
-        ('PYTHONPATH', 'python_lib_dir'),
-        ('PATH', 'shell_lib_dir'),
-        ('PERL5LIB', 'perl_lib_dir'),
-        )
-
-    # Setting up environment first, these variables will be passed on to the
-    # subshell which is used to run the actual test scripts.
-
-    # This is default lib path we need to add on
-    lib_path = self.prop['source_dir']
-    os.environ['source_dir'] = lib_path
-
-    for environment_path, user_var in environment_path_list:
-      self._AttachEnvironmentPath(environment_path, [lib_path])
-      if user_var in self.prop:
-        self._AttachEnvironmentPath(
-            environment_path,
-            self.prop[user_var].split(os.pathsep))
-
-  def _AttachEnvironmentPath(self, env_var, new_paths):
-    """Attach new_path to the environment path variable.
-
-    This method is used to update path environment variables.
-    It will append a list of paths to the given environment variable.
-
-    Args:
-      env_var: <string> the target environment variable to be appended to.
-      new_paths: <list> a list of pathes to append the env_var.
-
-    Returns:
-      None.
-    """
-    for new_path in new_paths:
-      try:
-        path = os.environ[env_var]
-        # Attach the new_path if it is not already in it.
-        if not new_path in path.split(os.pathsep):
-          path = os.pathsep.join([path, new_path])
-          os.environ[env_var] = path
-      except KeyError:
-        # There is no such variable in environment.
-        os.environ[env_var] = new_path
-      logger.debug('%s is updated to: %s' %(env_var, new_path))
-
   @DEBUG
   def Run(self, email_flag=True):
     """The public method to start the test.
@@ -268,7 +263,6 @@ class PyreRingSuiteRunner(object):
     Returns:
       The count of non-successful test cases.
     """
-    self._SetEnvironment()
     failure_count = self.framework.Run(self.run_suite, email_flag)
     # After the test run, try to go to report directory collect all log files
     # and archive them.
@@ -302,8 +296,7 @@ class PyreRingSuiteRunner(object):
     tar = tarfile.open(archive_file, 'w:gz')
     for name in report_file_list:
       for onefile in glob.glob(name):
-        os.chdir(os.path.dirname(onefile))
-        tar.add(os.path.basename(onefile))
+        tar.add(onefile, os.path.basename(onefile))
         if not keep:
           os.remove(onefile)
     tar.close()
@@ -336,23 +329,34 @@ class PRConfigParser(object):
       # key2 = value2
       # PR_END
   Currently supported keys are: TIMEOUT, ROOT_ACCESS, EXPECTED_RETURN,
-  CONCURRENT, NFS, ERROR. These configs describe how this test script
-  should be run with.
+  CONCURRENT, NFS, ERROR, KILL_ON_FATAL, CACHEABLE, INPUTS, DEPENDS_ON,
+  MAX_RSS_MB, CPU_TIMEOUT, MAX_OPEN_FILES, NICE, RETRIES. These configs
+  describe how this test script should be run with.
   This info will be read in and packed in a dictionary and send to the actual
   runner to execute the script, which has the final decision how the test script
   should be run.
   """
 
   def __init__(self,
-               filesystem=filesystemhandlerextend.FileSystemHandlerExtend()):
+               filesystem=filesystemhandlerextend.FileSystemHandlerExtend(),
+               index=None):
     """Provide a empty dictionary and a list of supported keys.
 
     Args:
       filesystem: a FileSystemHandlerExtend object as a layer between this code
       and the actual filesystem. So I can swap this layer with a mock
       filesystem for testing.
+      index: a scanindex.ScanIndex to get the parsed configs of unchanged files
+      from, instead of reading them. None to always read the files.
     """
     self.filesystem = filesystem
+    self.index = index
+    # A file without START_SIGN in its leading lines or bytes is taken as
+    # having no config section, the rest of it is not read.
+    self.header_scan_lines = int(global_settings.get('header_scan_lines',
+                                                     HEADER_SCAN_LINES))
+    self.header_scan_bytes = int(global_settings.get('header_scan_bytes',
+                                                     HEADER_SCAN_BYTES))
 
     # This is the list of currently supported config keys. Any other keys not
     # defined in this list will be take as strings only.
@@ -367,6 +371,15 @@ class PRConfigParser(object):
                      'COMMENTS',
                      'FLAGS',
                      'ERROR',
+                     'KILL_ON_FATAL',
+                     'CACHEABLE',
+                     'INPUTS',
+                     'DEPENDS_ON',
+                     'MAX_RSS_MB',
+                     'CPU_TIMEOUT',
+                     'MAX_OPEN_FILES',
+                     'NICE',
+                     'RETRIES',
                     ]
 
   @DEBUG
@@ -387,6 +400,15 @@ class PRConfigParser(object):
       'COMMENTS'
       'FLAGS'
       'ERROR'
+      'KILL_ON_FATAL'
+      'CACHEABLE'
+      'INPUTS'
+      'DEPENDS_ON'
+      'MAX_RSS_MB'
+      'CPU_TIMEOUT'
+      'MAX_OPEN_FILES'
+      'NICE'
+      'RETRIES'
     """
     test_case_config = {}
     test_case_config['TEST_SCRIPT'] = ''
@@ -400,6 +422,23 @@ class PRConfigParser(object):
     test_case_config['COMMENTS'] = None
     test_case_config['FLAGS'] = None
     test_case_config['ERROR'] = 255 
+    # Kill the test as soon as a fatal string shows up in its output.
+    test_case_config['KILL_ON_FATAL'] = False
+    # A passed result can be reused while the script, its config, environment
+    # and the comma separated INPUTS files are unchanged.
+    test_case_config['CACHEABLE'] = False
+    test_case_config['INPUTS'] = None
+    # Comma separated files, wildcards or dirs the test depends on. The test
+    # is selected by changed_since when any of them changed.
+    test_case_config['DEPENDS_ON'] = None
+    # Resource limits set in the test process, see resourcelimits. None for
+    # no limit.
+    test_case_config['MAX_RSS_MB'] = None
+    test_case_config['CPU_TIMEOUT'] = None
+    test_case_config['MAX_OPEN_FILES'] = None
+    test_case_config['NICE'] = None
+    # The times a FAIL or TIMEOUT is run again, None for max_retries.
+    test_case_config['RETRIES'] = None
 
     return test_case_config
 
@@ -416,8 +455,10 @@ class PRConfigParser(object):
       A dictionary has one pair of key, value corresponding to the line.
 
     Raises:
-      ValueError: if ROOT_ACCESS, CONCURRENT, NFS are given non-valid boolean
-      values or TIMEOUT, EXPECTED_RETURN, ERROR are given none integers.
+      ValueError: if ROOT_ACCESS, CONCURRENT, NFS, KILL_ON_FATAL, CACHEABLE are
+      given non-valid boolean values or EXPECTED_RETURN, ERROR, MAX_RSS_MB,
+      CPU_TIMEOUT, MAX_OPEN_FILES, NICE, RETRIES are given none integers or
+      TIMEOUT is given a none number.
     """
     temp_dict = {}
     if (not line.startswith('#') or
@@ -428,12 +469,23 @@ class PRConfigParser(object):
     key, value = line[1:].split('=', 1)
     key = key.strip().upper()
     value = value.strip().strip('"').strip("'")
-    if key in ['TIMEOUT', 'EXPECTED_RETURN', 'ERROR']:
+    if key == 'TIMEOUT':
+      # Timeouts can be given in fractions of a second.
+      try:
+        temp_dict[key] = int(value)
+      except ValueError:
+        try:
+          temp_dict[key] = float(value)
+        except ValueError:
+          raise ValueError('Invalid number %s for key:%s' % (value, key))
+    elif key in ['EXPECTED_RETURN', 'ERROR', 'MAX_RSS_MB', 'CPU_TIMEOUT',
+                 'MAX_OPEN_FILES', 'NICE', 'RETRIES']:
       try:
         temp_dict[key] = int(value)
       except:
         raise ValueError('Invalid integer %s for key:%s' % (value, key))
-    elif key in ['ROOT_ACCESS', 'CONCURRENT', 'NFS']:
+    elif key in ['ROOT_ACCESS', 'CONCURRENT', 'NFS', 'KILL_ON_FATAL',
+                 'CACHEABLE']:
       if value.lower().startswith('false'):
         temp_dict[key] = False
       elif value.lower().startswith('true'):
@@ -513,19 +565,85 @@ class PRConfigParser(object):
       logger.debug('exit PRConfigParser.ParseFile with binary default')
       return configs
 
+    if self.index is None:
+      configs = self._ReadFile(anyfile, populate_default)
+    else:
+      # The index keeps the configs as defined in the file, the defaults are
+      # filled in here.
+      signature, configs = self.index.Lookup(anyfile)
+      if configs is None:
+        configs = self._ReadFile(anyfile, False)
+        self.index.Store(anyfile, signature, configs)
+      if populate_default:
+        default = self.Default()
+        default.update(configs)
+        configs = default
+    # This always overwrites whatever defined in configuration.
+    configs['TEST_SCRIPT'] = anyfile
+    return configs
+
+  def _ReadHeader(self, config_file):
+    """Read the lines of the config section from an open file.
+
+    The file is read line by line up to END_SIGN. If START_SIGN does not show
+    up in the first header_scan_lines lines or header_scan_bytes bytes, the
+    reading stops there too.
+
+    Args:
+      config_file: a file object open for read.
+
+    Returns:
+      a list of lines from START_SIGN to END_SIGN, or up to the end of the file
+      if END_SIGN is missing. An empty list if START_SIGN is not found.
+    """
+    lines = []
+    scanned_lines = 0
+    scanned_bytes = 0
+    while True:
+      line = config_file.readline(HEADER_LINE_LIMIT)
+      if not line:
+        break
+      if lines:
+        lines.append(line)
+        if line.strip().startswith(END_SIGN):
+          break
+      elif line.strip().startswith(START_SIGN):
+        lines.append(line)
+      else:
+        scanned_lines += 1
+        scanned_bytes += len(line)
+        if (scanned_lines >= self.header_scan_lines or
+            scanned_bytes >= self.header_scan_bytes):
+          logger.debug('no config section in the first %d lines' %
+                       scanned_lines)
+          break
+    return lines
+
+  def _ReadFile(self, anyfile, populate_default):
+    """Read a file and parse out the config section.
+
+    Args:
+      anyfile: a file path
+      populate_default: a boolean value if default value should be given if not
+        defined.
+
+    Returns:
+      a dictionary of the configuration
+
+    Raises:
+      ValueError: if the file has invalid configuration info
+    """
     config_file = self.filesystem.FileOpenForRead(anyfile)
     try:
       try:
-        configs = self.ParseList(config_file.readlines(), populate_default)
+        return self.ParseList(self._ReadHeader(config_file),
+                              populate_default)
       except ValueError:
         err_msg = ('Exception[%s] on file: [%s].\n\tSTACK TRACE:\n%s' %
                    (sys.exc_type, anyfile, traceback.format_exc()))
         raise ValueError(err_msg)
     finally:
       self.filesystem.FileClose(config_file)
-    # This always overwrites whatever defined in configuration.
-    configs['TEST_SCRIPT'] = anyfile
-    return configs
 
   @DEBUG
   def ParseFiles(self, files, populate_default=True):
@@ -542,6 +660,8 @@ class PRConfigParser(object):
     config_list = []
     for one_file in files:
       config_list.append(self.ParseFile(one_file, populate_default))
+    if self.index is not None:
+      self.index.Save()
     return config_list
 
   @DEBUG
@@ -46,6 +46,15 @@ DEFAULT_DICT = {'ROOT_ACCESS': False,
                 'COMMENTS': None,
                 'FLAGS': None,
                 'ERROR': 255,
+                'KILL_ON_FATAL': False,
+                'CACHEABLE': False,
+                'INPUTS': None,
+                'DEPENDS_ON': None,
+                'MAX_RSS_MB': None,
+                'CPU_TIMEOUT': None,
+                'MAX_OPEN_FILES': None,
+                'NICE': None,
+                'RETRIES': None,
                }
 
 
@@ -100,17 +109,20 @@ class PyreRingUtilPyreRingSuiteRunnerTest(unittest.TestCase):
     self.failIf(os.path.isfile(report_file))
 
   def testRunCheckEnvironment(self):
-    """Run method should get environment variable set for 3 variables."""
+    """The test environment gets 4 variables, os.environ is not changed."""
     global_settings['source_dir'] = self.tmp_dir
+    global_settings['python_lib_dir'] = '/lib/one:/lib/two'
+    before = dict(os.environ)
+    environment = pyreringutil.TestEnvironment(global_settings,
+                                               {'PATH': '/bin'})
+    self.assertEqual(environment['PATH'].split(':'), ['/bin', self.tmp_dir])
+    self.assertEqual(environment['PYTHONPATH'].split(':'),
+                     [self.tmp_dir, '/lib/one', '/lib/two'])
+    self.assertEqual(environment['PERL5LIB'].split(':'), [self.tmp_dir])
+    self.assertEqual(self.tmp_dir, environment['source_dir'])
     self.suite_runner.SetUp()
     self.suite_runner.Run(False)
-    path = os.environ['PATH']
-    self.assertTrue(self.tmp_dir in path.split(':'))
-    pythonpath = os.environ['PYTHONPATH']
-    self.assertTrue(self.tmp_dir in pythonpath.split(':'))
-    perl5lib_path = os.environ['PERL5LIB']
-    self.assertTrue(self.tmp_dir in perl5lib_path.split(':'))
-    self.assertEqual(self.tmp_dir, os.environ['source_dir'])
+    self.assertEqual(dict(os.environ), before)
 
   def testRunGetBackResults(self):
     """The framework returns an int back and Run should pass on that value."""
@@ -262,6 +274,60 @@ class PyreRingUtilPRConfigParserTest(unittest.TestCase):
     result['TEST_SCRIPT'] = ''
     self.assertEqual(result, DEFAULT_DICT)
     
+  def testStopReadingAtEndSign(self):
+    """Lines after END_SIGN are not read."""
+    temp_file_system = {'/tmp/source/test1.sh': ['#!/bin/sh\n',
+                                                 '# PR_START\n',
+                                                 '# TIMEOUT = 10\n',
+                                                 '# PR_END\n',
+                                                 'echo 1\n',
+                                                ]
+                       }
+    self._PopulateFileSystem(temp_file_system)
+    config_file = self.mock_filesystem.FileOpenForRead('/tmp/source/test1.sh')
+    lines = self.one_parser._ReadHeader(config_file)
+    self.assertEqual(lines, ['# PR_START\n', '# TIMEOUT = 10\n',
+                             '# PR_END\n'])
+    self.assertEqual(config_file.readline(), 'echo 1\n')
+
+  def testNoStartSignWithinLimit(self):
+    """The config section is not searched past the leading lines."""
+    self.one_parser.header_scan_lines = 3
+    script = ['#!/bin/sh\n'] * 3 + ['# PR_START\n',
+                                    '# TIMEOUT = 10\n',
+                                    '# PR_END\n',
+                                   ]
+    temp_file_system = {'/tmp/source/test1.sh': script}
+    self._PopulateFileSystem(temp_file_system)
+    result = self.one_parser.ParseFile('/tmp/source/test1.sh', False)
+    self.assertEqual(result, {'TEST_SCRIPT': '/tmp/source/test1.sh'})
+    self.one_parser.header_scan_lines = 4
+    result = self.one_parser.ParseFile('/tmp/source/test1.sh', False)
+    self.assertEqual(result['TIMEOUT'], 10)
+
+  def testNoStartSignWithinByteLimit(self):
+    """The config section is not searched past the leading bytes."""
+    self.one_parser.header_scan_bytes = 100
+    temp_file_system = {'/tmp/source/test1.sh': ['x' * 200 + '\n',
+                                                 '# PR_START\n',
+                                                 '# TIMEOUT = 10\n',
+                                                 '# PR_END\n',
+                                                ]
+                       }
+    self._PopulateFileSystem(temp_file_system)
+    result = self.one_parser.ParseFile('/tmp/source/test1.sh', False)
+    self.assertEqual(result, {'TEST_SCRIPT': '/tmp/source/test1.sh'})
+
+  def testMissingEndSignInFile(self):
+    """A config section without END_SIGN is still an error."""
+    temp_file_system = {'/tmp/source/test1.sh': ['# PR_START\n',
+                                                 '# TIMEOUT = 10\n',
+                                                ]
+                       }
+    self._PopulateFileSystem(temp_file_system)
+    self.assertRaises(ValueError, self.one_parser.ParseFile,
+                      '/tmp/source/test1.sh')
+
   def testErrorWrapping(self):
     """Errors are wrapped with more info and be kept thrown out."""
     temp_file_system = {'/tmp/source/test1.sh': ['# PR_START\n',
@@ -295,6 +361,15 @@ class PyreRingUtilPRConfigParserTest(unittest.TestCase):
                       test_config_lines,
                       False)
 
+  def testFractionalTimeout(self):
+    """TIMEOUT accepts fractions of a second."""
+    test_config_lines = ['# PR_START',
+                         '# TIMEOUT = 2.5',
+                         '# PR_END',
+                        ]
+    results = self.one_parser.ParseList(test_config_lines, False)
+    self.assertEqual(results, {'TIMEOUT': 2.5})
+
   def testInvalidBoolean(self):
     """Invalid boolean cast for CONCURRENT, NFS, ROOT_ACCESS."""
     test_config_lines = ['# PR_START',
@@ -42,6 +42,17 @@ EXTRA = 5
 APPEND = 6
 OVERWRITE = 7
 
+# The attribute name and title of each report section, in report order.
+SECTIONS = [(HEAD, 'header', 'HEADER:\n'),
+            (SUMMARY, 'summary', 'SUMMARY:\n'),
+            (PRE_BODY, 'pre_body', 'PRE_BODY:\n'),
+            (BODY, 'body', 'BODY:\n'),
+            (EXTRA, 'extra', 'EXTRA:\n'),
+           ]
+
+# The default number of results between two rewrites of the report file.
+DEFAULT_CHECKPOINT = 100
+
 TRUNCATE_MESSAGE = '''
 ...message truncated. Check the bottom for the full message.
 '''
@@ -134,11 +145,25 @@ class Reporter(object):
 class TxtReporter(Reporter):
   """A txt reporter reports test in txt format."""
 
-  def __init__(self, project_name=''):
-    """init the test reporter with a project name."""
+  def __init__(self, project_name='', checkpoint=DEFAULT_CHECKPOINT):
+    """init the test reporter with a project name.
+
+    Each section of the report is kept as a list of strings, so adding a
+    result does not copy what is already there. The whole report file is
+    rewritten at StartTest, EndTest and every checkpoint results in between.
+
+    Args:
+      project_name: the name of the project to put in the report.
+      checkpoint: <int> rewrite the report file after this many results, 1 to
+        rewrite it after every result, 0 to write it only at the start and
+        the end of the test.
+    """
     super(TxtReporter, self).__init__()
     logger.debug('enter TxtReporter.__init__')
     self.project_name = project_name
+    self.checkpoint = checkpoint
+    # The number of results not written to the report file yet.
+    self.pending = 0
     self.report_file = ''
     self.report_pipe = ''
 
@@ -152,21 +177,20 @@ class TxtReporter(Reporter):
     self.timeout = 0
     self.notrun = 0
     self.error = 0
+    self.limit = 0
+    self.flaky = 0
     self.unknown = 0
     self.extra_message = '\nExtra Notes:\n'
 
-    self.header = 'HEADER:\n'
-    self.summary = 'SUMMARY:\n'
-    self.body = 'BODY:\n'
-    self.extra = 'EXTRA:\n'
-    self.pre_body = 'PRE_BODY:\n'
+    for unused_location, name, title in SECTIONS:
+      setattr(self, name, [title])
 
     logger.debug('exit TxtReporter.__init__')
 
   def _WriteToRecord(self, location, msg, mode=APPEND):
-    """Save info to record strings.
+    """Save info to record sections.
 
-    This method will store the msg into a string for the test report.
+    This method will store the msg into a section list for the test report.
 
     Args:
       location: one of the constants, HEAD, SUMMARY, BODY, EXTRA.
@@ -184,27 +208,14 @@ class TxtReporter(Reporter):
     if mode not in [APPEND, OVERWRITE]:
       raise ReporterError('Unknown mode: %d' % mode)
 
-    if location == HEAD and mode == APPEND:
-      self.header = '%s%s\n' % (self.header, msg)
-    elif location == HEAD and mode == OVERWRITE:
-      self.header = 'HEADER:\n%s\n' % msg
-    elif location == SUMMARY and mode == APPEND:
-      self.summary = '%s%s\n' % (self.summary, msg)
-    elif location == SUMMARY and mode == OVERWRITE:
-      self.summary = 'SUMMARY:\n%s\n' % msg
-    elif location == PRE_BODY and mode == APPEND:
-      self.pre_body = '%s%s\n' % (self.pre_body, msg)
-    elif location == PRE_BODY and mode == OVERWRITE:
-      self.pre_body = 'PRE_BODY:\n%s\n' % msg
-    elif location == BODY and mode == APPEND:
-      self.body = '%s%s\n' % (self.body, msg)
-    elif location == BODY and mode == OVERWRITE:
-      self.body = 'BODY:\n%s\n' % msg
-    elif location == EXTRA and mode == APPEND:
-      self.extra = '%s%s\n' % (self.extra, msg)
-    elif location == EXTRA and mode == OVERWRITE:
-      self.extra = 'EXTRA:\n%s\n' % msg
-  
+    for one_location, name, title in SECTIONS:
+      if one_location == location:
+        break
+    if mode == APPEND:
+      getattr(self, name).append('%s\n' % msg)
+    else:
+      setattr(self, name, [title, '%s\n' % msg])
+
   @DEBUG
   def TestCaseReport(self, name, result, msg=''):
     """Report one test case result.
@@ -214,7 +225,8 @@ class TxtReporter(Reporter):
 
     Args:
       name: the testcase name
-      result: the result string 'PASS/FAIL/TIMEOUT/ERROR'
+      result: the result string
+        'PASS/FAIL/TIMEOUT/ERROR/NOT_RUN/LIMIT/FLAKY'
       msg: any extra messsage needed to append to the end of this test case.
 
     Returns:
@@ -237,10 +249,14 @@ class TxtReporter(Reporter):
       self.notrun += 1
     elif result == constants.ERROR:
       self.error += 1
+    elif result == constants.LIMIT:
+      self.limit += 1
+    elif result == constants.FLAKY:
+      self.flaky += 1
     else:
       self.unknown += 1
 
-    self._WriteToReport()
+    self._Checkpoint()
 
   @DEBUG
   def SuiteReport(self, name, result, msg=''):
@@ -259,7 +275,7 @@ class TxtReporter(Reporter):
     """
     self._WriteToRecord(BODY, '\nSUITE: %s%s%s\n%s%s' %
                         (name, ' ' * 4, result, ' ' * 8, msg))
-    self._WriteToReport()
+    self._Checkpoint()
 
   @DEBUG
   def SetReportFile(self, file_name):
@@ -317,16 +333,22 @@ class TxtReporter(Reporter):
     self._SummaryTestToRecord()
     self._WriteToReport()
 
+  def _Checkpoint(self):
+    """Count one more result, write the report file if it is time to."""
+    self.pending += 1
+    if self.checkpoint and self.pending >= self.checkpoint:
+      self._WriteToReport()
+
   def _WriteToReport(self):
     """Write the result to self.report_file."""
     self.report_pipe = open(self.report_file, 'w')
     self.report_pipe.write(''.join(['-' * 40, '\n']))
-    for message in [self.header, self.summary, self.pre_body,
-                    self.body, self.extra]:
-      self.report_pipe.write(message)
+    for unused_location, name, unused_title in SECTIONS:
+      self.report_pipe.writelines(getattr(self, name))
       self.report_pipe.write(''.join(['-' * 40, '\n']))
-      self.report_pipe.flush()
+    self.report_pipe.flush()
     self.report_pipe.close()
+    self.pending = 0
 
   def _WriteTestToFile(self, output_file, testcase, msg):
     """Write test case output to a single file.
@@ -334,14 +356,18 @@ class TxtReporter(Reporter):
     Args:
       output_file: string, pathname of testcase output file.
       testcase: string, testcase name.
-      msg: string, output from testcase.
+      msg: string or outputspool.OutputSpool, output from testcase.
     Returns:
       None.
     """
     self.report_pipe = open(output_file, 'w')
     self.report_pipe.write(testcase)
     self.report_pipe.write('\n\n')
-    self.report_pipe.write(msg)
+    if hasattr(msg, 'CopyTo'):
+      # A spool can be larger than memory, copy it over without loading.
+      msg.CopyTo(self.report_pipe)
+    else:
+      self.report_pipe.write(msg)
     self.report_pipe.flush()
     self.report_pipe.close()
 
@@ -355,11 +381,12 @@ class TxtReporter(Reporter):
       None. The constructed info sent to report_pipe.
     """
     total = (self.passed + self.failed + self.timeout + self.notrun +
-             self.error + self.unknown)
+             self.error + self.limit + self.flaky + self.unknown)
     if not total:
       percent = '0'
     else:
-      percent = str(self.passed * 100 / total)
+      # A FLAKY test passed in the end.
+      percent = str((self.passed + self.flaky) * 100 / total)
 
     self._WriteToRecord(
         SUMMARY,
@@ -369,6 +396,8 @@ class TxtReporter(Reporter):
                    'Test %8s:     %d' % (constants.TIMEOUT, self.timeout),
                    'Test %8s:     %d' % (constants.ERROR, self.error),
                    'Test %8s:     %d' % (constants.NOTRUN, self.notrun),
+                   'Test %8s:     %d' % (constants.LIMIT, self.limit),
+                   'Test %8s:     %d' % (constants.FLAKY, self.flaky),
                    'Test Pass rate:     %s%%' % percent,
                    'Test Case Total:     %d' % total,
                    'Test Start Time:     %s' % self.start_time,
@@ -463,7 +492,7 @@ class TxtReporter(Reporter):
     Args:
       output_file: string, pathname of file to write testcase output.
       testcase: string, name of testcase.
-      message: string, output from testcase.
+      message: string or outputspool.OutputSpool, output from testcase.
 
     Returns:
       None.
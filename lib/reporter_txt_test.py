@@ -71,6 +71,7 @@ class TxtReporterTest(unittest.TestCase):
 
   def testReportFileWriteOutAfterEachSuiteReportReport(self):
     """Report write out after each TestCaseReport call."""
+    self.reporter = reporter_txt.TxtReporter('unitest', 1)
     self.reporter.SetReportFile(self.file_name)
     self.reporter.SuiteReport('PassOnReportFile',
                               constants.PASS,
@@ -79,6 +80,7 @@ class TxtReporterTest(unittest.TestCase):
                     os.path.getsize(self.file_name) > 0)
 
   def testReportFileWriteOutAfterEachTestCaseReport(self):
+    self.reporter = reporter_txt.TxtReporter('unitest', 1)
     self.reporter.SetReportFile(self.file_name)
     self.reporter.TestCaseReport('PassOneReportFile',
                                  constants.PASS,
@@ -98,6 +100,83 @@ class TxtReporterTest(unittest.TestCase):
     self.assertTrue(os.path.isfile(self.file_name) and
                     os.path.getsize(self.file_name) > 0)
 
+  def _Report(self, reporter, count):
+    reporter.SetReportFile(self.file_name)
+    reporter.StartTest('unittest', 'host_name', 'tester', 'uid', 'uname')
+    reporter.AttachHeader('user header')
+    for number in range(count):
+      reporter.TestCaseReport('test%d' % number, constants.FAIL, 'msg')
+    reporter.SuiteReport('suite', constants.FAIL, 'suite line')
+    reporter.ExtraMessage('extra line')
+
+  def testReportLayout(self):
+    """Sections are written in order with the records appended."""
+    self._Report(self.reporter, 2)
+    self.reporter.EndTest()
+    report = open(self.file_name).read()
+    separator = '-' * 40 + '\n'
+    sections = report.split(separator)
+    self.assertEqual(sections[0], '')
+    self.assertEqual(sections[-1], '')
+    self.assertEqual([one.splitlines()[0] for one in sections[1:-1]],
+                     ['HEADER:', 'SUMMARY:', 'PRE_BODY:', 'BODY:', 'EXTRA:'])
+    self.assertTrue('user header\n' in sections[1])
+    self.assertEqual(sections[3],
+                     'PRE_BODY:\nTESTCASE: test0     FAIL\n'
+                     'TESTCASE: test1     FAIL\n')
+    self.assertEqual(sections[5], 'EXTRA:\nextra line\n')
+
+  def testLimitCounted(self):
+    """A test over its resource limits has its own line in the summary."""
+    self.reporter.SetReportFile(self.file_name)
+    self.reporter.TestCaseReport('test0', constants.LIMIT)
+    self.reporter.TestCaseReport('test1', constants.FAIL)
+    self.reporter.EndTest()
+    report = open(self.file_name).read()
+    self.assertTrue('Test    LIMIT:     1' in report)
+    self.assertTrue('Test     FAIL:     1' in report)
+    self.assertTrue('Test Case Total:     2' in report)
+    self.assertEqual(self.reporter.unknown, 0)
+
+  def testFlakyCounted(self):
+    """A FLAKY test has its own line and counts as passed in the rate."""
+    self.reporter.SetReportFile(self.file_name)
+    self.reporter.TestCaseReport('test0', constants.FLAKY)
+    self.reporter.TestCaseReport('test1', constants.PASS)
+    self.reporter.EndTest()
+    report = open(self.file_name).read()
+    self.assertTrue('Test    FLAKY:     1' in report)
+    self.assertTrue('Test Pass rate:     100%' in report)
+    self.assertEqual(self.reporter.unknown, 0)
+
+  def testCheckpointWritesPeriodically(self):
+    """The report is rewritten every checkpoint results only."""
+    reporter = reporter_txt.TxtReporter('unittest', 3)
+    self._Report(reporter, 1)
+    self.assertFalse('test0' in open(self.file_name).read())
+    reporter.TestCaseReport('test1', constants.PASS)
+    self.assertTrue('test1' in open(self.file_name).read())
+    reporter.TestCaseReport('test2', constants.PASS)
+    self.assertFalse('test2' in open(self.file_name).read())
+    reporter.EndTest()
+    self.assertTrue('Test Case Total:     3' in open(self.file_name).read())
+
+  def testSameReportWithAnyCheckpoint(self):
+    """The final report does not depend on the checkpoint."""
+    reports = []
+    for checkpoint in [0, 1, 7]:
+      reporter = reporter_txt.TxtReporter('unittest', checkpoint)
+      self._Report(reporter, 20)
+      reporter.EndTest()
+      reports.append(open(self.file_name).read())
+    self.assertEqual(reports[0], reports[1])
+    self.assertEqual(reports[0], reports[2])
+
+  def testDefaultCheckpoint(self):
+    """The reporter defaults to the documented checkpoint."""
+    self.assertEqual(self.reporter.checkpoint, 100)
+    self.assertEqual(reporter_txt.DEFAULT_CHECKPOINT, 100)
+
 
 if __name__ == '__main__':
   unittest.main()
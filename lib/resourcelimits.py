@@ -0,0 +1,128 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Resource limits of a test, set in the test process before it starts.
+
+The limits come from the MAX_RSS_MB, CPU_TIMEOUT, MAX_OPEN_FILES and NICE
+header keys. They are set with setrlimit and nice in the child process, so
+they apply to each process of the test, which inherits them:
+  MAX_RSS_MB: the address space limit in MB. Linux does not enforce
+    RLIMIT_RSS, so the address space is limited instead. Allocations beyond
+    it fail.
+  CPU_TIMEOUT: the CPU seconds of each process. A process gets SIGXCPU at
+    the limit and SIGKILL CPU_GRACE seconds later.
+  MAX_OPEN_FILES: the number of open file descriptors of each process.
+  NICE: added to the niceness of the test. The I/O priority of a process
+    without one set follows its niceness, so it is lowered too.
+
+A test which did not pass is taken as breaching a limit when it was killed
+by SIGXCPU or used CPU_TIMEOUT CPU seconds. With MAX_RSS_MB, it is taken as
+breaching it when its output tells a memory allocation failed, which is how
+the address space limit shows, usually with the RSS far below it. Without
+such a line, reaching RSS_MARGIN of MAX_RSS_MB is taken as a breach too, a
+guess for a test which does not print why it failed. Running out of file
+descriptors can't be told from the exit of a test, so it is reported as a
+normal failure.
+"""
+
+import os
+import resource
+import signal
+
+# Seconds between the SIGXCPU and the SIGKILL of a process over CPU_TIMEOUT.
+CPU_GRACE = 1
+# A failed test is taken as over MAX_RSS_MB when its peak resident set size
+# reached this part of it, the rest of the address space holds the code and
+# the mappings never touched.
+RSS_MARGIN = 0.8
+# The shell returns 128 plus the signal number of a child killed by a signal.
+SHELL_SIGNAL_BASE = 128
+
+
+class ResourceLimits(object):
+  """The limits of one test."""
+
+  def __init__(self, max_rss_mb=None, cpu_timeout=None, max_open_files=None,
+               nice=None):
+    """Init the limits, None for no limit.
+
+    Args:
+      max_rss_mb: <int> the address space limit in MB.
+      cpu_timeout: <int> the CPU seconds limit of each process.
+      max_open_files: <int> the open file limit of each process.
+      nice: <int> the niceness added to the test.
+    """
+    self.max_rss_mb = max_rss_mb
+    self.cpu_timeout = cpu_timeout
+    self.max_open_files = max_open_files
+    self.nice = nice
+
+  def IsSet(self):
+    """Return True if any limit is set."""
+    return (self.max_rss_mb is not None or self.cpu_timeout is not None or
+            self.max_open_files is not None or self.nice is not None)
+
+  def Apply(self):
+    """Set the limits on the current process.
+
+    It is called in the child process between fork and exec.
+    """
+    if self.max_rss_mb is not None:
+      limit = self.max_rss_mb * 1024 * 1024
+      resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    if self.cpu_timeout is not None:
+      resource.setrlimit(resource.RLIMIT_CPU,
+                         (self.cpu_timeout, self.cpu_timeout + CPU_GRACE))
+    if self.max_open_files is not None:
+      resource.setrlimit(resource.RLIMIT_NOFILE,
+                         (self.max_open_files, self.max_open_files))
+    if self.nice:
+      os.nice(self.nice)
+
+  def Breached(self, ret, usage, allocation_line=None):
+    """Check if a test which did not pass went over a limit.
+
+    Args:
+      ret: None/int the return code of the test.
+      usage: None/resourceusage.ResourceUsage of the test.
+      allocation_line: None/string the first line of the output of the test
+        telling a memory allocation failed.
+
+    Returns:
+      a string describing the limit breached, None if none was.
+    """
+    if self.cpu_timeout is not None:
+      if ret in (-signal.SIGXCPU, SHELL_SIGNAL_BASE + signal.SIGXCPU):
+        return 'CPU_TIMEOUT %s: killed by SIGXCPU' % self.cpu_timeout
+      if usage and usage.user_cpu + usage.system_cpu >= self.cpu_timeout:
+        return 'CPU_TIMEOUT %s: used %.2f CPU seconds' % (
+            self.cpu_timeout, usage.user_cpu + usage.system_cpu)
+    if self.max_rss_mb is not None and allocation_line is not None:
+      return 'MAX_RSS_MB %s: allocation failed: %s' % (self.max_rss_mb,
+                                                       allocation_line)
+    if (self.max_rss_mb is not None and usage and
+        usage.max_rss_kb >= self.max_rss_mb * 1024 * RSS_MARGIN):
+      return 'MAX_RSS_MB %s: peak rss %dKB' % (self.max_rss_mb,
+                                               usage.max_rss_kb)
+    return None
+
+
+def FromConfig(one_script_dict):
+  """Return the ResourceLimits of a test case dictionary."""
+  return ResourceLimits(one_script_dict.get('MAX_RSS_MB'),
+                        one_script_dict.get('CPU_TIMEOUT'),
+                        one_script_dict.get('MAX_OPEN_FILES'),
+                        one_script_dict.get('NICE'))
@@ -0,0 +1,71 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unittest for resourcelimits module."""
+
+import signal
+import unittest
+
+from lib import pyreringutil
+from lib import resourcelimits
+from lib import resourceusage
+
+
+class ResourceLimitsTest(unittest.TestCase):
+  """Unit test cases for ResourceLimits class."""
+
+  def testFromConfig(self):
+    """The limits are read from the header keys."""
+    config = pyreringutil.PRConfigParser().Default()
+    self.assertFalse(resourcelimits.FromConfig(config).IsSet())
+    config['NICE'] = 5
+    config['MAX_RSS_MB'] = 100
+    limits = resourcelimits.FromConfig(config)
+    self.assertTrue(limits.IsSet())
+    self.assertEqual((limits.nice, limits.max_rss_mb), (5, 100))
+
+  def testCpuBreached(self):
+    """SIGXCPU or the CPU time used show a CPU_TIMEOUT breach."""
+    limits = resourcelimits.ResourceLimits(cpu_timeout=2)
+    self.assertTrue(limits.Breached(-signal.SIGXCPU, None))
+    self.assertTrue(limits.Breached(128 + signal.SIGXCPU, None))
+    usage = resourceusage.ResourceUsage(user_cpu=1.5, system_cpu=0.6)
+    self.assertTrue(limits.Breached(-signal.SIGKILL, usage))
+    usage = resourceusage.ResourceUsage(user_cpu=0.5)
+    self.assertEqual(limits.Breached(1, usage), None)
+
+  def testRssBreached(self):
+    """A peak rss near MAX_RSS_MB shows a breach."""
+    limits = resourcelimits.ResourceLimits(max_rss_mb=10)
+    usage = resourceusage.ResourceUsage(max_rss_kb=9 * 1024)
+    self.assertTrue(limits.Breached(1, usage))
+    usage = resourceusage.ResourceUsage(max_rss_kb=1024)
+    self.assertEqual(limits.Breached(1, usage), None)
+    self.assertEqual(resourcelimits.ResourceLimits().Breached(-9, usage), None)
+
+  def testAllocationFailureBreached(self):
+    """A failed allocation under MAX_RSS_MB shows a breach at any rss."""
+    limits = resourcelimits.ResourceLimits(max_rss_mb=10)
+    usage = resourceusage.ResourceUsage(max_rss_kb=1024)
+    self.assertTrue(limits.Breached(1, usage, 'MemoryError'))
+    self.assertTrue(limits.Breached(1, None, 'MemoryError'))
+    self.assertEqual(
+        resourcelimits.ResourceLimits().Breached(1, usage, 'MemoryError'),
+        None)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,77 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""The resources used by one test, as given by wait4.
+
+The usage of a test is the rusage of its shell, which includes all the
+processes the shell and its children waited for. Processes left running in
+the background are not counted.
+"""
+
+# The fields of a usage, in the order they are recorded.
+FIELDS = ['user_cpu', 'system_cpu', 'max_rss_kb', 'in_blocks', 'out_blocks',
+          'voluntary_switches', 'involuntary_switches']
+
+
+class ResourceUsage(object):
+  """CPU, memory, block I/O and context switches of a test."""
+
+  def __init__(self, user_cpu=0.0, system_cpu=0.0, max_rss_kb=0, in_blocks=0,
+               out_blocks=0, voluntary_switches=0, involuntary_switches=0):
+    """Init the usage.
+
+    Args:
+      user_cpu: <float> user CPU seconds.
+      system_cpu: <float> system CPU seconds.
+      max_rss_kb: <int> the peak resident set size in KB of the largest
+        process.
+      in_blocks: <int> blocks read from the filesystem.
+      out_blocks: <int> blocks written to the filesystem.
+      voluntary_switches: <int> context switches while waiting for something.
+      involuntary_switches: <int> context switches by the scheduler.
+    """
+    self.user_cpu = user_cpu
+    self.system_cpu = system_cpu
+    self.max_rss_kb = max_rss_kb
+    self.in_blocks = in_blocks
+    self.out_blocks = out_blocks
+    self.voluntary_switches = voluntary_switches
+    self.involuntary_switches = involuntary_switches
+
+  def Values(self):
+    """Return the values in the order of FIELDS."""
+    return [getattr(self, field) for field in FIELDS]
+
+  def __eq__(self, other):
+    return isinstance(other, ResourceUsage) and self.Values() == other.Values()
+
+  def __ne__(self, other):
+    return not self == other
+
+  def __str__(self):
+    return ('cpu %.2fs user %.2fs system, max rss %dKB, blocks %d in %d out, '
+            'context switches %d voluntary %d involuntary' %
+            tuple(self.Values()))
+
+
+def FromRusage(rusage):
+  """Return the ResourceUsage of a resource.struct_rusage from os.wait4.
+
+  ru_maxrss is in KB on Linux.
+  """
+  return ResourceUsage(rusage.ru_utime, rusage.ru_stime, rusage.ru_maxrss,
+                       rusage.ru_inblock, rusage.ru_oublock, rusage.ru_nvcsw,
+                       rusage.ru_nivcsw)
@@ -0,0 +1,204 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A cache of the passed results of test scripts marked CACHEABLE.
+
+A test script with CACHEABLE = True in its header declares its result only
+depends on the script itself, its config header, the environment PyreRing
+sets up for it and the files listed in its INPUTS header. The class
+ResultCache keys a passed result by the md5 of all of them, so the next run
+with none of them changed can report the pass without running the script.
+
+Entries older than ttl seconds are not used and dropped. When the cache has
+more than max_entries entries, the least recently used ones are dropped.
+
+The cache is a persistentdict.PersistentDict, so runs on the same host can
+share it.
+"""
+
+import logging
+import os
+import time
+
+from lib import common_util
+from lib import persistentdict
+
+try:
+  import hashlib
+  _md5 = hashlib.md5
+except ImportError:
+  import md5
+  _md5 = md5.new
+
+logger = logging.getLogger('PyreRing')
+DEBUG = common_util.DebugLog
+
+# Bump it whenever the key is computed differently, so old entries are
+# dropped.
+FORMAT_VERSION = 1
+# The environment variables set up by pyreringutil.TestEnvironment.
+ENVIRONMENT_KEYS = ['source_dir', 'PYTHONPATH', 'PATH', 'PERL5LIB']
+# Seconds a passed result is used for.
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 10000
+# The size of the blocks files are hashed by.
+READ_SIZE = 64 * 1024
+
+
+def _HashFile(digest, path):
+  """Add the path and content of a file to the digest.
+
+  Raises:
+    IOError: if the file can not be read.
+  """
+  data_file = open(path, 'rb')
+  try:
+    digest.update('file:%s\0' % path)
+    data = data_file.read(READ_SIZE)
+    while data:
+      digest.update(data)
+      data = data_file.read(READ_SIZE)
+    digest.update('\0')
+  finally:
+    data_file.close()
+
+
+class ResultCache(object):
+  """Passed test results keyed by everything they depend on."""
+
+  def __init__(self, cache_file, ttl=DEFAULT_TTL,
+               max_entries=DEFAULT_MAX_ENTRIES):
+    """Init the cache, the cache file is read on the first lookup.
+
+    Args:
+      cache_file: the path of the cache file.
+      ttl: <int> seconds a passed result is used for.
+      max_entries: <int> the number of results kept.
+    """
+    self.store = persistentdict.PersistentDict(cache_file, FORMAT_VERSION)
+    self.ttl = ttl
+    self.max_entries = max_entries
+    self.entries = None
+    # The entries stored or used since the last Save.
+    self.changes = {}
+    self.hits = 0
+    self.misses = 0
+
+  def _Entries(self):
+    if self.entries is None:
+      self.entries = self.store.Load()
+    return self.entries
+
+  def Key(self, one_script_dict, environment):
+    """Compute the cache key of a test case.
+
+    INPUTS is a comma separated list of files, relative to the dir of the
+    script or absolute.
+
+    Args:
+      one_script_dict: <dict> test case dictionary.
+      environment: a dictionary of the environment the script runs with.
+
+    Returns:
+      a string key, None if the script or any of its inputs can not be read.
+    """
+    script = one_script_dict['TEST_SCRIPT'].split()[0]
+    script_dir = os.path.dirname(script)
+    digest = _md5()
+    config = one_script_dict.items()
+    config.sort()
+    digest.update('config:%r\0' % config)
+    for key in ENVIRONMENT_KEYS:
+      digest.update('env:%s=%r\0' % (key, environment.get(key)))
+    inputs = [script]
+    for one_input in (one_script_dict.get('INPUTS') or '').split(','):
+      one_input = one_input.strip()
+      if one_input:
+        inputs.append(os.path.join(script_dir, one_input))
+    try:
+      for path in inputs:
+        _HashFile(digest, path)
+    except IOError, e:
+      logger.info('%s is not cached: %s' % (script, e))
+      return None
+    return digest.hexdigest()
+
+  def Lookup(self, key):
+    """Find the cached result of a key.
+
+    Args:
+      key: a key returned by Key, or None.
+
+    Returns:
+      None/int the return code of the cached pass, None if there is none.
+    """
+    if key is None:
+      return None
+    entry = self._Entries().get(key)
+    now = time.time()
+    if entry is None or entry[1] < now - self.ttl:
+      self.misses += 1
+      return None
+    self.hits += 1
+    result, stored_time, unused_last_used = entry
+    entry = (result, stored_time, now)
+    self.entries[key] = entry
+    self.changes[key] = entry
+    return result
+
+  def Store(self, key, result):
+    """Cache the return code of a passed test case.
+
+    Args:
+      key: a key returned by Key, or None.
+      result: <int> the return code of the test case.
+    """
+    if key is None:
+      return
+    now = time.time()
+    entry = (result, now, now)
+    self._Entries()[key] = entry
+    self.changes[key] = entry
+
+  def _Expired(self, entries):
+    """Return the keys of the expired and the least recently used entries."""
+    oldest = time.time() - self.ttl
+    removed = []
+    kept = []
+    for key, (unused_result, stored_time, last_used) in entries.iteritems():
+      if stored_time < oldest:
+        removed.append(key)
+      else:
+        kept.append((last_used, key))
+    if len(kept) > self.max_entries:
+      kept.sort()
+      removed.extend([key for unused_last_used, key
+                      in kept[:len(kept) - self.max_entries]])
+    return removed
+
+  @DEBUG
+  def Save(self):
+    """Merge the new entries into the cache file and evict old entries."""
+    if not self.changes:
+      return
+    logger.info('result cache: %d hits, %d misses' % (self.hits, self.misses))
+    try:
+      self.entries = self.store.Update(self.changes, prune=self._Expired)
+    except (IOError, OSError), e:
+      # The cache only saves time, the next run goes on without it.
+      logger.warning('failed to save result cache %s: %s' %
+                     (self.store.path, e))
+    self.changes = {}
@@ -0,0 +1,113 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unittest for resultcache module."""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from lib import pyreringutil
+from lib import resultcache
+
+
+class ResultCacheTest(unittest.TestCase):
+  """Unit test cases for ResultCache class."""
+
+  def setUp(self):
+    self.tempdir = tempfile.mkdtemp()
+    self.cache_file = os.path.join(self.tempdir, 'result_cache')
+    self.script = self._Write('check.sh', '#!/bin/sh\nexit 0\n')
+    self._Write('data.txt', 'some data\n')
+    self.config = pyreringutil.PRConfigParser().Default()
+    self.config['TEST_SCRIPT'] = self.script
+    self.config['CACHEABLE'] = True
+    self.config['INPUTS'] = 'data.txt'
+    self.environment = {'PATH': '/bin', 'PYTHONPATH': self.tempdir}
+
+  def tearDown(self):
+    shutil.rmtree(self.tempdir)
+
+  def _Write(self, name, content):
+    path = os.path.join(self.tempdir, name)
+    data_file = open(path, 'w')
+    data_file.write(content)
+    data_file.close()
+    return path
+
+  def _Key(self):
+    cache = resultcache.ResultCache(self.cache_file)
+    return cache.Key(self.config, self.environment)
+
+  def testKeyIsStable(self):
+    """The same inputs give the same key."""
+    self.assertEqual(self._Key(), self._Key())
+
+  def testKeyChanges(self):
+    """Any change of the script, config, environment or inputs changes it."""
+    keys = [self._Key()]
+    self._Write('check.sh', '#!/bin/sh\nexit 0 \n')
+    keys.append(self._Key())
+    self.config['TIMEOUT'] = 10
+    keys.append(self._Key())
+    self.environment['PATH'] = '/usr/bin'
+    keys.append(self._Key())
+    self._Write('data.txt', 'other data\n')
+    keys.append(self._Key())
+    self.assertEqual(len(set(keys)), len(keys))
+
+  def testMissingInputNotCached(self):
+    """A test case with an unreadable input has no key."""
+    self.config['INPUTS'] = 'data.txt, missing.txt'
+    self.assertEqual(self._Key(), None)
+
+  def testStoredResultSaved(self):
+    """A stored pass is found by a new run."""
+    cache = resultcache.ResultCache(self.cache_file)
+    key = cache.Key(self.config, self.environment)
+    self.assertEqual(cache.Lookup(key), None)
+    cache.Store(key, 0)
+    cache.Save()
+    cache = resultcache.ResultCache(self.cache_file)
+    self.assertEqual(cache.Lookup(key), 0)
+    self.assertEqual(cache.Lookup(None), None)
+
+  def testExpiredResultDropped(self):
+    """A pass older than the ttl is not used and dropped on save."""
+    cache = resultcache.ResultCache(self.cache_file, ttl=60)
+    cache.Store('old', 0)
+    cache.entries['old'] = cache.changes['old'] = (0, time.time() - 120,
+                                                   time.time())
+    cache.Store('new', 0)
+    self.assertEqual(cache.Lookup('old'), None)
+    cache.Save()
+    self.assertEqual(sorted(cache.store.Load()), ['new'])
+
+  def testLeastRecentlyUsedDropped(self):
+    """Over max_entries, the least recently used results are dropped."""
+    cache = resultcache.ResultCache(self.cache_file, max_entries=2)
+    for key in ['a', 'b', 'c']:
+      cache.Store(key, 0)
+      time.sleep(0.01)
+    cache.Lookup('a')
+    cache.Save()
+    self.assertEqual(sorted(cache.store.Load()), ['a', 'c'])
+
+
+if __name__ == '__main__':
+  unittest.main()
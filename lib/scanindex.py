@@ -0,0 +1,146 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""An on disk index of the parsed config headers of test scripts.
+
+Parsing the PR_START/PR_END header of a script means reading the script. The
+class ScanIndex keeps the parsed header of each script with the signature of
+the file it was parsed from: mtime, size, inode and device. A script whose
+signature has not changed since is served from the index without reading it.
+
+A file changed in the same second it was parsed could keep its signature, so
+files modified shortly before the scan started are parsed but not indexed.
+
+The entries of scripts which no longer exist, deleted or renamed, are dropped
+when the index is saved, so it does not grow with every script ever scanned.
+
+The index is a persistentdict.PersistentDict, so runs on the same host can
+share it.
+"""
+
+import logging
+import time
+
+from lib import common_util
+from lib import filesystemhandlerextend
+from lib import persistentdict
+
+logger = logging.getLogger('PyreRing')
+DEBUG = common_util.DebugLog
+
+# Bump it whenever PRConfigParser parses a header differently, so old entries
+# are dropped.
+FORMAT_VERSION = 6
+# Files modified less than this many seconds before the scan are not indexed.
+RACY_WINDOW = 2
+
+
+class ScanIndex(object):
+  """Parsed script headers keyed by the file signature."""
+
+  def __init__(self, index_file,
+               filesystem=filesystemhandlerextend.FileSystemHandlerExtend()):
+    """Init the index, the index file is read on the first lookup.
+
+    Args:
+      index_file: the path of the index file.
+      filesystem: a FileSystemHandlerExtend object to stat the scripts.
+    """
+    self.filesystem = filesystem
+    self.store = persistentdict.PersistentDict(index_file, FORMAT_VERSION)
+    self.entries = None
+    # The entries added since the last Save.
+    self.changes = {}
+    # The paths which could be stat'ed in this run.
+    self.seen = set()
+    self.start_time = time.time()
+    self.hits = 0
+    self.misses = 0
+
+  def _Entries(self):
+    if self.entries is None:
+      self.entries = self.store.Load()
+    return self.entries
+
+  def Lookup(self, path):
+    """Find the parsed header of a script.
+
+    Args:
+      path: the path of the script.
+
+    Returns:
+      a tuple of the signature of the file and a copy of its indexed config
+      dictionary. The config is None if the file is not indexed or has
+      changed. The signature is None if the file can not be stat'ed.
+    """
+    try:
+      stat = self.filesystem.Stat(path)
+    except OSError:
+      return None, None
+    self.seen.add(path)
+    signature = (stat.st_mtime, stat.st_size, stat.st_ino, stat.st_dev)
+    entry = self._Entries().get(path)
+    if entry is not None and entry[0] == signature:
+      self.hits += 1
+      return signature, dict(entry[1])
+    self.misses += 1
+    return signature, None
+
+  def Store(self, path, signature, config):
+    """Index the parsed header of a script.
+
+    Args:
+      path: the path of the script.
+      signature: the signature returned by Lookup before the file was parsed.
+      config: the config dictionary parsed from the file.
+    """
+    if signature is None or signature[0] > self.start_time - RACY_WINDOW:
+      return
+    entry = (signature, dict(config))
+    self._Entries()[path] = entry
+    self.changes[path] = entry
+
+  def _Missing(self, entries):
+    """List the indexed paths, not seen yet, which can not be stat'ed."""
+    missing = []
+    for path in entries:
+      if path in self.seen:
+        continue
+      try:
+        self.filesystem.Stat(path)
+      except OSError:
+        missing.append(path)
+      else:
+        # Saved again after each parse, stat each path once a run.
+        self.seen.add(path)
+    return missing
+
+  @DEBUG
+  def Save(self):
+    """Merge the new entries into the index file, drop the missing scripts."""
+    if self.entries is None:
+      return
+    missing = self._Missing(self.entries)
+    if not self.changes and not missing:
+      return
+    logger.debug('scan index: %d hits, %d misses, %d dropped' %
+                 (self.hits, self.misses, len(missing)))
+    try:
+      self.entries = self.store.Update(self.changes, missing)
+    except (IOError, OSError), e:
+      # The index is only a cache, the scan goes on without it.
+      logger.warning('failed to save scan index %s: %s' % (self.store.path, e))
+    self.changes = {}
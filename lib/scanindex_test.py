@@ -0,0 +1,114 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unittest for scanindex module."""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from lib import filesystemhandlerextend
+from lib import scanindex
+from lib import scanscripts
+
+
+class CountingFileSystem(filesystemhandlerextend.FileSystemHandlerExtend):
+  """A real filesystem which counts the files opened for read."""
+
+  def __init__(self):
+    filesystemhandlerextend.FileSystemHandlerExtend.__init__(self)
+    self.opened = []
+
+  def FileOpenForRead(self, path):
+    self.opened.append(path)
+    return filesystemhandlerextend.FileSystemHandlerExtend.FileOpenForRead(
+        self, path)
+
+
+class ScanIndexTest(unittest.TestCase):
+  """Unit test cases for ScanIndex class."""
+
+  def setUp(self):
+    self.tempdir = tempfile.mkdtemp()
+    self.source_dir = os.path.join(self.tempdir, 'source')
+    os.mkdir(self.source_dir)
+    self.index_file = os.path.join(self.tempdir, 'scan_index')
+    self._WriteScript('one.sh', 600)
+    self._WriteScript('two.sh', 30)
+
+  def tearDown(self):
+    shutil.rmtree(self.tempdir)
+
+  def _WriteScript(self, name, timeout, age=60):
+    """Write a script with a TIMEOUT header, modified age seconds ago."""
+    path = os.path.join(self.source_dir, name)
+    script = open(path, 'w')
+    script.write('#!/bin/sh\n# PR_START\n# TIMEOUT = %d\n# PR_END\n' % timeout)
+    script.close()
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+  def _Scan(self):
+    """Scan the source dir with a new index, as a new run would."""
+    filesystem = CountingFileSystem()
+    index = scanindex.ScanIndex(self.index_file, filesystem)
+    scanner = scanscripts.ScanScripts(self.source_dir, filesystem, index)
+    configs = {}
+    for config in scanner.BaseScan(''):
+      configs[os.path.basename(config['TEST_SCRIPT'])] = config
+    return configs, filesystem.opened
+
+  def testUnchangedFilesNotRead(self):
+    """The second scan reads no script and gives the same configs."""
+    first_configs, opened = self._Scan()
+    self.assertEqual(len(opened), 2)
+    second_configs, opened = self._Scan()
+    self.assertEqual(opened, [])
+    self.assertEqual(first_configs, second_configs)
+    self.assertEqual(second_configs['two.sh']['TIMEOUT'], 30)
+    self.assertEqual(second_configs['two.sh']['CONCURRENT'], True)
+
+  def testChangedFileReadAgain(self):
+    """A script with a new signature is parsed again."""
+    self._Scan()
+    path = self._WriteScript('two.sh', 45, 30)
+    configs, opened = self._Scan()
+    self.assertEqual(opened, [path])
+    self.assertEqual(configs['two.sh']['TIMEOUT'], 45)
+
+  def testRecentFileNotIndexed(self):
+    """A script modified just before the scan is parsed every time."""
+    path = self._WriteScript('two.sh', 45, 0)
+    self._Scan()
+    configs, opened = self._Scan()
+    self.assertEqual(opened, [path])
+    self.assertEqual(configs['two.sh']['TIMEOUT'], 45)
+
+  def testMissingFileDropped(self):
+    """The entry of a deleted script is dropped when the index is saved."""
+    self._Scan()
+    os.remove(os.path.join(self.source_dir, 'two.sh'))
+    self._Scan()
+    index = scanindex.ScanIndex(self.index_file)
+    self.assertEqual(sorted(index._Entries().keys()),
+                     [os.path.join(self.source_dir, 'one.sh')])
+
+
+if __name__ == '__main__':
+  unittest.main()
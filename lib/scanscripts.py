@@ -36,12 +36,17 @@ For example:
 
   Then BaseScan will return a list of dictionaries and each dictionary will
   contain one test script and how it should be run info.
+
+Given a changeindex.ChangeIndex and a time, BaseScan only returns the scripts
+which, or whose INPUTS or DEPENDS_ON files, changed after that time.
 """
 
 __author__ = 'mwu@google.com (Mingyu Wu)'
 
+import fnmatch
 import logging
 import os
+import re
 
 from lib import common_util
 from lib import filesystemhandlerextend
@@ -50,6 +55,10 @@ from lib import pyreringutil
 logger = logging.getLogger('PyreRing')
 DEBUG = common_util.DebugLog
 
+# The state of a suite file being resolved.
+VISITING = 1
+DONE = 2
+
 # Define the currently supported file extentions.
 SUITE_SUFFIXES = ['.suite']
 SCRIPT_SUFFIXES = ['.sh', '.py', '.par', '.pl']
@@ -80,13 +89,141 @@ class LoopConditionError(ScanScriptsError):
   pass
 
 
+def _HasMagic(pattern):
+  """Return True if the pattern has any glob wildcard."""
+  return re.search(r'[*?[]', pattern) is not None
+
+
+class DirectoryIndex(object):
+  """Directory listings kept in memory, each directory is listed once.
+
+  Directory walks, wildcard lines and directory lines of suite files are all
+  matched against these listings instead of the filesystem. Clear drops the
+  listings, for scripts created after they were taken.
+  """
+
+  def __init__(self, filesystem):
+    """Init an empty index.
+
+    Args:
+      filesystem: a FileSystemHandlerExtend object with ScanDir.
+    """
+    self.filesystem = filesystem
+    # Maps a directory to a tuple of the sorted names of its dirs, the sorted
+    # names of its files and the set of names of its dirs which are links.
+    self.listings = {}
+    # Compiled glob patterns.
+    self.patterns = {}
+
+  def Clear(self):
+    """Drop the listings, the directories are listed again when matched."""
+    self.listings = {}
+
+  def _List(self, path):
+    """Return the cached listing of a directory, empty if it can't be read."""
+    listing = self.listings.get(path)
+    if listing is None:
+      dir_names = []
+      file_names = []
+      linked_dir_names = set()
+      try:
+        entries = self.filesystem.ScanDir(path)
+      except OSError:
+        entries = []
+      for name, is_dir, is_link in entries:
+        if is_dir:
+          dir_names.append(name)
+          if is_link:
+            linked_dir_names.add(name)
+        else:
+          file_names.append(name)
+      dir_names.sort()
+      file_names.sort()
+      listing = (dir_names, file_names, linked_dir_names)
+      self.listings[path] = listing
+    return listing
+
+  def IsDir(self, path):
+    """Return True if the path is a directory."""
+    parent, name = os.path.split(os.path.normpath(path))
+    if not name:
+      return True
+    return name in self._List(parent)[0]
+
+  def Walk(self, path):
+    """Walk a directory tree top down like os.walk.
+
+    Links to directories are listed but not walked into, as os.walk does.
+
+    Args:
+      path: the top directory.
+
+    Returns:
+      a list of (dirpath, dirnames, filenames) tuples.
+    """
+    results = []
+    pending = [os.path.normpath(path)]
+    while pending:
+      dir_path = pending.pop()
+      dir_names, file_names, linked_dir_names = self._List(dir_path)
+      results.append((dir_path, dir_names, file_names))
+      subdirs = [os.path.join(dir_path, name) for name in dir_names
+                 if name not in linked_dir_names]
+      subdirs.reverse()
+      pending.extend(subdirs)
+    return results
+
+  def _Match(self, pattern, name):
+    """Return True if the name matches a glob pattern of one path part."""
+    regex = self.patterns.get(pattern)
+    if regex is None:
+      regex = re.compile(fnmatch.translate(pattern))
+      self.patterns[pattern] = regex
+    # As glob does, wildcards don't match a leading dot.
+    if name.startswith('.') and not pattern.startswith('.'):
+      return False
+    return regex.match(name) is not None
+
+  def Glob(self, pattern):
+    """Return the files and directories matching a pattern, like glob.glob.
+
+    Args:
+      pattern: an absolute path, any part of it can have wildcards.
+
+    Returns:
+      a list of paths.
+    """
+    pattern = os.path.normpath(pattern)
+    dir_name, base_name = os.path.split(pattern)
+    if not base_name:
+      return [pattern]
+    if _HasMagic(dir_name):
+      dir_paths = [one for one in self.Glob(dir_name) if self.IsDir(one)]
+    else:
+      dir_paths = [dir_name]
+    results = []
+    for dir_path in dir_paths:
+      dir_names, file_names, unused_linked = self._List(dir_path)
+      if _HasMagic(base_name):
+        names = [name for name in dir_names + file_names
+                 if self._Match(base_name, name)]
+      elif base_name in dir_names or base_name in file_names:
+        names = [base_name]
+      else:
+        names = []
+      results.extend([os.path.join(dir_path, name) for name in names])
+    return results
+
+
 class ScanScripts(object):
   """Utility class to scan files from the filesystem."""
 
   @DEBUG
   def __init__(self,
                source_dir,
-               filesystem=filesystemhandlerextend.FileSystemHandlerExtend()):
+               filesystem=filesystemhandlerextend.FileSystemHandlerExtend(),
+               index=None,
+               changes=None):
     """Init the ScanScripts class with the top test script directory.
 
     Args:
@@ -95,32 +232,35 @@ class ScanScripts(object):
       filesystem: a layer between this code and the file system. So we can
         mock the filesystem for unittest. The default value is a real
         filesystem.
+      index: a scanindex.ScanIndex to keep the parsed script headers between
+        runs. None to parse every script on every scan.
+      changes: a changeindex.ChangeIndex to find the scripts changed since a
+        time. None if BaseScan is never given changed_since.
 
     Raises:
       TestNotFoundError: if source_dir is not a valid path
     """
     self.filesystem = filesystem
+    self.index = index
+    self.changes = changes
     if not self.filesystem.CheckDir(source_dir):
       raise TestNotFoundError('source_dir has to be an existing dir: %s.'
                               % source_dir)
     self.script_dir = os.path.abspath(os.path.normpath(source_dir))
-
-    # These variables are used to monitor a recursion in suite definitions.
-    # Whenever the code is going to visit a suite file, it should
-    # always check these lists and add the suite to them if it is a new suite.
-    # Here we have a list version and a set version of the visited suites. They
-    # contain exactly the same suites just in different data structures.
-    # The list version is used to keep tracking the sequence of the visiting
-    # and the set version is used to do the quick check to see if some suite has
-    # been visited before.
-    self.including_suite_visited = []
-    self.excluding_suite_visited = []
-
-    self.including_suite_visited_set = set()
-    self.excluding_suite_visited_set = set()
+    # Every directory is listed once per BaseScan call.
+    self.directories = DirectoryIndex(self.filesystem)
+
+    # Suite files are resolved once per BaseScan call. resolved_suites maps a
+    # suite file to the frozenset of its scripts. suite_state marks the suites
+    # being resolved as VISITING, a suite met again while VISITING is in a
+    # loop.
+    # suite_stack keeps the chain of suites being resolved for the message.
+    self.resolved_suites = {}
+    self.suite_state = {}
+    self.suite_stack = []
 
   @DEBUG
-  def BaseScan(self, suite_name):
+  def BaseScan(self, suite_name, changed_since=None):
     """Main method to scan filesystem.
     
     This should scan the given names and return a list of scripts
@@ -152,6 +292,9 @@ class ScanScripts(object):
           all scripts under self.script_dir
         This method will figure out what type of the input is and return the
         list accordingly.
+      changed_since: None/float seconds since epoch. If given, only the
+        scripts changed after it, or with INPUTS or DEPENDS_ON files changed
+        after it, are returned.
 
     Returns:
       A list of dictionaries corresponding to the suite_name given. Each
@@ -166,38 +309,40 @@ class ScanScripts(object):
       included. But all suite files will be skipped. If you want to run a suite
       file, you have to specifically give the suite file name.
     """
+    # A suite run before, like SETUP, may have created scripts since the last
+    # call.
+    self.directories.Clear()
+    self.resolved_suites = {}
+    self.suite_state = {}
     test_case_list = []
     full_path = os.path.normpath(os.path.join(self.script_dir, suite_name))
     if self.filesystem.CheckDir(full_path):
       # This is a dir, we should return all script files.
-      for dirpath, unused_dnames, filenames in self.filesystem.Walk(full_path):
+      for dirpath, unused_dnames, filenames in (
+          self.directories.Walk(full_path)):
         for one_file in filenames:
           if os.path.splitext(one_file)[1] in SCRIPT_SUFFIXES:
             test_case_list.append(os.path.join(dirpath, one_file))
-      parser = pyreringutil.PRConfigParser(self.filesystem)
+      parser = pyreringutil.PRConfigParser(self.filesystem, self.index)
       logger.debug('exit ScanScripts.BaseScan with dir results')
-      return parser.ParseFiles(test_case_list)
+      return self._KeepChanged(parser.ParseFiles(test_case_list),
+                               changed_since)
 
     elif self.filesystem.CheckFile(full_path):
       # If it is a file, need to check if it is a script or a suite.
       if os.path.splitext(full_path)[1] in SCRIPT_SUFFIXES:
         # This is a script.
-        parser = pyreringutil.PRConfigParser(self.filesystem)
+        parser = pyreringutil.PRConfigParser(self.filesystem, self.index)
         logger.debug('exit ScanScripts.BaseScan with file result')
-        return parser.ParseFiles([full_path])
+        return self._KeepChanged(parser.ParseFiles([full_path]),
+                                 changed_since)
       elif os.path.splitext(full_path)[1] in SUITE_SUFFIXES:
-        # This is a suite file.
-        # Init the visited suite list and put this suite as the first included
-        # suite
-        self.including_suite_visited = [full_path]
-        self.including_suite_visited_set.add(full_path)
-        self.excluding_suite_visited = []
-        self.excluding_suite_visisted_set = set()
-        # Then read the suite file and parse it.
-        parser = pyreringutil.PRConfigParser(self.filesystem)
+        # This is a suite file, read it and parse it.
+        parser = pyreringutil.PRConfigParser(self.filesystem, self.index)
         logger.debug('exit ScanScripts.BaseScan with suite results')
-        return parser.ParseSuite(full_path,
-                                 list(self._ReadSuiteFiles(full_path)))
+        return self._KeepChanged(
+            parser.ParseSuite(full_path, list(self._ReadSuiteFiles(full_path))),
+            changed_since)
       else:
         logger.debug('exit with exception TestNotSupportedError')
         raise TestNotSupportedError('File extension is not supported %s'
@@ -206,6 +351,59 @@ class ScanScripts(object):
       logger.debug('exit with exception TestNotFoundError')
       raise TestNotFoundError('Wrong suite name: %s' % full_path)
   
+  def _KeepChanged(self, script_list, changed_since):
+    """Keep only the scripts changed since a time.
+
+    Args:
+      script_list: a list of test case dictionaries.
+      changed_since: None/float seconds since epoch, None to keep all.
+
+    Returns:
+      a list of the changed test case dictionaries, in the same order.
+    """
+    if changed_since is None:
+      return script_list
+    changed = [one_script_dict for one_script_dict in script_list
+               if self.changes.ChangedSince(self._Dependencies(one_script_dict),
+                                            changed_since)]
+    self.changes.Save()
+    logger.info('%d of %d scripts changed' % (len(changed), len(script_list)))
+    return changed
+
+  def _Dependencies(self, one_script_dict):
+    """Return the files a test case depends on.
+
+    They are the script itself and the comma separated paths in its INPUTS
+    and DEPENDS_ON headers. The paths are relative to the dir of the script or
+    absolute, they can have wildcards and a dir stands for all files under it.
+
+    Args:
+      one_script_dict: <dict> test case dictionary.
+
+    Returns:
+      a list of file paths.
+    """
+    script = one_script_dict['TEST_SCRIPT'].split()[0]
+    script_dir = os.path.dirname(script)
+    paths = [script]
+    for key in ['INPUTS', 'DEPENDS_ON']:
+      for one_path in (one_script_dict.get(key) or '').split(','):
+        one_path = one_path.strip()
+        if not one_path:
+          continue
+        one_path = os.path.normpath(os.path.join(script_dir, one_path))
+        if _HasMagic(one_path):
+          matches = self.directories.Glob(one_path)
+        else:
+          matches = [one_path]
+        for match in matches:
+          if self.directories.IsDir(match):
+            for dpath, unused_dnames, fnames in self.directories.Walk(match):
+              paths.extend([os.path.join(dpath, name) for name in fnames])
+          else:
+            paths.append(match)
+    return paths
+
   def _ParseOneLine(self, dir_name, one_line):
     """Parse one line of a suite file.
 
@@ -243,18 +441,18 @@ class ScanScripts(object):
     point_path = os.path.normpath(os.path.join(dir_name, one_line))
     suffix = os.path.splitext(one_line)[1]
     
-    if self.filesystem.CheckDir(point_path):
+    if self.directories.IsDir(point_path):
       # This is a dir, find all the scripts
-      for dpath, unused_dnames, fnames in os.walk(point_path):
+      for dpath, unused_dnames, fnames in self.directories.Walk(point_path):
         for one_file in fnames:
           if os.path.splitext(one_file)[1] in SCRIPT_SUFFIXES:
             testcase_set.add(os.path.join(dpath, one_file))
     elif suffix in SCRIPT_SUFFIXES:
       # This is a script(s)
-      testcase_set.update(self.filesystem.Glob(point_path))
+      testcase_set.update(self.directories.Glob(point_path))
     elif suffix in SUITE_SUFFIXES:
       # This is a suite(s)
-      suite_set.update(self.filesystem.Glob(point_path))
+      suite_set.update(self.directories.Glob(point_path))
     else:
       # Dir does not exist or not supported extension
       msg = ('The file extension is not supported or the directory does not'
@@ -322,12 +520,12 @@ class ScanScripts(object):
     """Recursively resolve a suite definition file.
 
     This method will open the suite definition file and read through and
-    translate each line to lists of actual scripts. Finally construct a list of
+    translate each line to lists of actual scripts. Finally construct a set of
     test scripts.
-    One check point is whenever we try to open a suite file, we first need to
-    check if it is visited before by checking including_suite_visited or
-    excluding_suite_visited. If it was visited before, raise ScanScriptsError.
-    If it was not visited before, add it to the list and visit it.
+    The suites are walked depth first. Each suite is resolved once and its
+    scripts are remembered for the BaseScan call, so a suite included by many
+    others is read only the first time. A suite which includes or excludes
+    itself through any chain of suites is a loop.
 
     Args:
       full_path: the path the suite definition file.
@@ -336,41 +534,41 @@ class ScanScripts(object):
       A set of scripts according to the suite definition file.
 
     Raises:
-      ScanScriptsError: if a loop found in suite file definitions.
+      LoopConditionError: if a loop found in suite file definitions.
     """
-    (include_testcase_set,
-     include_suite_set,
-     exclude_testcase_set,
-     exclude_suite_set) = self._ReadOneSuiteFile(full_path)
-    
-    # Trying to remove the excluded suites and test cases once.
-    include_testcase_set -= exclude_testcase_set
-    include_suite_set -= exclude_suite_set
-
-    # If there are still suites not resolved, resolve them
-    for one_suite in include_suite_set:
-      if one_suite in self.including_suite_visited_set:
-        # This suite has been visited before
-        msg = ('include loop found: %s at %s' %
-               (str(self.including_suite_visited), one_suite))
-        logger.error(msg)
-        raise ScanScriptsError(msg)
-      else:
-        self.including_suite_visited.append(one_suite)
-        self.including_suite_visited_set.add(one_suite)
-        extra_testcase_set = self._ReadSuiteFiles(one_suite)
-        include_testcase_set.update(extra_testcase_set)
-    for one_suite in exclude_suite_set:
-      if one_suite in self.excluding_suite_visited_set:
-        # This suite has been visited before
-        msg = ('exclude loop found: %s at %s' %
-               (str(self.excluding_suite_visited), one_suite))
-        logger.error(msg)
-        raise ScanScriptsError(msg)
-      else:
-        self.excluding_suite_visited.append(one_suite)
-        self.excluding_suite_visited_set.add(one_suite)
-        extra_testcase_set = self._ReadSuiteFiles(one_suite)
-        include_testcase_set -= extra_testcase_set
-      
+    state = self.suite_state.get(full_path)
+    if state == DONE:
+      return set(self.resolved_suites[full_path])
+    elif state == VISITING:
+      msg = ('suite loop found: %s at %s' %
+             (str(self.suite_stack), full_path))
+      logger.error(msg)
+      raise LoopConditionError(msg)
+
+    self.suite_state[full_path] = VISITING
+    self.suite_stack.append(full_path)
+    try:
+      (include_testcase_set,
+       include_suite_set,
+       exclude_testcase_set,
+       exclude_suite_set) = self._ReadOneSuiteFile(full_path)
+
+      # Trying to remove the excluded suites and test cases once.
+      include_testcase_set -= exclude_testcase_set
+      include_suite_set -= exclude_suite_set
+
+      # Resolve the suites in a fixed order, so a loop is always reported the
+      # same way.
+      for one_suite in sorted(include_suite_set):
+        include_testcase_set.update(self._ReadSuiteFiles(one_suite))
+      for one_suite in sorted(exclude_suite_set):
+        include_testcase_set -= self._ReadSuiteFiles(one_suite)
+    except:
+      # Leave no suite half visited, so the next scan starts clean.
+      del self.suite_state[full_path]
+      self.suite_stack.pop()
+      raise
+    self.suite_stack.pop()
+    self.suite_state[full_path] = DONE
+    self.resolved_suites[full_path] = frozenset(include_testcase_set)
     return include_testcase_set
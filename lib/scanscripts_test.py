@@ -18,10 +18,16 @@
 
 __author__ = 'mwu@google.com (Mingyu Wu)'
 
+import glob
 import os
+import shutil
+import tempfile
+import time
 import unittest
 
 
+from lib import changeindex
+from lib import filesystemhandlerextend
 from lib import mock_filesystemhandlerextend
 from lib import scanscripts
 
@@ -148,6 +154,46 @@ class ScanScriptsTest(unittest.TestCase):
     self._PopulateFileSystem(temp_file_system)
     self.assertRaises(ScanScriptsError, self.one.BaseScan, 'loop/loop1.suite')
 
+  def testLoopThroughExclude(self):
+    """A suite excluding a suite which includes it is a loop too."""
+    temp_file_system = {'/tmp/source/loop/loop1.suite': ['loop2.suite\n'],
+                        '/tmp/source/loop/loop2.suite': ['-loop1.suite\n']}
+    self._PopulateFileSystem(temp_file_system)
+    self.assertRaises(scanscripts.LoopConditionError, self.one.BaseScan,
+                      'loop/loop1.suite')
+
+  def testDiamondSuite(self):
+    """A suite included through two paths is not a loop, it is read once."""
+    temp_file_system = {
+        '/tmp/source/test1.sh': '',
+        '/tmp/source/test2.sh': '',
+        '/tmp/source/test3.sh': '',
+        '/tmp/source/top.suite': ['left.suite\n', 'right.suite\n'],
+        '/tmp/source/left.suite': ['shared.suite\n', 'test2.sh\n'],
+        '/tmp/source/right.suite': ['shared.suite\n'],
+        '/tmp/source/shared.suite': ['test1.sh\n', 'test3.sh\n'],
+        }
+    self._PopulateFileSystem(temp_file_system)
+    opened = []
+    original_open = self.mock_filesystem.FileOpenForRead
+
+    def CountingOpen(path):
+      opened.append(path)
+      return original_open(path)
+
+    self.mock_filesystem.FileOpenForRead = CountingOpen
+    script_list = self.one.BaseScan('top.suite')
+    self.assertEqual(sorted([one['TEST_SCRIPT'] for one in script_list]),
+                     ['/tmp/source/test1.sh', '/tmp/source/test2.sh',
+                      '/tmp/source/test3.sh'])
+    self.assertEqual(opened.count('/tmp/source/shared.suite'), 1)
+    # A later scan reads the suites again, they may have changed since.
+    script_list = self.one.BaseScan('right.suite')
+    self.assertEqual(sorted([one['TEST_SCRIPT'] for one in script_list]),
+                     ['/tmp/source/test1.sh', '/tmp/source/test3.sh'])
+    self.assertEqual(opened.count('/tmp/source/right.suite'), 3)
+    self.assertEqual(opened.count('/tmp/source/shared.suite'), 2)
+
   def testWildcardsSuite(self):
     """Test suite file contains wildcard charactors.
     
@@ -189,5 +235,118 @@ class ScanScriptsTest(unittest.TestCase):
                       ['test1.par'])
     
 
+class CountingFileSystem(filesystemhandlerextend.FileSystemHandlerExtend):
+  """A real filesystem which counts the directories listed."""
+
+  def __init__(self):
+    filesystemhandlerextend.FileSystemHandlerExtend.__init__(self)
+    self.listed = []
+
+  def ScanDir(self, path):
+    self.listed.append(path)
+    return filesystemhandlerextend.FileSystemHandlerExtend.ScanDir(self, path)
+
+
+class DirectoryIndexTest(unittest.TestCase):
+  """Unit test cases for DirectoryIndex on a real filesystem."""
+
+  def setUp(self):
+    self.tempdir = tempfile.mkdtemp()
+    for path in ['a/test1.sh', 'a/test2.py', 'a/b/test3.sh', 'a/.hidden.sh',
+                 'c/test4.sh', 'c/d.sh/test5.sh', 'top.suite']:
+      full_path = os.path.join(self.tempdir, path)
+      if not os.path.isdir(os.path.dirname(full_path)):
+        os.makedirs(os.path.dirname(full_path))
+      open(full_path, 'w').close()
+    os.symlink(os.path.join(self.tempdir, 'a'),
+               os.path.join(self.tempdir, 'c', 'link'))
+    self.filesystem = CountingFileSystem()
+    self.index = scanscripts.DirectoryIndex(self.filesystem)
+
+  def tearDown(self):
+    shutil.rmtree(self.tempdir)
+
+  def testWalkLikeOsWalk(self):
+    """Walk gives what os.walk gives."""
+    expected = [(path, sorted(dirs), sorted(files))
+                for path, dirs, files in os.walk(self.tempdir)]
+    self.assertEqual(sorted(self.index.Walk(self.tempdir)), sorted(expected))
+
+  def testGlobLikeGlob(self):
+    """Glob gives what glob.glob gives."""
+    for pattern in ['*/*.sh', 'a/*', 'a/.*', '*/b/test[0-9].sh', 'c/*.sh',
+                    'top.suite', 'nothere.sh', 'c/link/*.py', '?/*/*.sh']:
+      full_pattern = os.path.join(self.tempdir, pattern)
+      self.assertEqual(sorted(self.index.Glob(full_pattern)),
+                       sorted(glob.glob(full_pattern)),
+                       msg='pattern %s' % pattern)
+
+  def testEachDirectoryListedOnce(self):
+    """Directories are listed once however many times they are matched."""
+    for unused_count in range(3):
+      self.index.Walk(self.tempdir)
+      self.index.Glob(os.path.join(self.tempdir, '*', '*.sh'))
+      self.assertTrue(self.index.IsDir(os.path.join(self.tempdir, 'a', 'b')))
+      self.assertFalse(self.index.IsDir(os.path.join(self.tempdir,
+                                                     'top.suite')))
+    self.assertEqual(len(self.filesystem.listed),
+                     len(set(self.filesystem.listed)))
+
+
+class ChangedSinceTest(unittest.TestCase):
+  """Unit test cases for BaseScan with changed_since."""
+
+  def setUp(self):
+    self.tempdir = tempfile.mkdtemp()
+    self.source_dir = os.path.join(self.tempdir, 'source')
+    self._Write('old.sh', '#!/bin/sh\n', 100)
+    self._Write('new.sh', '#!/bin/sh\n', 0)
+    self._Write('depends.sh',
+                '#!/bin/sh\n# PR_START\n# DEPENDS_ON = data/*.txt\n# PR_END\n',
+                100)
+    self._Write('data/one.txt', '1', 100)
+
+  def tearDown(self):
+    shutil.rmtree(self.tempdir)
+
+  def _Write(self, name, content, age):
+    """Write a file under source_dir, modified age seconds ago."""
+    path = os.path.join(self.source_dir, name)
+    if not os.path.isdir(os.path.dirname(path)):
+      os.makedirs(os.path.dirname(path))
+    one_file = open(path, 'w')
+    one_file.write(content)
+    one_file.close()
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+
+  def _Scripts(self, changed_since):
+    """Scan source_dir with a new scanner, as a new run would."""
+    scanner = scanscripts.ScanScripts(
+        self.source_dir, changes=changeindex.ChangeIndex(
+            os.path.join(self.tempdir, 'change_index')))
+    return sorted([os.path.basename(one['TEST_SCRIPT']) for one in
+                   scanner.BaseScan('', changed_since)])
+
+  def testChangedScriptsOnly(self):
+    """Scripts and dependencies are checked against the time."""
+    reference_time = time.time() - 50
+    self.assertEqual(self._Scripts(None),
+                     ['depends.sh', 'new.sh', 'old.sh'])
+    self.assertEqual(self._Scripts(reference_time), ['new.sh'])
+    self._Write('data/two.txt', '2', 0)
+    self.assertEqual(self._Scripts(reference_time), ['depends.sh', 'new.sh'])
+
+  def testScriptsCreatedBetweenScansFound(self):
+    """A script created after a scan, as by a SETUP suite, is found next."""
+    scanner = scanscripts.ScanScripts(self.source_dir)
+    self.assertEqual(len(scanner.BaseScan('')), 3)
+    self._Write('setup/made.sh', '#!/bin/sh\n', 100)
+    self._Write('made.suite', 'setup/*.sh\n', 100)
+    self.assertEqual(len(scanner.BaseScan('')), 4)
+    self.assertEqual([os.path.basename(one['TEST_SCRIPT']) for one in
+                      scanner.BaseScan('made.suite')], ['made.sh'])
+
+
 if __name__ == '__main__':
   unittest.main()
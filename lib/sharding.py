@@ -0,0 +1,197 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Split the test cases of a suite between several PyreRing runs.
+
+Each run is given its shard index and the total number of shards, and keeps
+only the test cases of its own shard. The split depends on nothing but the
+test cases and its inputs, so runs on different hosts agree on it without
+talking to each other.
+
+HashShard puts each script in the shard chosen by the md5 of its path
+relative to source_dir, so a script stays in the same shard while the suite
+changes around it.
+
+DurationShard balances the expected durations of the shards: scripts are
+taken longest first and each goes to the shard with the least work so far.
+All runs must be given the same durations, otherwise they do not agree on the
+split and tests are skipped or run twice. So the durations are not taken from
+the history of each host, which differ and change as the shards run, but from
+a fixed snapshot given to every run, a durations file. Durations are keyed by
+the path relative to source_dir too.
+
+A durations file has one line for each script, its path relative to
+source_dir and its duration in seconds, separated by a tab. Empty lines and
+lines starting with # are skipped. WriteDurations writes one, for example
+from TestHistory.ExpectedDurations.
+"""
+
+import os
+
+try:
+  import hashlib
+  _md5 = hashlib.md5
+except ImportError:
+  import md5
+  _md5 = md5.new
+
+HASH = 'hash'
+DURATION = 'duration'
+METHODS = [HASH, DURATION]
+
+
+def CheckShard(shard_index, total_shards):
+  """Check the shard settings.
+
+  Args:
+    shard_index: <int> the index of this shard, from 0.
+    total_shards: <int> the number of shards.
+
+  Raises:
+    ValueError: if the shard index is out of range.
+  """
+  if total_shards < 1 or not 0 <= shard_index < total_shards:
+    raise ValueError('Invalid shard index %d of %d shards' %
+                     (shard_index, total_shards))
+
+
+def RelativePath(path, source_dir):
+  """Return the path of a script relative to source_dir.
+
+  Args:
+    path: the path of a script.
+    source_dir: the top dir of the scripts, empty to keep the path as it is.
+
+  Returns:
+    the normalized path, relative to source_dir if it is under it.
+  """
+  if not source_dir:
+    return path
+  prefix = os.path.join(os.path.normpath(source_dir), '')
+  path = os.path.normpath(path)
+  if path.startswith(prefix):
+    path = path[len(prefix):]
+  return path
+
+
+def RelativeDurations(durations, source_dir):
+  """Key a dictionary of durations by the paths relative to source_dir."""
+  return dict([(RelativePath(script, source_dir), duration)
+               for script, duration in durations.iteritems()])
+
+
+def ReadDurations(path):
+  """Read a durations file.
+
+  Args:
+    path: the path of the durations file.
+
+  Returns:
+    a dictionary of the duration of each script in the file.
+
+  Raises:
+    IOError: if the file can not be read.
+    ValueError: if a line can not be parsed.
+  """
+  durations = {}
+  durations_file = open(path)
+  try:
+    for number, line in enumerate(durations_file):
+      line = line.rstrip('\n')
+      if not line.strip() or line.startswith('#'):
+        continue
+      try:
+        script, duration = line.rsplit('\t', 1)
+        durations[script] = float(duration)
+      except ValueError:
+        raise ValueError('Invalid duration at %s:%d: %s' %
+                         (path, number + 1, line))
+  finally:
+    durations_file.close()
+  return durations
+
+
+def WriteDurations(path, durations):
+  """Write a durations file.
+
+  Args:
+    path: the path of the durations file.
+    durations: a dictionary of the duration of each script, keyed by its path
+      relative to source_dir, see RelativeDurations.
+  """
+  durations_file = open(path, 'w')
+  try:
+    for script in sorted(durations):
+      durations_file.write('%s\t%.3f\n' % (script, durations[script]))
+  finally:
+    durations_file.close()
+
+
+def HashShard(script_list, shard_index, total_shards, source_dir):
+  """Keep the test cases of one shard by the hash of their paths.
+
+  Args:
+    script_list: a list of test case dictionaries.
+    shard_index: <int> the index of this shard, from 0.
+    total_shards: <int> the number of shards.
+    source_dir: the top dir of the scripts. Paths are hashed relative to it,
+      so hosts with the scripts at different places agree.
+
+  Returns:
+    a list of the test case dictionaries of this shard, in the same order.
+  """
+  CheckShard(shard_index, total_shards)
+  shard = []
+  for one_script_dict in script_list:
+    path = RelativePath(one_script_dict['TEST_SCRIPT'], source_dir)
+    if long(_md5(path).hexdigest(), 16) % total_shards == shard_index:
+      shard.append(one_script_dict)
+  return shard
+
+
+def DurationShard(script_list, shard_index, total_shards, durations,
+                  default_duration, source_dir=''):
+  """Keep the test cases of one shard, balancing the expected durations.
+
+  Args:
+    script_list: a list of test case dictionaries.
+    shard_index: <int> the index of this shard, from 0.
+    total_shards: <int> the number of shards.
+    durations: a dictionary of the expected duration of each script, keyed
+      by its path relative to source_dir, see RelativeDurations.
+    default_duration: the expected duration of a script not in durations.
+    source_dir: the top dir of the scripts, so hosts with the scripts at
+      different places agree. Empty to use the paths as they are.
+
+  Returns:
+    a list of the test case dictionaries of this shard, in the same order.
+  """
+  CheckShard(shard_index, total_shards)
+  # Sort by the script too, so the split does not depend on the suite order.
+  decorated = []
+  for one_script_dict in script_list:
+    path = RelativePath(one_script_dict['TEST_SCRIPT'], source_dir)
+    decorated.append((-durations.get(path, default_duration), path))
+  decorated.sort()
+  loads = [0.0] * total_shards
+  mine = set()
+  for negative_duration, path in decorated:
+    lightest = loads.index(min(loads))
+    loads[lightest] -= negative_duration
+    if lightest == shard_index:
+      mine.add(path)
+  return [one_script_dict for one_script_dict in script_list
+          if RelativePath(one_script_dict['TEST_SCRIPT'], source_dir) in mine]
@@ -0,0 +1,113 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unittest for sharding module."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from lib import sharding
+
+
+class ShardingTest(unittest.TestCase):
+  """Unit test cases for the sharding functions."""
+
+  def _Scripts(self, top='/src', count=50):
+    return [{'TEST_SCRIPT': '%s/dir%d/test%d.sh' % (top, number % 3, number)}
+            for number in range(count)]
+
+  def _Names(self, script_list):
+    return [one['TEST_SCRIPT'] for one in script_list]
+
+  def testHashShardsCoverEveryScriptOnce(self):
+    """The hash shards are disjoint and cover the whole suite."""
+    script_list = self._Scripts()
+    seen = []
+    for index in range(4):
+      shard = sharding.HashShard(script_list, index, 4, '/src')
+      self.assertTrue(shard)
+      seen.extend(self._Names(shard))
+    self.assertEqual(sorted(seen), sorted(self._Names(script_list)))
+
+  def testHashShardIndependentOfSourceDir(self):
+    """Hosts with the scripts at different places agree on the shards."""
+    here = sharding.HashShard(self._Scripts('/src'), 1, 3, '/src')
+    there = sharding.HashShard(self._Scripts('/mnt/other'), 1, 3,
+                               '/mnt/other/')
+    self.assertEqual([name[len('/src'):] for name in self._Names(here)],
+                     [name[len('/mnt/other'):] for name in self._Names(there)])
+
+  def testHashShardKeepsScriptWhenSuiteChanges(self):
+    """A script stays in its shard when other scripts are added."""
+    shard = sharding.HashShard(self._Scripts(count=20), 2, 5, '/src')
+    bigger_shard = sharding.HashShard(self._Scripts(count=40), 2, 5, '/src')
+    for name in self._Names(shard):
+      self.assertTrue(name in self._Names(bigger_shard))
+
+  def testDurationShardBalances(self):
+    """Long scripts are spread so the shards take about the same time."""
+    script_list = [{'TEST_SCRIPT': name} for name in 'abcdef']
+    durations = {'a': 10, 'b': 9, 'c': 6, 'd': 5, 'e': 4}
+    shards = [self._Names(sharding.DurationShard(script_list, index, 2,
+                                                 durations, 1))
+              for index in range(2)]
+    self.assertEqual(shards, [['a', 'd', 'e'], ['b', 'c', 'f']])
+    # The split does not depend on the order of the suite.
+    script_list.reverse()
+    self.assertEqual(
+        sorted(self._Names(sharding.DurationShard(script_list, 0, 2,
+                                                  durations, 1))),
+        ['a', 'd', 'e'])
+
+  def testDurationShardIndependentOfSourceDir(self):
+    """Hosts with the scripts at different places agree on the shards."""
+    durations = sharding.RelativeDurations(
+        dict([(name, number) for number, name
+              in enumerate(self._Names(self._Scripts('/src')))]), '/src')
+    here = sharding.DurationShard(self._Scripts('/src'), 1, 3, durations, 1,
+                                  '/src')
+    there = sharding.DurationShard(self._Scripts('/mnt/other'), 1, 3,
+                                   durations, 1, '/mnt/other/')
+    self.assertTrue(here)
+    self.assertEqual([name[len('/src'):] for name in self._Names(here)],
+                     [name[len('/mnt/other'):] for name in self._Names(there)])
+
+  def testDurationsFile(self):
+    """A durations file is read back as written, broken lines are errors."""
+    tempdir = tempfile.mkdtemp()
+    try:
+      path = os.path.join(tempdir, 'durations')
+      durations = {'dir0/test0.sh': 1.5, 'dir 1/test1.sh': 20}
+      sharding.WriteDurations(path, durations)
+      self.assertEqual(sharding.ReadDurations(path), durations)
+      durations_file = open(path, 'a')
+      durations_file.write('# a comment\n\nbroken line\n')
+      durations_file.close()
+      self.assertRaises(ValueError, sharding.ReadDurations, path)
+    finally:
+      shutil.rmtree(tempdir)
+
+  def testInvalidShard(self):
+    """A shard index out of range is an error."""
+    self.assertRaises(ValueError, sharding.HashShard, [], 2, 2, '/src')
+    self.assertRaises(ValueError, sharding.DurationShard, [], -1, 2, {}, 1)
+    self.assertRaises(ValueError, sharding.CheckShard, 0, 0)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Everything one test runs with, passed to the process that runs it.
+
+A TestContext holds the command, dir, environment, timeout and limits of one
+test. Tests are started with the dir and environment of their context, rather
+than with a chdir or a change to os.environ of PyreRing, so tests running at
+the same time in other threads can't see each other's.
+
+A context can't be changed once made. The environment dictionary is built
+once by pyreringutil.TestEnvironment and shared by all the contexts of a run,
+so it must not be changed either.
+"""
+
+import os
+
+from lib import filesystemhandlerextend
+
+DEFAULT_KILL_GRACE = filesystemhandlerextend.DEFAULT_KILL_GRACE
+
+
+class TestContext(object):
+  """The immutable context of one test."""
+
+  __slots__ = ['command', 'cwd', 'environment', 'timeout', 'limits',
+               'kill_grace']
+
+  def __init__(self, command, cwd, environment, timeout, limits=None,
+               kill_grace=DEFAULT_KILL_GRACE):
+    """Init the context.
+
+    Args:
+      command: <string> the test command.
+      cwd: the dir to run the test in, None for the current one.
+      environment: <dict> the environment to run the test with.
+      timeout: a number of seconds the test may run for.
+      limits: a resourcelimits.ResourceLimits, None for no limits.
+      kill_grace: seconds a timed out test has to exit after SIGTERM.
+    """
+    for name, value in [('command', command), ('cwd', cwd),
+                        ('environment', environment), ('timeout', timeout),
+                        ('limits', limits), ('kill_grace', kill_grace)]:
+      object.__setattr__(self, name, value)
+
+  def __setattr__(self, name, value):
+    raise AttributeError('TestContext can not be changed')
+
+  def __delattr__(self, name):
+    raise AttributeError('TestContext can not be changed')
+
+
+def FromConfig(one_script_dict, environment, limits=None,
+               kill_grace=DEFAULT_KILL_GRACE):
+  """Make the context of a test case dictionary.
+
+  The test runs in the dir of its script. In case the command has arguments,
+  the dir is taken from its first word.
+
+  Args:
+    one_script_dict: <dict> test case dictionary.
+    environment: <dict> the environment of the run.
+    limits: a resourcelimits.ResourceLimits, None for no limits.
+    kill_grace: seconds a timed out test has to exit after SIGTERM.
+
+  Returns:
+    a TestContext.
+  """
+  command = one_script_dict['TEST_SCRIPT']
+  # If command = 'touch /pyrering.txt', os.path.split(command)[0] would give
+  # 'touch', so split the command first.
+  cwd = os.path.split(command.split()[0])[0] or None
+  return TestContext(command, cwd, environment, one_script_dict['TIMEOUT'],
+                     limits, kill_grace)
@@ -0,0 +1,55 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unittest for testcontext module."""
+
+import unittest
+
+from lib import pyreringutil
+from lib import testcontext
+
+
+class TestContextTest(unittest.TestCase):
+  """Unit test cases for TestContext class."""
+
+  def setUp(self):
+    self.config = pyreringutil.PRConfigParser().Default()
+    self.environment = {'PATH': '/bin'}
+
+  def testFromConfig(self):
+    """The dir is the one of the script, even with arguments."""
+    self.config['TEST_SCRIPT'] = '/tests/check.sh /other/arg'
+    self.config['TIMEOUT'] = 30
+    context = testcontext.FromConfig(self.config, self.environment)
+    self.assertEqual(context.command, '/tests/check.sh /other/arg')
+    self.assertEqual(context.cwd, '/tests')
+    self.assertEqual(context.timeout, 30)
+    self.assertTrue(context.environment is self.environment)
+    self.config['TEST_SCRIPT'] = 'touch /pyrering.txt'
+    self.assertEqual(
+        testcontext.FromConfig(self.config, self.environment).cwd, None)
+
+  def testImmutable(self):
+    """A context can't be changed."""
+    self.config['TEST_SCRIPT'] = '/tests/check.sh'
+    context = testcontext.FromConfig(self.config, self.environment)
+    self.assertRaises(AttributeError, setattr, context, 'cwd', '/')
+    self.assertRaises(AttributeError, setattr, context, 'other', 1)
+    self.assertRaises(AttributeError, delattr, context, 'timeout')
+
+
+if __name__ == '__main__':
+  unittest.main()
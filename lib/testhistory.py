@@ -0,0 +1,330 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""An append only history of the test results of all PyreRing runs.
+
+The class TestHistory records the wall time, return code and status of every
+test run, one line per test, in a history file under report_dir. Records are
+kept in memory and appended in batches, under an exclusive flock, so runs on
+the same host can share the file. Each line is tab separated:
+
+  run_id  start_time  host  script  duration  return_code  status
+  user_cpu  system_cpu  max_rss_kb  in_blocks  out_blocks
+  voluntary_switches  involuntary_switches
+
+The return code is empty for a test without one, like a timeout. The resource
+usage fields are empty for a test which was not run, and missing in lines
+written before they were added. Tabs, line ends and backslashes in the values
+are escaped.
+
+The file is parsed once and the records are kept until the next Flush. Once
+the file grows over max_size, the flush drops its oldest records, keeping the
+latest half of max_size.
+"""
+
+import fcntl
+import logging
+import os
+
+from lib import common_util
+from lib import constants
+from lib import resourceusage
+
+logger = logging.getLogger('PyreRing')
+DEBUG = common_util.DebugLog
+
+HISTORY_FILE = 'pyrering.history'
+BASE_FIELDS = ['run_id', 'start_time', 'host', 'script', 'duration',
+               'return_code', 'status']
+FIELDS = BASE_FIELDS + resourceusage.FIELDS
+# The number of records kept in memory before they are appended to the file.
+BATCH_SIZE = 100
+# The size in bytes the history file is compacted at.
+MAX_SIZE = 32 * 1024 * 1024
+# The number of latest durations of a test averaged to expect its duration.
+DURATION_SAMPLES = 5
+# The statuses of the tests run again by a rerun of the failures.
+FAILED_STATUSES = [constants.FAIL, constants.TIMEOUT, constants.ERROR,
+                   constants.LIMIT]
+# The number of latest runs of a test its flake rate is taken from.
+FLAKE_SAMPLES = 20
+
+
+def _Escape(value):
+  return str(value).encode('string_escape')
+
+
+def _Unescape(value):
+  return value.decode('string_escape')
+
+
+class TestRecord(object):
+  """One test result read from the history."""
+
+  def __init__(self, run_id, start_time, host, script, duration, return_code,
+               status, usage=None):
+    self.run_id = run_id
+    self.start_time = start_time
+    self.host = host
+    self.script = script
+    self.duration = duration
+    self.return_code = return_code
+    self.status = status
+    # None/resourceusage.ResourceUsage of the test.
+    self.usage = usage
+
+
+class TestHistory(object):
+  """The history file of test results."""
+
+  def __init__(self, path, run_id='', host='', batch_size=BATCH_SIZE,
+               max_size=MAX_SIZE):
+    """Init the history, nothing is read or written yet.
+
+    Args:
+      path: the path of the history file.
+      run_id: <string> the id of this run, recorded with each result.
+      host: <string> the host name recorded with each result.
+      batch_size: <int> the number of records appended at a time.
+      max_size: <int> the size in bytes the file is compacted at, 0 to let it
+        grow.
+    """
+    self.path = path
+    self.run_id = run_id
+    self.host = host
+    self.batch_size = batch_size
+    self.max_size = max_size
+    self.pending = []
+    # The records read from the file since the last Flush, None if not read.
+    self.records = None
+
+  def Record(self, script, start_time, duration, return_code, status,
+             usage=None):
+    """Record one test result.
+
+    Args:
+      script: <string> the test script.
+      start_time: <float> the time the test started, seconds since epoch.
+      duration: <float> the wall time of the test in seconds.
+      return_code: None/int the return code of the test.
+      status: <string> one of the test result constants.
+      usage: None/resourceusage.ResourceUsage of the test.
+    """
+    if return_code is None:
+      return_code = ''
+    values = [self.run_id, '%.3f' % start_time, self.host, script,
+              '%.3f' % duration, return_code, status]
+    if usage is None:
+      values.extend([''] * len(resourceusage.FIELDS))
+    else:
+      values.extend(usage.Values())
+    self.pending.append('\t'.join([_Escape(one) for one in values]) + '\n')
+    if len(self.pending) >= self.batch_size:
+      self.Flush()
+
+  @DEBUG
+  def Flush(self):
+    """Append the pending records to the history file.
+
+    The file is compacted if it grew over max_size.
+    """
+    if not self.pending:
+      return
+    try:
+      history_file = open(self.path, 'a+')
+      try:
+        fcntl.flock(history_file.fileno(), fcntl.LOCK_EX)
+        history_file.writelines(self.pending)
+        history_file.flush()
+        if (self.max_size and
+            os.fstat(history_file.fileno()).st_size > self.max_size):
+          self._Compact(history_file)
+      finally:
+        # Closing the file releases the lock.
+        history_file.close()
+    except IOError, e:
+      # The history must not fail the test run.
+      logger.warning('failed to write test history %s: %s' % (self.path, e))
+    self.pending = []
+    self.records = None
+
+  def _Compact(self, history_file):
+    """Drop the oldest records, keeping the latest half of max_size.
+
+    The latest records are the ones the expected durations, flake rates and
+    last runs are taken from. It is rewritten in place, since another run
+    may be waiting for the lock of the open file.
+
+    Args:
+      history_file: the history file opened with 'a+' and locked.
+    """
+    history_file.seek(0)
+    lines = history_file.readlines()
+    kept = []
+    size = 0
+    for line in reversed(lines):
+      size += len(line)
+      if size > self.max_size / 2:
+        break
+      kept.append(line)
+    kept.reverse()
+    history_file.seek(0)
+    history_file.truncate(0)
+    history_file.writelines(kept)
+    history_file.flush()
+    logger.info('compacted test history %s from %d to %d records' %
+                (self.path, len(lines), len(kept)))
+
+  def Read(self):
+    """Read all the records in the history file.
+
+    The file is parsed on the first call only, until the next Flush.
+
+    Returns:
+      a list of TestRecord objects, oldest first, which should not be
+      changed. Records not flushed yet are not included.
+    """
+    if self.records is None:
+      self.records = self._ReadFile()
+    return self.records
+
+  def _ReadFile(self):
+    """Parse the history file under a shared lock.
+
+    Lines which can not be parsed, like a line cut by a crash or still being
+    written, are skipped.
+
+    Returns:
+      a list of TestRecord objects, oldest first.
+    """
+    records = []
+    try:
+      history_file = open(self.path)
+    except IOError:
+      return records
+    try:
+      # A compaction must not be read halfway.
+      fcntl.flock(history_file.fileno(), fcntl.LOCK_SH)
+      for line in history_file:
+        values = line.rstrip('\n').split('\t')
+        if (not line.endswith('\n') or
+            len(values) not in (len(BASE_FIELDS), len(FIELDS))):
+          continue
+        try:
+          values = [_Unescape(one) for one in values]
+          values[1] = float(values[1])
+          values[4] = float(values[4])
+          if values[5]:
+            values[5] = int(values[5])
+          else:
+            values[5] = None
+          usage = None
+          usage_values = values[len(BASE_FIELDS):]
+          if usage_values and usage_values[0]:
+            usage = resourceusage.ResourceUsage(
+                float(usage_values[0]), float(usage_values[1]),
+                *[int(one) for one in usage_values[2:]])
+        except ValueError:
+          continue
+        values = values[:len(BASE_FIELDS)]
+        values.append(usage)
+        records.append(TestRecord(*values))
+    finally:
+      history_file.close()
+    return records
+
+  def ExpectedDurations(self, host=None, samples=DURATION_SAMPLES):
+    """Expect the duration of each test from its latest runs.
+
+    Args:
+      host: <string> only use the runs on this host, None to use all hosts.
+      samples: <int> the number of latest runs averaged.
+
+    Returns:
+      a dictionary of the expected duration in seconds of each script in the
+      history.
+    """
+    durations = {}
+    for record in self.Read():
+      if host is None or record.host == host:
+        durations.setdefault(record.script, []).append(record.duration)
+    expected = {}
+    for script, script_durations in durations.iteritems():
+      latest = script_durations[-samples:]
+      expected[script] = sum(latest) / len(latest)
+    return expected
+
+  def FlakeRates(self, samples=FLAKE_SAMPLES, host=None):
+    """Count the FLAKY results of each test in its latest runs.
+
+    Args:
+      samples: <int> the number of latest runs looked at.
+      host: <string> only use the runs on this host, None to use all hosts.
+
+    Returns:
+      a dictionary of a tuple of the number of FLAKY runs and the number of
+      runs looked at, for each script in the history.
+    """
+    statuses = {}
+    for record in self.Read():
+      if host is None or record.host == host:
+        statuses.setdefault(record.script, []).append(record.status)
+    rates = {}
+    for script, script_statuses in statuses.iteritems():
+      latest = script_statuses[-samples:]
+      rates[script] = (latest.count(constants.FLAKY), len(latest))
+    return rates
+
+  def RunStartTime(self, run_id=None, host=None):
+    """Find the time a run started.
+
+    Args:
+      run_id: <string> the id of the run, None for the latest run.
+      host: <string> only look at the runs on this host, None for all hosts.
+
+    Returns:
+      None/float the start time of the first test of the run in seconds since
+      epoch, None if there is no such run.
+    """
+    records = [record for record in self.Read()
+               if host is None or record.host == host]
+    if run_id is None and records:
+      run_id = records[-1].run_id
+    start_times = [record.start_time for record in records
+                   if record.run_id == run_id]
+    if not start_times:
+      return None
+    return min(start_times)
+
+  def LastRunFailures(self, host=None, statuses=FAILED_STATUSES):
+    """Find the tests which did not pass in the latest run.
+
+    Args:
+      host: <string> only look at the runs on this host, None for all hosts.
+      statuses: a list of the statuses taken as failures.
+
+    Returns:
+      a tuple of the run id of the latest run, None if there is no run, and
+      a set of the scripts with any of the statuses in that run.
+    """
+    records = [record for record in self.Read()
+               if host is None or record.host == host]
+    if not records:
+      return None, set()
+    run_id = records[-1].run_id
+    failures = set([record.script for record in records
+                    if record.run_id == run_id and record.status in statuses])
+    return run_id, failures
@@ -0,0 +1,185 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unittest for testhistory module."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from lib import constants
+from lib import resourceusage
+from lib import testhistory
+
+
+class TestHistoryTest(unittest.TestCase):
+  """Unit test cases for TestHistory class."""
+
+  def setUp(self):
+    self.tempdir = tempfile.mkdtemp()
+    self.path = os.path.join(self.tempdir, testhistory.HISTORY_FILE)
+
+  def tearDown(self):
+    shutil.rmtree(self.tempdir)
+
+  def testRecordsWrittenInBatches(self):
+    """Records are appended only when a batch is full or flushed."""
+    history = testhistory.TestHistory(self.path, 'run1', 'host1', 2)
+    history.Record('/a.sh', 100, 1.5, 0, constants.PASS)
+    self.assertFalse(os.path.exists(self.path))
+    history.Record('/b.sh', 101, 2, None, constants.TIMEOUT)
+    self.assertEqual(len(history.Read()), 2)
+    history.Record('/c.sh', 103, 0.25, 3, constants.FAIL)
+    self.assertEqual(len(history.Read()), 2)
+    history.Flush()
+    records = history.Read()
+    self.assertEqual([one.script for one in records],
+                     ['/a.sh', '/b.sh', '/c.sh'])
+    self.assertEqual(records[1].return_code, None)
+    self.assertEqual(records[1].status, constants.TIMEOUT)
+    self.assertEqual(records[2].duration, 0.25)
+    self.assertEqual(records[2].run_id, 'run1')
+    self.assertEqual(records[2].host, 'host1')
+
+  def testRunsAppendToTheSameFile(self):
+    """A second run appends after the first one."""
+    for run_id in ['run1', 'run2']:
+      history = testhistory.TestHistory(self.path, run_id, 'host1')
+      history.Record('/a.sh', 100, 1, 0, constants.PASS)
+      history.Flush()
+    self.assertEqual([one.run_id for one in history.Read()], ['run1', 'run2'])
+
+  def testEscapedValues(self):
+    """Tabs and line ends in a script name are kept."""
+    history = testhistory.TestHistory(self.path)
+    history.Record('echo "a\tb\nc\\"', 100, 1, 0, constants.PASS)
+    history.Flush()
+    self.assertEqual(history.Read()[0].script, 'echo "a\tb\nc\\"')
+
+  def testBrokenLinesSkipped(self):
+    """A line cut in the middle is skipped."""
+    history = testhistory.TestHistory(self.path)
+    history.Record('/a.sh', 100, 1, 0, constants.PASS)
+    history.Flush()
+    history_file = open(self.path, 'a')
+    history_file.write('run\t100\thost\t/b.sh\t1\t0\tPA')
+    history_file.close()
+    self.assertEqual([one.script for one in history.Read()], ['/a.sh'])
+
+  def testReadCachedUntilFlush(self):
+    """The file is parsed once until the next Flush."""
+    history = testhistory.TestHistory(self.path)
+    history.Record('/a.sh', 100, 1, 0, constants.PASS)
+    history.Flush()
+    records = history.Read()
+    history_file = open(self.path, 'a')
+    history_file.write('run\t100\thost\t/b.sh\t1\t0\tPASS\n')
+    history_file.close()
+    self.assertTrue(history.Read() is records)
+    history.Record('/c.sh', 100, 1, 0, constants.PASS)
+    history.Flush()
+    self.assertEqual([one.script for one in history.Read()],
+                     ['/a.sh', '/b.sh', '/c.sh'])
+
+  def testCompaction(self):
+    """The oldest records are dropped once the file grows over max_size."""
+    history = testhistory.TestHistory(self.path, 'run1', 'host1', 1, 2000)
+    for number in range(100):
+      history.Record('/%02d.sh' % number, 100, 1, 0, constants.PASS)
+    self.assertTrue(os.path.getsize(self.path) <= 2000)
+    scripts = [one.script for one in history.Read()]
+    self.assertTrue(len(scripts) < 100)
+    self.assertEqual(scripts[-1], '/99.sh')
+    self.assertEqual(scripts, sorted(scripts))
+    # Nothing is cut in the middle.
+    self.assertTrue(open(self.path).read().startswith('run1\t'))
+
+  def testResourceUsageRecorded(self):
+    """The usage is read back, lines without one are still read."""
+    history_file = open(self.path, 'w')
+    history_file.write('run0\t100\thost1\t/a.sh\t1\t0\tPASS\n')
+    history_file.close()
+    usage = resourceusage.ResourceUsage(1.5, 0.25, 1024, 8, 16, 3, 4)
+    history = testhistory.TestHistory(self.path, 'run1', 'host1')
+    history.Record('/a.sh', 200, 2, 0, constants.PASS, usage)
+    history.Record('/b.sh', 200, 0, None, constants.ERROR)
+    history.Flush()
+    records = history.Read()
+    self.assertEqual([one.run_id for one in records], ['run0', 'run1', 'run1'])
+    self.assertEqual(records[0].usage, None)
+    self.assertEqual(records[1].usage, usage)
+    self.assertEqual(records[2].usage, None)
+
+  def testExpectedDurations(self):
+    """The latest durations of each script are averaged."""
+    history = testhistory.TestHistory(self.path, 'run1', 'host1')
+    for duration in [100, 1, 2, 3]:
+      history.Record('/a.sh', 100, duration, 0, constants.PASS)
+    history.Record('/b.sh', 100, 10, 0, constants.PASS)
+    history.host = 'host2'
+    history.Record('/b.sh', 100, 20, 0, constants.PASS)
+    history.Flush()
+    self.assertEqual(history.ExpectedDurations(samples=3),
+                     {'/a.sh': 2, '/b.sh': 15})
+    self.assertEqual(history.ExpectedDurations('host2'), {'/b.sh': 20})
+
+  def testFlakeRates(self):
+    """The FLAKY results of each script are counted in its latest runs."""
+    history = testhistory.TestHistory(self.path, 'run1', 'host1')
+    for status in [constants.FLAKY, constants.FLAKY, constants.PASS,
+                   constants.FLAKY, constants.FAIL]:
+      history.Record('/a.sh', 100, 1, 0, status)
+    history.Record('/b.sh', 100, 1, 0, constants.PASS)
+    history.Flush()
+    self.assertEqual(history.FlakeRates(3), {'/a.sh': (1, 3), '/b.sh': (0, 1)})
+    self.assertEqual(history.FlakeRates()['/a.sh'], (3, 5))
+
+  def testRunStartTime(self):
+    """A run starts with its first test, the latest run by default."""
+    history = testhistory.TestHistory(self.path, 'run1', 'host1')
+    self.assertEqual(history.RunStartTime(), None)
+    history.Record('/a.sh', 200, 1, 0, constants.PASS)
+    history.Record('/b.sh', 100, 1, 0, constants.PASS)
+    history.run_id = 'run2'
+    history.host = 'host2'
+    history.Record('/a.sh', 300, 1, 0, constants.PASS)
+    history.Flush()
+    self.assertEqual(history.RunStartTime('run1'), 100)
+    self.assertEqual(history.RunStartTime(), 300)
+    self.assertEqual(history.RunStartTime(host='host1'), 100)
+    self.assertEqual(history.RunStartTime('run3'), None)
+
+  def testLastRunFailures(self):
+    """Only the failures of the latest run of the host are returned."""
+    history = testhistory.TestHistory(self.path, 'run1', 'host1')
+    self.assertEqual(history.LastRunFailures(), (None, set()))
+    history.Record('/a.sh', 100, 1, 1, constants.FAIL)
+    history.run_id = 'run2'
+    history.Record('/a.sh', 200, 1, 0, constants.PASS)
+    history.Record('/b.sh', 200, 1, None, constants.TIMEOUT)
+    history.Record('/c.sh', 200, 1, 255, constants.ERROR)
+    history.run_id = 'run3'
+    history.host = 'host2'
+    history.Record('/d.sh', 300, 1, 1, constants.FAIL)
+    history.Flush()
+    self.assertEqual(history.LastRunFailures('host1'),
+                     ('run2', set(['/b.sh', '/c.sh'])))
+    self.assertEqual(history.LastRunFailures(), ('run3', set(['/d.sh'])))
+
+
+if __name__ == '__main__':
+  unittest.main()
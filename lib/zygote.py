@@ -0,0 +1,548 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A warm Python process which forks the python tests instead of starting them.
+
+The class Zygote starts a server process running Serve with the same
+interpreter as PyreRing and the environment of the tests. The server imports
+the preload modules once, then reads pickled requests from its stdin. For
+each test it forks a reaper process, which forks the test in its own process
+group. The test runs the script with runpy, as a fresh interpreter would,
+with its output going to a FIFO read by PyreRing. The reaper waits for the
+test and writes its exit code and resource usage to a second FIFO, since
+PyreRing can not wait for the process of a grandchild. The server runs in its
+own session and ignores SIGINT, like the reapers it forks, so a Ctrl-C which
+PyreRing survives does not take them down.
+
+So a test has the same return code, output and timeout handling as a test run
+by FileSystemHandlerExtend.RunCommandToLoggerWithTimeout, without paying for
+the interpreter start up and the imports of the preload modules.
+"""
+
+import cPickle
+import errno
+import logging
+import os
+import runpy
+import select
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+from lib import common_util
+from lib import filesystemhandlerextend
+from lib import outputspool
+from lib import resourceusage
+
+logger = logging.getLogger('PyreRing')
+DEBUG = common_util.DebugLog
+
+# The size of each read from a FIFO.
+READ_SIZE = 65536
+# Seconds to wait for the reaper to report a killed test.
+REAP_TIMEOUT = 5
+DEFAULT_KILL_GRACE = filesystemhandlerextend.DEFAULT_KILL_GRACE
+# The server is started with this command, the root dir of PyreRing is put in
+# its sys.path only to import this module.
+SERVER_COMMAND = ('import sys; sys.path.insert(0, %r); '
+                  'from lib import zygote; del sys.path[0]; '
+                  'zygote.Serve(sys.argv[1:])')
+
+
+class ZygoteError(Exception):
+  """The zygote server or the reaper of a test went away."""
+
+
+def FindModules(paths):
+  """Find the top level modules and packages in a list of dirs.
+
+  Args:
+    paths: a list of dir paths.
+
+  Returns:
+    a sorted list of module names.
+  """
+  modules = set()
+  for path in paths:
+    try:
+      names = os.listdir(path)
+    except OSError:
+      continue
+    for name in names:
+      full_path = os.path.join(path, name)
+      if name.endswith('.py') and not name.endswith('_test.py'):
+        modules.add(name[:-3])
+      elif os.path.isfile(os.path.join(full_path, '__init__.py')):
+        modules.add(name)
+  modules = list(modules)
+  modules.sort()
+  return modules
+
+
+def IsPythonScript(script):
+  """Check if a script is a python script the zygote can run.
+
+  Args:
+    script: the path of the script.
+
+  Returns:
+    True if it ends with .py and has no #! line, or one with python in it.
+  """
+  if not script.endswith('.py'):
+    return False
+  try:
+    script_file = open(script)
+    try:
+      first_line = script_file.readline()
+    finally:
+      script_file.close()
+  except IOError:
+    return False
+  return not first_line.startswith('#!') or 'python' in first_line
+
+
+def _WriteMessage(fd, message):
+  """Write a pickled message with its length in front.
+
+  A message PyreRing no longer reads, because it stopped supervising the
+  test, is dropped.
+  """
+  data = cPickle.dumps(message, 2)
+  try:
+    os.write(fd, '%d\n%s' % (len(data), data))
+  except OSError, e:
+    if e.errno != errno.EPIPE:
+      raise
+
+
+def _ParseMessages(data):
+  """Split the complete messages from the start of the data.
+
+  Returns:
+    a tuple of the list of messages and the data left.
+  """
+  messages = []
+  while True:
+    end_of_length = data.find('\n')
+    if end_of_length < 0:
+      break
+    end = end_of_length + 1 + int(data[:end_of_length])
+    if len(data) < end:
+      break
+    messages.append(cPickle.loads(data[end_of_length + 1:end]))
+    data = data[end:]
+  return messages, data
+
+
+def _Read(fd):
+  """Read what is in a none blocking FIFO.
+
+  Returns:
+    the data read, '' if the writers closed it, None if there is nothing to
+    read now.
+  """
+  try:
+    return os.read(fd, READ_SIZE)
+  except OSError, e:
+    if e.errno != errno.EAGAIN:
+      raise
+    return None
+
+
+def _ExitCode(code):
+  """Turn the code of a SystemExit into an exit code, as python does."""
+  if code is None:
+    return 0
+  if isinstance(code, (int, long)):
+    return code & 0xff
+  sys.stderr.write('%s\n' % code)
+  return 1
+
+
+def _RunScript(request, output):
+  """Run the script of a request in the test process, never returns.
+
+  Args:
+    request: <dict> the request from PyreRing.
+    output: the file descriptor of the output FIFO.
+  """
+  code = 1
+  try:
+    try:
+      os.dup2(output, 1)
+      os.dup2(output, 2)
+      os.close(output)
+      null = os.open(os.devnull, os.O_RDONLY)
+      os.dup2(null, 0)
+      os.close(null)
+      # The server ignores it, a fresh interpreter would not.
+      signal.signal(signal.SIGINT, signal.default_int_handler)
+      if request['limits']:
+        request['limits'].Apply()
+      # The modules of PyreRing should not hide those of the test.
+      for name in sys.modules.keys():
+        if name == 'lib' or name.startswith('lib.'):
+          del sys.modules[name]
+      os.chdir(request['cwd'] or os.getcwd())
+      os.environ.clear()
+      os.environ.update(request['environment'])
+      script = request['script']
+      sys.argv = [script] + request['args']
+      sys.path[0] = os.path.dirname(os.path.abspath(script))
+      try:
+        runpy.run_path(script, run_name='__main__')
+        code = 0
+      except SystemExit, e:
+        code = _ExitCode(e.code)
+      if hasattr(sys, 'exitfunc'):
+        sys.exitfunc()
+    except SystemExit, e:
+      code = _ExitCode(e.code)
+    except:
+      traceback.print_exc()
+      code = 1
+  finally:
+    try:
+      sys.stdout.flush()
+      sys.stderr.flush()
+    finally:
+      os._exit(code)
+
+
+def _ReapTest(request):
+  """Start the test of a request and report how it exits, never returns."""
+  try:
+    try:
+      signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+      # Both FIFOs are open for writing before the test is reported started,
+      # PyreRing takes a FIFO with no writer left as closed after that.
+      status = os.open(request['status'], os.O_WRONLY)
+      output = os.open(request['output'], os.O_WRONLY)
+      pid = os.fork()
+      if not pid:
+        os.setpgid(0, 0)
+        os.close(status)
+        _RunScript(request, output)
+      os.close(output)
+      # Set it in both processes, so it is set before either goes on.
+      try:
+        os.setpgid(pid, pid)
+      except OSError:
+        # The test set it already, or has exited.
+        pass
+      _WriteMessage(status, ('started', pid))
+      while True:
+        try:
+          unused_pid, exit_status, rusage = os.wait4(pid, 0)
+          break
+        except OSError, e:
+          if e.errno != errno.EINTR:
+            raise
+      if os.WIFSIGNALED(exit_status):
+        ret = -os.WTERMSIG(exit_status)
+      else:
+        ret = os.WEXITSTATUS(exit_status)
+      _WriteMessage(status, ('exit', ret,
+                             resourceusage.FromRusage(rusage).Values()))
+    except:
+      traceback.print_exc()
+  finally:
+    os._exit(0)
+
+
+def Serve(preload):
+  """The main loop of the zygote server.
+
+  Args:
+    preload: a list of module names to import before serving.
+  """
+  # PyreRing goes on after a KeyboardInterrupt, so should the server and the
+  # reapers, which inherit this.
+  signal.signal(signal.SIGINT, signal.SIG_IGN)
+  for name in preload:
+    try:
+      __import__(name)
+    except Exception, e:
+      sys.stderr.write('zygote: failed to preload %s: %s\n' % (name, e))
+  # The reapers are reaped by the system.
+  signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+  while True:
+    try:
+      request = cPickle.load(sys.stdin)
+    except EOFError:
+      break
+    if not os.fork():
+      _ReapTest(request)
+
+
+class Zygote(object):
+  """The PyreRing side of a zygote server."""
+
+  def __init__(self, preload=(), environment=None, root_dir=None):
+    """Init the zygote, the server is started by Start.
+
+    Args:
+      preload: a list of module names for the server to import.
+      environment: <dict> the environment of the server and the default one
+        of the tests, None for the one of this process.
+      root_dir: the root dir of PyreRing, to import this module from.
+    """
+    self.preload = list(preload)
+    if environment is None:
+      environment = dict(os.environ)
+    self.environment = environment
+    if root_dir is None:
+      root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    self.root_dir = root_dir
+    self.server = None
+    self.lock = threading.Lock()
+    # The tests started and not reaped yet.
+    self.running_groups = filesystemhandlerextend.RunningGroups()
+
+  @DEBUG
+  def Start(self):
+    """Start the server with its environment."""
+    null = open(os.devnull, 'w')
+    try:
+      self.server = subprocess.Popen(
+          [sys.executable, '-c', SERVER_COMMAND % self.root_dir] +
+          self.preload, stdin=subprocess.PIPE, stdout=null,
+          env=self.environment, preexec_fn=os.setsid)
+    finally:
+      null.close()
+    logger.info('zygote %d started, preloading %s' %
+                (self.server.pid, ', '.join(self.preload)))
+
+  @DEBUG
+  def Stop(self):
+    """Stop the server, the tests still running are not stopped."""
+    if self.server is None:
+      return
+    try:
+      self.server.stdin.close()
+    except IOError:
+      # The server went away already.
+      pass
+    self.server.wait()
+    self.server = None
+
+  def IsRunning(self):
+    """Check if the server was started and has not exited."""
+    return self.server is not None and self.server.poll() is None
+
+  def _Send(self, request):
+    self.lock.acquire()
+    try:
+      if self.server is None or self.server.poll() is not None:
+        raise ZygoteError('zygote server is not running')
+      try:
+        cPickle.dump(request, self.server.stdin, 2)
+        self.server.stdin.flush()
+      except IOError, e:
+        raise ZygoteError('zygote server went away: %s' % e)
+    finally:
+      self.lock.release()
+
+  @DEBUG
+  def RunScriptToLoggerWithTimeout(self, script, args, timeout=600, cwd=None,
+                                   output=None, monitor=None, limits=None,
+                                   kill_grace=DEFAULT_KILL_GRACE, env=None):
+    """Run a python script in a process forked from the zygote.
+
+    Same as FileSystemHandlerExtend.RunCommandToLoggerWithTimeout, except the
+    script is run by the zygote instead of a shell.
+
+    Args:
+      script: the path of the python script.
+      args: a list of the arguments of the script.
+      timeout: the timeout in seconds, an integer or a float.
+      cwd: the directory to run the script in, None for the current one.
+      output: an outputspool.OutputSpool to keep the output in. A new one with
+        the default memory cap is created if None.
+      monitor: a callable, called with each chunk of output while the script
+        runs. If it returns True, the script is killed at once.
+      limits: a resourcelimits.ResourceLimits to set in the test process
+        before it starts, None for no limits.
+      kill_grace: seconds a timed out script has to exit after SIGTERM,
+        before its process group gets SIGKILL.
+      env: a dictionary of the environment of the script, None for the one
+        of the zygote.
+
+    Returns:
+      a tuple of the return code, None if it timed out, the OutputSpool and
+      the resourceusage.ResourceUsage of the script.
+
+    Raises:
+      ZygoteError: if the server or the reaper of the test went away.
+    """
+    if output is None:
+      output = outputspool.OutputSpool()
+    fifo_dir = tempfile.mkdtemp(prefix='pyrering_zygote')
+    try:
+      output_fifo = os.path.join(fifo_dir, 'output')
+      status_fifo = os.path.join(fifo_dir, 'status')
+      os.mkfifo(output_fifo)
+      os.mkfifo(status_fifo)
+      output_fd = os.open(output_fifo, os.O_RDONLY | os.O_NONBLOCK)
+      status_fd = os.open(status_fifo, os.O_RDONLY | os.O_NONBLOCK)
+      # Reading a FIFO with no writer gives end of file, so PyreRing holds a
+      # write end of each until the reaper has opened them.
+      holders = [os.open(output_fifo, os.O_WRONLY | os.O_NONBLOCK),
+                 os.open(status_fifo, os.O_WRONLY | os.O_NONBLOCK)]
+      try:
+        self._Send({'script': script, 'args': list(args), 'cwd': cwd,
+                    'environment': env or self.environment, 'limits': limits,
+                    'output': output_fifo, 'status': status_fifo})
+        return self._Supervise(output_fd, status_fd, holders, timeout,
+                               output, monitor, kill_grace)
+      finally:
+        for fd in [output_fd, status_fd] + holders:
+          os.close(fd)
+    finally:
+      shutil.rmtree(fifo_dir, True)
+
+  def _Supervise(self, output_fd, status_fd, holders, timeout, output,
+                 monitor, kill_grace):
+    """Pass on the output of a test until it exits, or kill it on timeout.
+
+    The holders are closed once the test has started.
+
+    Returns:
+      a tuple of the return code, None if it timed out, the OutputSpool and
+      the resourceusage.ResourceUsage of the test.
+    """
+    state = {'pid': None, 'exit': None, 'data': '', 'status_open': True}
+    output_open = [True]
+
+    def ReadOutput():
+      """Pass on the output, return True if the monitor wants a kill."""
+      stop = False
+      while output_open[0]:
+        chunk = _Read(output_fd)
+        if chunk is None:
+          break
+        if not chunk:
+          # The test and anything it started closed the output.
+          output_open[0] = False
+          break
+        logger.info(chunk)
+        output.write(chunk)
+        if monitor and monitor(chunk):
+          stop = True
+      return stop
+
+    def ReadStatus():
+      while state['status_open']:
+        chunk = _Read(status_fd)
+        if chunk is None:
+          break
+        if not chunk:
+          state['status_open'] = False
+          break
+        messages, state['data'] = _ParseMessages(state['data'] + chunk)
+        for message in messages:
+          if message[0] == 'started':
+            state['pid'] = message[1]
+            self.running_groups.Add(state['pid'])
+            while holders:
+              os.close(holders.pop())
+          else:
+            state['exit'] = (message[1],
+                             resourceusage.ResourceUsage(*message[2]))
+
+    def Wait(seconds):
+      fds = []
+      if output_open[0]:
+        fds.append(output_fd)
+      if state['status_open']:
+        fds.append(status_fd)
+      if fds:
+        try:
+          select.select(fds, [], [], seconds)
+        except select.error, e:
+          if e[0] != errno.EINTR:
+            raise
+      else:
+        time.sleep(seconds)
+
+    def WaitFor(key, seconds):
+      """Wait up to seconds for the reaper to report the pid or the exit."""
+      deadline = common_util.MonotonicTime() + seconds
+      while state[key] is None and state['status_open']:
+        remaining = deadline - common_util.MonotonicTime()
+        if remaining <= 0:
+          break
+        Wait(remaining)
+        ReadOutput()
+        ReadStatus()
+
+    def Kill(grace):
+      """Kill the process group of the test and what it started."""
+      # The test may be running before the reaper reported its pid.
+      WaitFor('pid', REAP_TIMEOUT)
+      pid = state['pid']
+      if pid is None:
+        return
+      descendants = filesystemhandlerextend.Descendants(
+          filesystemhandlerextend.ProcessTable(), pid)
+      if grace > 0:
+        filesystemhandlerextend.SignalGroup(pid, signal.SIGTERM)
+        WaitFor('exit', grace)
+      filesystemhandlerextend.KillGroup(pid, descendants)
+      WaitFor('exit', REAP_TIMEOUT)
+
+    deadline = common_util.MonotonicTime() + timeout
+    done = False
+    try:
+      while state['exit'] is None:
+        if not state['status_open']:
+          raise ZygoteError('the reaper of the test went away')
+        if state['pid'] is None and self.server.poll() is not None:
+          raise ZygoteError('zygote server went away')
+        if ReadOutput():
+          Kill(0)
+          done = True
+          break
+        ReadStatus()
+        if state['exit'] is not None:
+          break
+        remaining = deadline - common_util.MonotonicTime()
+        if remaining <= 0:
+          Kill(kill_grace)
+          done = True
+          usage = None
+          if state['exit'] is not None:
+            usage = state['exit'][1]
+          return None, output, usage
+        Wait(min(remaining, filesystemhandlerextend.MAX_EXIT_CHECK_INTERVAL))
+      done = True
+      if state['exit'] is None:
+        raise ZygoteError('the reaper of the test went away')
+      # Collect what is left in the FIFO, but don't wait for a background
+      # process which still holds it.
+      ReadOutput()
+      ret, usage = state['exit']
+      return ret, output, usage
+    finally:
+      if not done:
+        Kill(0)
+      if state['pid'] is not None:
+        self.running_groups.Remove(state['pid'])
@@ -0,0 +1,144 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The PyreRing Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unittest for zygote module."""
+
+import os
+import shutil
+import signal
+import tempfile
+import time
+import unittest
+
+from lib import zygote
+
+
+class ZygoteTest(unittest.TestCase):
+  """Unit test cases for Zygote class."""
+
+  def setUp(self):
+    self.tempdir = tempfile.mkdtemp()
+    self.zygote = zygote.Zygote(['xml.dom.minidom'])
+    self.zygote.Start()
+
+  def tearDown(self):
+    self.zygote.Stop()
+    shutil.rmtree(self.tempdir)
+
+  def _Write(self, name, content):
+    path = os.path.join(self.tempdir, name)
+    script_file = open(path, 'w')
+    script_file.write(content)
+    script_file.close()
+    os.chmod(path, 0755)
+    return path
+
+  def testRunScript(self):
+    """Output, arguments, dir and exit code are those of a new interpreter."""
+    script = self._Write('check.py', '\n'.join([
+        'import os, sys',
+        'print sys.argv[1:], os.getcwd() == sys.argv[1]',
+        'print "xml.dom.minidom" in sys.modules',
+        'sys.stderr.write("to stderr\\n")',
+        'sys.exit(3)',
+        '']))
+    ret, output, usage = self.zygote.RunScriptToLoggerWithTimeout(
+        script, [self.tempdir], 10, self.tempdir)
+    self.assertEqual(ret, 3)
+    self.assertEqual(output.getvalue(), "['%s'] True\nTrue\nto stderr\n" %
+                     self.tempdir)
+    self.assertTrue(usage.max_rss_kb > 0)
+
+  def testException(self):
+    """An exception is printed and exits with 1."""
+    script = self._Write('raise.py', 'raise ValueError("bad")\n')
+    ret, output, unused_usage = self.zygote.RunScriptToLoggerWithTimeout(
+        script, [], 10)
+    self.assertEqual(ret, 1)
+    self.assertTrue('ValueError: bad' in output.getvalue())
+
+  def testTimeout(self):
+    """A script over its timeout is killed with what it started."""
+    script = self._Write('sleep.py', '\n'.join([
+        'import signal, subprocess, time',
+        'signal.signal(signal.SIGTERM, signal.SIG_IGN)',
+        'subprocess.Popen(["sleep", "30"])',
+        'time.sleep(30)',
+        '']))
+    start_time = time.time()
+    ret, unused_output, unused_usage = (
+        self.zygote.RunScriptToLoggerWithTimeout(script, [], 1,
+                                                 kill_grace=0.5))
+    self.assertEqual(ret, None)
+    self.assertTrue(time.time() - start_time < 10)
+
+  def testMonitorStops(self):
+    """The script is killed once the monitor says so."""
+    script = self._Write('fatal.py', '\n'.join([
+        'import sys, time',
+        'print "Fatal:"',
+        'sys.stdout.flush()',
+        'time.sleep(30)',
+        '']))
+    start_time = time.time()
+    ret, unused_output, unused_usage = (
+        self.zygote.RunScriptToLoggerWithTimeout(
+            script, [], 20, monitor=lambda mesg: 'Fatal:' in mesg))
+    self.assertTrue(ret < 0)
+    self.assertTrue(time.time() - start_time < 10)
+
+  def testServerSurvivesInterrupt(self):
+    """A SIGINT does not stop the server, tests still get KeyboardInterrupt."""
+    self.assertNotEqual(os.getsid(self.zygote.server.pid), os.getsid(0))
+    script = self._Write('interrupt.py', '\n'.join([
+        'import os, signal',
+        'try:',
+        '  os.kill(os.getpid(), signal.SIGINT)',
+        'except KeyboardInterrupt:',
+        '  print "interrupted"',
+        '']))
+    for unused_count in range(2):
+      ret, output, unused_usage = self.zygote.RunScriptToLoggerWithTimeout(
+          script, [], 10)
+      self.assertEqual(ret, 0)
+      self.assertEqual(output.getvalue(), 'interrupted\n')
+      # The server is serving now, it ignores the interrupt.
+      os.kill(self.zygote.server.pid, signal.SIGINT)
+      time.sleep(0.2)
+      self.assertTrue(self.zygote.IsRunning())
+
+  def testFindModules(self):
+    """Modules and packages are found, tests are not."""
+    self._Write('one.py', '')
+    self._Write('one_test.py', '')
+    os.mkdir(os.path.join(self.tempdir, 'package'))
+    self._Write(os.path.join('package', '__init__.py'), '')
+    os.mkdir(os.path.join(self.tempdir, 'data'))
+    self.assertEqual(zygote.FindModules([self.tempdir, '/nonexistent']),
+                     ['one', 'package'])
+
+  def testIsPythonScript(self):
+    """Only python scripts for a python interpreter are run by the zygote."""
+    self.assertTrue(zygote.IsPythonScript(self._Write('a.py', 'pass\n')))
+    self.assertTrue(zygote.IsPythonScript(
+        self._Write('b.py', '#!/usr/bin/env python\n')))
+    self.assertFalse(zygote.IsPythonScript(
+        self._Write('c.py', '#!/bin/sh\n')))
+    self.assertFalse(zygote.IsPythonScript(self._Write('d.sh', 'pass\n')))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -28,24 +28,50 @@ Usage:
     are either relative to the source_dir value or absolute paths.
 
   Options
+  --changed_since: only run the scripts which, or whose INPUTS or DEPENDS_ON
+    files, changed since a run id in the history file, 'last' for the latest
+    run on this host, or seconds since epoch. SETUP and TEARDOWN suites still
+    run whole.
   --conf_file: point the path to the config file. The default is
     ./conf/pyrering.conf. PyreRing will create this file if it doesn't exist.
   --email_recipients: the email recipients, separated by commas
   --file_errors: send failing testcase errors and output to a separate file.
+  --jobs: the number of test scripts to run at the same time. Scripts with
+    CONCURRENT = False or ROOT_ACCESS = True in their header still run one at
+    a time, alone. The default is 1.
   --log_file: the name of the log file. It should not include the path.
     The default value is pyrering.log and it will always be found at
     <report_dir>/<host_name>_<log_file>.
+  --max_retries: the times a FAIL or TIMEOUT test without RETRIES in its
+    header is run again. A test passing on a retry is FLAKY, which does not
+    fail the run. The default is 0.
+  --no_cache: run every test, even the CACHEABLE ones with a cached pass.
   --project_name: the name of the project. It will show up at the report file
     and email subject part.
   --report_dir: the path of all report files. The default location is ./reports
+  --rerun_failed: only run the tests which were FAIL, TIMEOUT, ERROR or LIMIT
+    in the last run on this host, as recorded in the history file. SETUP and
+    TEARDOWN suites still run whole.
   --reset: If it is true, pyrering.conf will be overwritten with command
     arguments and default values. Default is False.
-  --runner: <test execution framework> (Right now the only available and default
-    value is 'baserunner').
+  --runner: <test execution framework> one of the RUNNERS. The default is
+    'baserunner', which runs each test on a thread of its own when jobs is
+    more than 1. 'eventrunner' supervises all the running tests from one event
+    loop, for a jobs in the hundreds.
   --sendmail: send the report via email. Default is False.
   --nosendmail: do not send the report via email.
+  --shard_durations: the file of the script durations the 'duration'
+    shard_method splits each suite by. Every shard must get the same file.
+    No default value.
+  --shard_index: run only this shard of each suite, from 0 to total_shards - 1.
+    SETUP and TEARDOWN suites are run by every shard. The default is 0.
   --source_dir: the top directory for test scripts. No default value.
+  --total_shards: the number of shards each suite is split into, so several
+    hosts can run one suite together. The default is 1.
   --version: print out PyreRing version information and quit when set.
+  --zygote: run python test scripts forked from a warm python process, which
+    has imported the zygote_preload modules, instead of a new interpreter for
+    each. The default is False.
 
   Arguments should be space separated suite/directory/script names with the
   relative path to source_dir or the absolute paths. PyreRing will treat each
@@ -62,6 +88,7 @@ import os
 import sys
 
 from lib import baserunner
+from lib import eventrunner
 from lib import pyreringconfig
 from lib import pyreringutil
 
@@ -71,6 +98,13 @@ logger = logging.getLogger('PyreRing')
 
 global_settings = pyreringconfig.GlobalPyreRingConfig.settings
 
+# The runners --runner can select, by name. Each is a PyreRingFrameworkAdaptor
+# class constructed without arguments.
+RUNNERS = {
+    'baserunner': baserunner.BaseRunner,
+    'eventrunner': eventrunner.EventRunner,
+}
+
 
 class Error(Exception):
   """Base exception class."""
@@ -133,9 +167,41 @@ def ParseArgs():
   parser.add_option('--email_recipients',
                     help='recipients of email',
                     dest='email_recipients')
+  parser.add_option('--jobs',
+                    help='number of tests to run at the same time',
+                    type='int',
+                    dest='jobs')
+  parser.add_option('--max_retries',
+                    help='times to run a failed test again',
+                    type='int',
+                    dest='max_retries')
+  parser.add_option('--shard_index',
+                    help='the shard of each suite to run, from 0',
+                    type='int',
+                    dest='shard_index')
+  parser.add_option('--total_shards',
+                    help='number of shards to split each suite into',
+                    type='int',
+                    dest='total_shards')
+  parser.add_option('--shard_durations',
+                    help='durations file to split the suites by',
+                    dest='shard_durations')
+  parser.add_option('--changed_since',
+                    help='only run scripts changed since a run or a time',
+                    dest='changed_since')
+  parser.add_option('--no_cache',
+                    help='run tests with a cached pass too',
+                    action='store_true',
+                    default=False,
+                    dest='no_cache')
   parser.add_option('--log_file',
                     help='help log file name',
                     dest='log_file')
+  parser.add_option('--rerun_failed',
+                    help='only rerun the tests failed in the last run',
+                    action='store_true',
+                    default=False,
+                    dest='rerun_failed')
   parser.add_option('--reset',
                     help='reset the conf file to default',
                     action='store_true',
@@ -149,6 +215,11 @@ def ParseArgs():
                     action='store_true',
                     default=False,
                     dest='version')
+  parser.add_option('--zygote',
+                    help='fork python tests from a warm python process',
+                    action='store_true',
+                    default=False,
+                    dest='zygote')
   parser.add_option('--source_dir',
                     help='top level directory for test scripts.',
                     dest='source_dir',)
@@ -160,8 +231,7 @@ def main(args):
   """The pyrering main entrance.
 
   Takes various user command line arguments and initializes a runner as
-  specified by the --runner command line flag. Currently 'baserunner' is the
-  only runner available.
+  specified by the --runner command line flag, one of the RUNNERS.
 
   Returns:
     None.
@@ -199,6 +269,24 @@ def main(args):
     user_args['sendmail'] = False
   if options.file_errors:
     user_args['file_errors'] = True
+  if options.jobs:
+    user_args['jobs'] = options.jobs
+  if options.max_retries is not None:
+    user_args['max_retries'] = options.max_retries
+  if options.shard_index is not None:
+    user_args['shard_index'] = options.shard_index
+  if options.total_shards:
+    user_args['total_shards'] = options.total_shards
+  if options.shard_durations:
+    user_args['shard_durations'] = options.shard_durations
+  if options.no_cache:
+    user_args['no_cache'] = True
+  if options.rerun_failed:
+    user_args['rerun_failed'] = True
+  if options.zygote:
+    user_args['zygote'] = True
+  if options.changed_since:
+    user_args['changed_since'] = options.changed_since
 
 
   pyreringconfig.Init(pyrering_root_path, user_args)
@@ -217,11 +305,12 @@ def main(args):
   # now set the runner to user specified runner and start the test.
   failure_count = 0
   if len(args) >= 1:
-    if global_settings['runner'] == 'baserunner':
-      runner = baserunner.BaseRunner()
-    else:
-      # I don't have other runners to use now.
-      raise UnrecognizedRunnerError('Other Runners pending ;-)')
+    runner_class = RUNNERS.get(global_settings['runner'])
+    if runner_class is None:
+      raise UnrecognizedRunnerError(
+          'Unknown runner %s, use one of: %s' %
+          (global_settings['runner'], ', '.join(sorted(RUNNERS))))
+    runner = runner_class()
     logger.info('run test suites: %s' % str(args))
     suite_runner = pyreringutil.PyreRingSuiteRunner(runner, args)
     suite_runner.SetUp()